@@ -34,11 +34,13 @@ class AbstractDataElement(ABC):
 
     @property
     def squeeze(self) -> np.ndarray:
-        """ Returns a `numpy` `array` containing the all dumps of `self` without redundant dimensions. """
-        array = self.get_array()
-        if array.shape == (1, 1, 1):  # squeeze behaves weirdly in this case
-            return array[0, 0, 0]
-        return np.squeeze(array)
+        """
+        Returns a `numpy` `array` containing the all dumps of `self` without redundant dimensions.
+        The result is a view of `self.array`, it must be copied before being changed in place.
+        """
+        if self.array.shape == (1, 1, 1):  # squeeze behaves weirdly in this case
+            return self.array[0, 0, 0]
+        return np.squeeze(self.array)
 
     @property
     def shape(self) -> tuple[int, int, int]:
@@ -50,30 +52,39 @@ class AbstractDataElement(ABC):
             time: int | list[int] | slice | range | None = None,
             freq: int | list[int] | slice | range | None = None,
             recv: int | list[int] | slice | range | None = None,
+            copy: bool = True,
             ):
         """
         Simplified indexing
+        Only the selected entries are copied, lists and arrays of indices are gathered in a single indexing step
+        across all axes. If `copy` is `False` and only integers, slices and ranges are given, nothing is copied and
+        the result is a read-only view of `self.array`, so changing it in place, e.g. with `+=`, raises a
+        `ValueError` instead of silently changing `self`.
         :param time: indices or slice along the zeroth (dump) axis
         :param freq: indices or slice along the first (frequency) axis
         :param recv: indices or slice along the second (receiver) axis
-        :return: a copy of `self` indexed at the input indices
+        :param copy: if `True`, the default, the result never shares memory with `self` and is writable
+        :return: `self` indexed at the input indices
         """
-
-        array = self.array.copy()
-
-        if isinstance(time, int | np.int64):
-            time = [time]
-        if isinstance(freq, int | np.int64):
-            freq = [freq]
-        if isinstance(recv, int | np.int64):
-            recv = [recv]
-
-        if time is not None:
-            array = array[time, :, :]
-        if freq is not None:
-            array = array[:, freq, :]
-        if recv is not None:
-            array = array[:, :, recv]
+        basic_index = []
+        gather_index = {}
+        for axis, index in enumerate([time, freq, recv]):
+            basic, gather = self._split_index(index=index, length=self.array.shape[axis])
+            basic_index.append(basic)
+            if gather is not None:
+                gather_index[axis] = gather
+
+        array = self.array[tuple(basic_index)]
+        if len(gather_index) == 1:
+            (axis, gather), = gather_index.items()
+            array = array[(slice(None),) * axis + (gather,)]
+        elif gather_index:
+            array = array[np.ix_(*[gather_index.get(axis, np.arange(length))
+                                   for axis, length in enumerate(array.shape)])]
+        elif copy:
+            array = array.copy()
+        else:
+            array = self._read_only(array=array)
 
         # return new object
         return self.__class__(array=array)
@@ -85,6 +96,39 @@ class AbstractDataElement(ABC):
         """
         return self.get(**kwargs).array
 
+    @staticmethod
+    def _read_only(array: np.ndarray) -> np.ndarray:
+        """ Returns a read-only view of `array`, `array` itself stays writable. """
+        view = array.view()
+        view.setflags(write=False)
+        return view
+
+    @staticmethod
+    def _split_index(index: int | list[int] | slice | range | None, length: int) \
+            -> tuple[slice, np.ndarray | None]:
+        """
+        Returns a `tuple` of a basic `slice` and optional integer indices to gather afterwards for an axis of `length`.
+        Integers and ranges within the axis are converted to `slice`s, so the axis is kept and no data is copied.
+        :param index: the index along the axis
+        :param length: the length of the axis
+        :raise IndexError: if `index` is an integer out of range
+        """
+        if index is None:
+            return slice(None), None
+        if isinstance(index, slice):
+            return index, None
+        if isinstance(index, int | np.integer):
+            if not -length <= index < length:
+                raise IndexError(f'Index {index} is out of bounds for axis with size {length}.')
+            index = index % length
+            return slice(index, index + 1), None
+        if isinstance(index, range) and (len(index) == 0 or (0 <= index[0] < length and 0 <= index[-1] < length)):
+            return slice(index.start, index.stop if index.stop >= 0 else None, index.step), None
+        index = np.asarray(index)
+        if index.dtype == bool:
+            return slice(None), np.flatnonzero(index)
+        return slice(None), index.astype(int, copy=False)
+
     @classmethod
     def channel_iterator(cls, data_element: 'AbstractDataElement'):
         """
@@ -0,0 +1,238 @@
+import fcntl
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from typing import Generator
+
+
+class CacheManager:
+    """
+    Class to keep the cache directory below a byte budget. Each top-level file or directory in the cache directory
+    is an entry, e.g. the visibility cache or the metadata sidecar of one block. Accesses, hits and misses of each
+    entry are recorded in a `json` ledger inside the cache directory. Once the budget is exceeded, entries are
+    evicted by least recent ('lru') or least frequent ('lfu') use. Pinned entries are never evicted.
+    Pins are recorded per process in the ledger, so they protect entries in use from the evictions of other
+    processes sharing the cache directory. Pins of processes that no longer run are ignored. All changes of the
+    ledger and all evictions hold an exclusive `fcntl` lock on a lock file next to the ledger.
+    """
+
+    _ledger_file_name = 'cache_ledger.json'
+    _policies = ['lru', 'lfu']
+
+    def __init__(self, cache_directory: str, max_bytes: int | None = None, policy: str = 'lru'):
+        """
+        Initialise
+        :param cache_directory: the cache directory containing the entries
+        :param max_bytes: optional byte budget of the cache directory, if `None`, nothing is evicted
+        :param policy: eviction policy, either 'lru' or 'lfu'
+        :raise ValueError: if `max_bytes` is negative or `policy` is unknown
+        """
+        if max_bytes is not None and max_bytes < 0:
+            raise ValueError(f'Input `max_bytes` must be non-negative or `None`, got {max_bytes}.')
+        if policy not in self._policies:
+            raise ValueError(f'Input `policy` must be one of {self._policies}, got {policy}.')
+        self.cache_directory = cache_directory
+        self.max_bytes = max_bytes
+        self.policy = policy
+
+    def record_hit(self, name: str):
+        """ Record that entry `name` was found in the cache and update its last access time. """
+        self._record(name=name, counter='hits')
+
+    def record_miss(self, name: str):
+        """ Record that entry `name` was not found in the cache and update its last access time. """
+        self._record(name=name, counter='misses')
+
+    def pin(self, name: str):
+        """
+        Pin entry `name` for the current process, i.e. exclude it from eviction until `self.unpin()` is called.
+        Pins are counted, an entry pinned twice needs to be unpinned twice.
+        """
+        with self._locked():
+            ledger = self._read_ledger()
+            ledger['pinned'].setdefault(name, []).append(os.getpid())
+            self._write_ledger(ledger=ledger)
+
+    def unpin(self, name: str):
+        """ Remove one pin of the current process from entry `name`, which may be evicted again without pins. """
+        with self._locked():
+            ledger = self._read_ledger()
+            process_ids = ledger['pinned'].get(name, [])
+            if os.getpid() not in process_ids:
+                return
+            process_ids.remove(os.getpid())
+            if not process_ids:
+                del ledger['pinned'][name]
+            self._write_ledger(ledger=ledger)
+
+    def is_pinned(self, name: str) -> bool:
+        """ Return `True` if entry `name` is pinned by a running process. """
+        return name in self._pinned_names(ledger=self._read_ledger())
+
+    @contextmanager
+    def pinned(self, names: list[str]) -> Generator[None, None, None]:
+        """ Context manager to pin the entries in `names` while the context is active. """
+        for name in names:
+            self.pin(name=name)
+        try:
+            yield
+        finally:
+            for name in names:
+                self.unpin(name=name)
+
+    def entry_names(self) -> list[str]:
+        """ Return the names of all entries in the cache directory, excluding the ledger. """
+        if not os.path.isdir(self.cache_directory):
+            return []
+        return sorted(name for name in os.listdir(self.cache_directory)
+                      if not name.startswith(self._ledger_file_name))
+
+    def size(self, name: str | None = None) -> int:
+        """ Return the size in bytes of entry `name` or of all entries if `name` is `None`. """
+        if name is None:
+            return sum(self.size(name=entry_name) for entry_name in self.entry_names())
+        path = self._path(name=name)
+        if os.path.isfile(path):
+            return os.path.getsize(path)
+        return sum(os.path.getsize(os.path.join(directory, file))
+                   for directory, _, files in os.walk(path)
+                   for file in files)
+
+    def enforce_budget(self) -> list[str]:
+        """
+        Evict unpinned entries according to `self.policy` until the cache size is within `self.max_bytes`.
+        :return: `list` of the names of the evicted entries
+        """
+        if self.max_bytes is None:
+            return []
+        with self._locked():
+            sizes = {name: self.size(name=name) for name in self.entry_names()}
+            total_size = sum(sizes.values())
+            if total_size <= self.max_bytes:
+                return []
+            ledger = self._read_ledger()
+            evicted = []
+            for name in self._eviction_order(names=list(sizes), ledger=ledger):
+                if total_size <= self.max_bytes:
+                    break
+                print(f'Evicting {name} from cache...')
+                self._delete(name=name)
+                total_size -= sizes[name]
+                ledger['entries'].pop(name, None)
+                evicted.append(name)
+            ledger['evictions'] += len(evicted)
+            self._write_ledger(ledger=ledger)
+        return evicted
+
+    def statistics(self) -> dict:
+        """
+        Return the hit and miss statistics of the cache together with its size and budget.
+        :return: `dict` with the total `hits`, `misses`, `hit_rate`, `evictions`, `size` and `max_bytes`,
+                 and the per-entry `hits`, `misses` and `last_access` under `entries`
+        """
+        ledger = self._read_ledger()
+        hits = sum(entry['hits'] for entry in ledger['entries'].values())
+        misses = sum(entry['misses'] for entry in ledger['entries'].values())
+        return {'hits': hits,
+                'misses': misses,
+                'hit_rate': hits / (hits + misses) if hits + misses else None,
+                'evictions': ledger['evictions'],
+                'size': self.size(),
+                'max_bytes': self.max_bytes,
+                'entries': ledger['entries']}
+
+    def _eviction_order(self, names: list[str], ledger: dict) -> list[str]:
+        """
+        Return the unpinned entries in `names` in the order they should be evicted.
+        Entries unknown to the ledger are ranked by their modification time and count as never used.
+        """
+        def last_access(name: str) -> float:
+            if name in ledger['entries']:
+                return ledger['entries'][name]['last_access']
+            return os.path.getmtime(self._path(name=name))
+
+        def use_count(name: str) -> int:
+            entry = ledger['entries'].get(name, {'hits': 0, 'misses': 0})
+            return entry['hits'] + entry['misses']
+
+        pinned_names = self._pinned_names(ledger=ledger)
+        candidates = [name for name in names if name not in pinned_names]
+        if self.policy == 'lfu':
+            return sorted(candidates, key=lambda name: (use_count(name), last_access(name)))
+        return sorted(candidates, key=last_access)
+
+    def _record(self, name: str, counter: str):
+        """ Increment `counter` of entry `name` in the ledger and set its last access time to now. """
+        with self._locked():
+            ledger = self._read_ledger()
+            entry = ledger['entries'].setdefault(name, {'hits': 0, 'misses': 0, 'last_access': 0.})
+            entry[counter] += 1
+            entry['last_access'] = time.time()
+            self._write_ledger(ledger=ledger)
+
+    def _pinned_names(self, ledger: dict) -> set[str]:
+        """ Return the names of the entries in `ledger` pinned by at least one running process. """
+        return {name for name, process_ids in ledger['pinned'].items()
+                if any(self._is_running(process_id=process_id) for process_id in process_ids)}
+
+    @staticmethod
+    def _is_running(process_id: int) -> bool:
+        """ Return `True` if the process with `process_id` is running. """
+        try:
+            os.kill(process_id, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    @contextmanager
+    def _locked(self) -> Generator[None, None, None]:
+        """
+        Context manager holding an exclusive lock on the ledger lock file while the context is active.
+        The lock is not reentrant, so the context must not be nested.
+        """
+        os.makedirs(self.cache_directory, exist_ok=True)
+        with open(self._path(name=f'{self._ledger_file_name}.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _delete(self, name: str):
+        """ Delete entry `name` from disc. """
+        path = self._path(name=name)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            os.remove(path)
+
+    def _read_ledger(self) -> dict:
+        """
+        Return the ledger content, an empty ledger if it does not exist or cannot be read.
+        Pins of ledgers written before pins were recorded per process are dropped.
+        """
+        try:
+            with open(self._path(name=self._ledger_file_name)) as ledger_file:
+                ledger = json.load(ledger_file)
+        except (OSError, ValueError):
+            return {'entries': {}, 'pinned': {}, 'evictions': 0}
+        if not isinstance(ledger.get('pinned'), dict):
+            ledger['pinned'] = {}
+        return ledger
+
+    def _write_ledger(self, ledger: dict):
+        """ Write `ledger` to a temporary file first and then move it in place. """
+        os.makedirs(self.cache_directory, exist_ok=True)
+        ledger_file_path = self._path(name=self._ledger_file_name)
+        temporary_file_path = f'{ledger_file_path}.{os.getpid()}.tmp'
+        with open(temporary_file_path, 'w') as ledger_file:
+            json.dump(ledger, ledger_file)
+        os.replace(temporary_file_path, ledger_file_path)
+
+    def _path(self, name: str) -> str:
+        """ Return the path of entry `name`. """
+        return os.path.join(self.cache_directory, name)
@@ -0,0 +1,191 @@
+import bz2
+import json
+import lzma
+import os
+import zlib
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+_CODECS = {'zlib': zlib, 'bz2': bz2, 'lzma': lzma}
+
+
+def _compress(data: bytes, codec: str, level: int | None, item_size: int, shuffle: bool) -> bytes:
+    """
+    Return `data` compressed with `codec` at `level`. If `shuffle` is `True`, the bytes are first reordered such that
+    the n-th bytes of all items of `item_size` are consecutive, which improves the compression of floats.
+    """
+    if shuffle and item_size > 1:
+        data = np.frombuffer(data, dtype=np.uint8).reshape(-1, item_size).T.tobytes()
+    if level is None:
+        return _CODECS[codec].compress(data)
+    if codec == 'lzma':
+        return lzma.compress(data, preset=level)
+    return _CODECS[codec].compress(data, level)
+
+
+def _decompress(data: bytes, codec: str, item_size: int, shuffle: bool) -> bytes:
+    """ Return `data` decompressed with `codec`, reversing the byte shuffle if `shuffle` is `True`. """
+    data = _CODECS[codec].decompress(data)
+    if shuffle and item_size > 1:
+        data = np.frombuffer(data, dtype=np.uint8).reshape(item_size, -1).T.tobytes()
+    return data
+
+
+class ChunkedCodec:
+    """
+    Class to write `numpy` arrays to compressed files and to read them again. The array is split into chunks of
+    `chunk_length` along its first axis, which are compressed and decompressed independently on a pool of threads
+    or processes. A `json` header records shape, `dtype`, codec and the byte offsets of all chunks, so a single chunk
+    can be read without touching the rest of the file. Reading always uses the codec recorded in the file.
+    """
+
+    _magic = b'MUSEEKCC'
+    _header_length_dtype = np.dtype('<u8')
+
+    def __init__(self,
+                 codec: str = 'zlib',
+                 level: int | None = None,
+                 chunk_length: int = 64,
+                 shuffle: bool = True,
+                 n_workers: int | None = None,
+                 use_processes: bool = False):
+        """
+        Initialise
+        :param codec: compression codec, one of 'zlib', 'bz2' or 'lzma'
+        :param level: optional compression level of `codec`, defaults to the default level of `codec`
+        :param chunk_length: number of elements along the first axis per chunk, e.g. number of dumps
+        :param shuffle: if `True`, the bytes of each chunk are shuffled by significance before compression
+        :param n_workers: optional number of threads or processes, defaults to the number of CPUs
+        :param use_processes: if `True`, a process pool is used instead of a thread pool, all codecs release
+                              the GIL, so threads are usually sufficient
+        :raise ValueError: if `codec` is unknown or `chunk_length` is not positive
+        """
+        if codec not in _CODECS:
+            raise ValueError(f'Input `codec` must be one of {list(_CODECS)}, got {codec}.')
+        if chunk_length < 1:
+            raise ValueError(f'Input `chunk_length` must be positive, got {chunk_length}.')
+        self.codec = codec
+        self.level = level
+        self.chunk_length = chunk_length
+        self.shuffle = shuffle
+        self.n_workers = n_workers
+        self.use_processes = use_processes
+
+    def write(self, file: str, array: np.ndarray):
+        """
+        Compress `array` chunk by chunk in parallel and write it to `file`.
+        The file is written to a temporary path first and then moved in place.
+        :param file: path of the file to write
+        :param array: the array to compress, e.g. a memory map, chunks are only read when they are compressed
+        """
+        chunk_starts = range(0, max(len(array), 1), self.chunk_length)
+        # only a few chunks per worker are held uncompressed in memory at a time
+        batch_size = 4 * (self.n_workers or os.cpu_count() or 1)
+        compressed_chunks = []
+        with self._executor() as executor:
+            for batch_starts in [chunk_starts[i:i + batch_size] for i in range(0, len(chunk_starts), batch_size)]:
+                compressed_chunks.extend(executor.map(
+                    _compress,
+                    [np.ascontiguousarray(array[start:start + self.chunk_length]).tobytes() for start in batch_starts],
+                    *self._repeat(self.codec, self.level, array.dtype.itemsize, self.shuffle, n=len(batch_starts))
+                ))
+        offsets = np.cumsum([0] + [len(chunk) for chunk in compressed_chunks]).tolist()
+        header = json.dumps({'shape': list(array.shape),
+                             'dtype': array.dtype.str,
+                             'codec': self.codec,
+                             'level': self.level,
+                             'shuffle': self.shuffle,
+                             'chunk_length': self.chunk_length,
+                             'offsets': offsets}).encode()
+        temporary_file = f'{file}.tmp'
+        with open(temporary_file, 'wb') as opened_file:
+            opened_file.write(self._magic)
+            opened_file.write(np.asarray(len(header), dtype=self._header_length_dtype).tobytes())
+            opened_file.write(header)
+            for chunk in compressed_chunks:
+                opened_file.write(chunk)
+        os.replace(temporary_file, file)
+
+    def read(self, file: str, indices: list[int] | None = None) -> np.ndarray:
+        """
+        Return the array in `file`, decompressing the required chunks in parallel.
+        :param file: path of a file written by `self.write()`
+        :param indices: optional sorted indices along the first axis to read, only chunks containing them are
+                        decompressed, if `None`, the entire array is read
+        :return: the array as `np.ndarray`
+        """
+        header, data_start = self.header(file=file)
+        shape, dtype, chunk_length = header['shape'], np.dtype(header['dtype']), header['chunk_length']
+        if indices is None:
+            indices = range(shape[0])
+        indices = np.asarray(indices, dtype=int)
+        chunk_indices = np.unique(indices // chunk_length).tolist()
+        with open(file, 'rb') as opened_file:
+            raw_chunks = [self._read_raw_chunk(opened_file=opened_file,
+                                               header=header,
+                                               data_start=data_start,
+                                               chunk_index=chunk_index) for chunk_index in chunk_indices]
+        with self._executor() as executor:
+            chunks = list(executor.map(_decompress,
+                                       raw_chunks,
+                                       *self._repeat(header['codec'], dtype.itemsize, header['shuffle'],
+                                                     n=len(raw_chunks))))
+        result = np.empty((len(indices), *shape[1:]), dtype=dtype)
+        for chunk_index, chunk in zip(chunk_indices, chunks):
+            chunk = np.frombuffer(chunk, dtype=dtype).reshape(-1, *shape[1:])
+            chunk_start = chunk_index * chunk_length
+            in_chunk = (indices >= chunk_start) & (indices < chunk_start + len(chunk))
+            result[in_chunk] = chunk[indices[in_chunk] - chunk_start]
+        return result
+
+    def read_chunk(self, file: str, chunk_index: int) -> np.ndarray:
+        """
+        Return chunk number `chunk_index` of the array in `file`, only this chunk is read and decompressed.
+        :param file: path of a file written by `self.write()`
+        :param chunk_index: index of the chunk along the first axis
+        :raise ValueError: if `chunk_index` is out of range
+        :return: the chunk as `np.ndarray`
+        """
+        header, data_start = self.header(file=file)
+        if not 0 <= chunk_index < len(header['offsets']) - 1:
+            raise ValueError(f'Chunk index {chunk_index} out of range for {len(header["offsets"]) - 1} chunks.')
+        dtype = np.dtype(header['dtype'])
+        with open(file, 'rb') as opened_file:
+            raw_chunk = self._read_raw_chunk(opened_file=opened_file,
+                                             header=header,
+                                             data_start=data_start,
+                                             chunk_index=chunk_index)
+        chunk = _decompress(raw_chunk, header['codec'], dtype.itemsize, header['shuffle'])
+        return np.frombuffer(chunk, dtype=dtype).reshape(-1, *header['shape'][1:]).copy()
+
+    def header(self, file: str) -> tuple[dict, int]:
+        """
+        Return the header of `file` and the byte position where the chunk data starts.
+        :raise ValueError: if `file` was not written by `self.write()`
+        """
+        with open(file, 'rb') as opened_file:
+            if opened_file.read(len(self._magic)) != self._magic:
+                raise ValueError(f'File {file} is not a chunked compressed array.')
+            header_length = int(np.frombuffer(opened_file.read(self._header_length_dtype.itemsize),
+                                              dtype=self._header_length_dtype)[0])
+            header = json.loads(opened_file.read(header_length))
+        return header, len(self._magic) + self._header_length_dtype.itemsize + header_length
+
+    @staticmethod
+    def _read_raw_chunk(opened_file, header: dict, data_start: int, chunk_index: int) -> bytes:
+        """ Return the compressed bytes of chunk `chunk_index` from `opened_file`. """
+        start, stop = header['offsets'][chunk_index], header['offsets'][chunk_index + 1]
+        opened_file.seek(data_start + start)
+        return opened_file.read(stop - start)
+
+    @staticmethod
+    def _repeat(*arguments, n: int) -> list[list]:
+        """ Return each of `arguments` repeated `n` times, to be passed to `Executor.map()`. """
+        return [[argument] * n for argument in arguments]
+
+    def _executor(self) -> Executor:
+        """ Return a new thread or process pool with `self.n_workers` workers. """
+        if self.use_processes:
+            return ProcessPoolExecutor(max_workers=self.n_workers)
+        return ThreadPoolExecutor(max_workers=self.n_workers)
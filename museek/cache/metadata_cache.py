@@ -0,0 +1,208 @@
+import json
+import os
+from typing import Generator
+
+import numpy as np
+from katdal import DataSet
+from katpoint import Antenna, Target
+
+
+class CachedDataSet:
+    """
+    Stand-in for a `katdal` `DataSet` that is built from a metadata sidecar instead of the observation's `rdb` file.
+    It provides the metadata and the selection interface used by `TimeOrderedData`, but no visibility,
+    flag or weight data. As in `katdal`, `ants` and the per-antenna arrays only contain the antennas involved in
+    the selected correlator products.
+    """
+
+    _per_dump_array_names = ['timestamps', 'temperature', 'humidity', 'pressure']
+    _per_antenna_array_names = ['az', 'el', 'ra', 'dec']
+
+    def __init__(self, metadata: dict, arrays: dict[str, np.ndarray]):
+        """
+        Initialise with the entire block selected.
+        :param metadata: `dict` as written by `MetadataCache`
+        :param arrays: `dict` of the per-dump, per-antenna and per-channel arrays written by `MetadataCache`
+        """
+        self.name = metadata['name']
+        self.dump_period = metadata['dump_period']
+        self.channel_width = metadata['channel_width']
+        self.obs_script_log = metadata['obs_script_log']
+        self._data_str = metadata['data_str']
+        self._all_antennas = [Antenna(description) for description in metadata['antennas']]
+        self._all_correlator_products = np.asarray(metadata['correlator_products'])
+        self._scan_table = [(index, state, start, stop, Target(target))
+                            for index, state, start, stop, target in metadata['scans']]
+        self._arrays = arrays
+
+        self._time_keep = np.ones(len(arrays['timestamps']), dtype=bool)
+        self._freq_keep = np.ones(len(arrays['freqs']), dtype=bool)
+        self._corrprod_keep = np.ones(len(self._all_correlator_products), dtype=bool)
+        self._scan_keep = np.ones(len(arrays['timestamps']), dtype=bool)
+
+    def __str__(self):
+        """ Returns the same `str` as the `katdal` `DataSet` the sidecar was created from. """
+        return self._data_str
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        """ Returns the selected per-dump or per-antenna array called `name`, e.g. `timestamps` or `az`. """
+        if name in self._per_dump_array_names:
+            return self._arrays[name][self._dump_keep]
+        if name in self._per_antenna_array_names:
+            return self._arrays[name][self._dump_keep][:, self._antenna_keep]
+        raise AttributeError(f'{self.__class__.__name__} has no attribute {name}.')
+
+    @property
+    def shape(self) -> tuple[int, int, int]:
+        """ Returns the shape of the selected visibility data. """
+        return len(self.dumps), len(self.channels), len(self.corr_products)
+
+    @property
+    def dumps(self) -> np.ndarray:
+        """ Returns the dump indices of the selected dumps relative to the entire block. """
+        return np.nonzero(self._dump_keep)[0]
+
+    @property
+    def channels(self) -> np.ndarray:
+        """ Returns the channel indices of the selected channels relative to the entire band. """
+        return np.nonzero(self._freq_keep)[0]
+
+    @property
+    def freqs(self) -> np.ndarray:
+        """ Returns the centre frequencies of the selected channels in Hz. """
+        return self._arrays['freqs'][self._freq_keep]
+
+    @property
+    def corr_products(self) -> np.ndarray:
+        """ Returns the selected autocorrelation products. """
+        return self._all_correlator_products[self._corrprod_keep]
+
+    @property
+    def ants(self) -> list[Antenna]:
+        """ Returns the `Antenna`s involved in the selected correlator products. """
+        return [antenna for antenna, keep in zip(self._all_antennas, self._antenna_keep) if keep]
+
+    def select(self,
+               corrprods: list[int] | None = None,
+               channels: range | slice | list[int] | None = None,
+               freqrange: tuple[float, float] | None = None,
+               scans: str | list[str] | None = None):
+        """
+        Reset the selection and select the data like `katdal` `DataSet.select()`.
+        :param corrprods: optional indices of correlator products relative to `self.corr_products` of the block
+        :param channels: optional channel indices
+        :param freqrange: optional lower and upper frequency limits in Hz
+        :param scans: optional scan state name or `list` of them
+        """
+        self._time_keep[:] = True
+        self._freq_keep[:] = True
+        self._corrprod_keep[:] = True
+        if corrprods is not None:
+            self._corrprod_keep[:] = False
+            self._corrprod_keep[corrprods] = True
+        if channels is not None:
+            channel_keep = np.zeros_like(self._freq_keep)
+            channel_keep[channels] = True
+            self._freq_keep &= channel_keep
+        if freqrange is not None:
+            frequencies = self._arrays['freqs']
+            self._freq_keep &= frequencies >= freqrange[0] + 0.5 * self.channel_width
+            self._freq_keep &= frequencies <= freqrange[1] - 0.5 * self.channel_width
+        if scans is not None:
+            if isinstance(scans, str):
+                scans = [scans]
+            self._time_keep[:] = False
+            for _, state, start, stop, _ in self._scan_table:
+                if state in scans:
+                    self._time_keep[start:stop] = True
+
+    def scans(self) -> Generator[tuple[int, str, Target], None, None]:
+        """
+        Iterate through the selected scans like `katdal` `DataSet.scans()`, yielding scan index, state and target.
+        During each iteration, the selection is restricted to the dumps of the current scan.
+        """
+        try:
+            for index, state, start, stop, target in self._scan_table:
+                self._scan_keep[:] = False
+                self._scan_keep[start:stop] = True
+                if self._dump_keep.any():
+                    yield index, state, target
+        finally:
+            self._scan_keep[:] = True
+
+    @property
+    def _dump_keep(self) -> np.ndarray:
+        """ Returns a boolean mask of the dumps in the current selection and scan. """
+        return self._time_keep & self._scan_keep
+
+    @property
+    def _antenna_keep(self) -> np.ndarray:
+        """ Returns a boolean mask of the antennas involved in the selected correlator products. """
+        antenna_names = {receiver_name[:-1] for receiver_name in self.corr_products.flatten()}
+        return np.asarray([antenna.name in antenna_names for antenna in self._all_antennas], dtype=bool)
+
+
+class MetadataCache:
+    """
+    Class to store the metadata of an entire observation block in a sidecar next to the visibility cache
+    and to load it as a `CachedDataSet`. The sidecar consists of a `json` file with the scan table, antennas,
+    correlator products, dump period and observation log, and an `npz` file with the per-dump, per-antenna and
+    per-channel arrays. The `json` file is written last and marks the sidecar as complete.
+    """
+
+    _metadata_file_name = 'metadata.json'
+    _arrays_file_name = 'metadata.npz'
+
+    def __init__(self, cache_directory: str):
+        """
+        Initialise
+        :param cache_directory: directory to contain the sidecar files of one observation block
+        """
+        self.cache_directory = cache_directory
+
+    def exists(self) -> bool:
+        """ Return `True` if a complete sidecar is present. """
+        return os.path.exists(self._file(name=self._metadata_file_name))
+
+    def store(self, data: DataSet):
+        """
+        Store the metadata of `data` to the sidecar.
+        :param data: a `katdal` `DataSet` with the entire block selected
+        """
+        os.makedirs(self.cache_directory, exist_ok=True)
+        scans = [[int(index), state, int(data.dumps[0]), int(data.dumps[-1]) + 1, target.description]
+                 for index, state, target in data.scans()]
+        correlator_products = [[receiver_name, receiver_name]
+                               for receiver_name in np.unique(data.corr_products.flatten())]
+        np.savez(self._file(name=self._arrays_file_name),
+                 timestamps=data.timestamps,
+                 freqs=data.freqs,
+                 az=data.az,
+                 el=data.el,
+                 ra=data.ra,
+                 dec=data.dec,
+                 temperature=data.temperature,
+                 humidity=data.humidity,
+                 pressure=data.pressure)
+        metadata = {'name': data.name,
+                    'data_str': str(data),
+                    'dump_period': float(data.dump_period),
+                    'channel_width': float(data.channel_width),
+                    'obs_script_log': [str(line) for line in data.obs_script_log],
+                    'antennas': [antenna.description for antenna in data.ants],
+                    'correlator_products': correlator_products,
+                    'scans': scans}
+        with open(self._file(name=self._metadata_file_name), 'w') as metadata_file:
+            json.dump(metadata, metadata_file)
+
+    def load(self) -> CachedDataSet:
+        """ Return the sidecar content as a `CachedDataSet` with the entire block selected. """
+        with open(self._file(name=self._metadata_file_name)) as metadata_file:
+            metadata = json.load(metadata_file)
+        with np.load(self._file(name=self._arrays_file_name)) as arrays_file:
+            arrays = dict(arrays_file)
+        return CachedDataSet(metadata=metadata, arrays=arrays)
+
+    def _file(self, name: str) -> str:
+        """ Return the path of the sidecar file called `name`. """
+        return os.path.join(self.cache_directory, name)
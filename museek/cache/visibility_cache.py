@@ -0,0 +1,544 @@
+import json
+import os
+import shutil
+import zlib
+from typing import Callable
+
+import numpy as np
+from numpy.lib.mixins import NDArrayOperatorsMixin
+
+from museek.cache.chunked_codec import ChunkedCodec
+
+
+class ReceiverShardedArray:
+    """
+    Writable array-like of shape `(time, frequency, receivers)` that scatters every assignment to one
+    memory-mapped `npy` file per receiver. It can be used as an `out` target of `dask.array.store`, in which
+    case each chunk is written to disc as soon as it is computed.
+    """
+
+    def __init__(self, shards: list[np.memmap]):
+        """
+        Initialise
+        :param shards: `list` of 2-dimensional `(time, frequency)` memory maps, one per receiver
+        """
+        self._shards = shards
+        self.shape = (*shards[0].shape, len(shards))
+        self.dtype = shards[0].dtype
+        self.ndim = len(self.shape)
+
+    def __setitem__(self, index: tuple[slice, slice, slice] | type(Ellipsis), value: np.ndarray):
+        """ Write `value` to the shards at `index`, which is an `Ellipsis` or a `tuple` of three `slice`s. """
+        if index is Ellipsis:
+            index = (slice(None),) * self.ndim
+        time_index, frequency_index, receiver_index = index
+        for i_value, i_receiver in enumerate(range(len(self._shards))[receiver_index]):
+            self._shards[i_receiver][time_index, frequency_index] = value[:, :, i_value]
+
+    def flush(self):
+        """ Flush all shards to disc. """
+        for shard in self._shards:
+            shard.flush()
+
+
+class ReceiverStackedArray(NDArrayOperatorsMixin):
+    """
+    Array-like of shape `(time, frequency, receivers)` stacked lazily from one 2-dimensional shard per
+    receiver. A shard is only opened when it is indexed for the first time, so indexing a few receivers reads
+    only their shards, and of memory-mapped shards only the indexed part. Any other `numpy` operation, e.g.
+    `np.mean()` or arithmetic, stacks all shards in memory first and returns a `numpy` array.
+    Assignments, e.g. by in-place arithmetic, are written to the opened shards, which are copy-on-write, so they
+    never change the cache. A pickled `ReceiverStackedArray` is unpickled as a `numpy` array.
+    """
+
+    def __init__(self, load_shard: Callable[[int], np.ndarray], shape: tuple[int, int, int], dtype: np.dtype):
+        """
+        Initialise
+        :param load_shard: callable returning the 2-dimensional `(time, frequency)` shard of the receiver at an index
+        :param shape: `(time, frequency, receivers)` shape of the stacked array
+        :param dtype: `dtype` of the shards
+        """
+        self._load_shard = load_shard
+        self._shards: list[np.ndarray | None] = [None] * shape[2]
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.ndim = len(self.shape)
+        self.size = int(np.prod(self.shape))
+        self.nbytes = self.size * self.dtype.itemsize
+
+    def __len__(self):
+        """ Return the number of dumps. """
+        return self.shape[0]
+
+    def __reduce__(self):
+        """ Return the reduction of the stacked `numpy` array for pickling. """
+        return np.asarray(self).__reduce__()
+
+    def __array__(self, dtype: np.dtype | None = None, copy: bool | None = None) -> np.ndarray:
+        """ Return all shards stacked in memory along the receiver axis, cast to `dtype` if it is given. """
+        return np.asarray(self[...], dtype=dtype)
+
+    def __array_ufunc__(self, ufunc: np.ufunc, method: str, *inputs, out: tuple | None = None, **kwargs):
+        """
+        Apply `ufunc` to the stacked arrays of all `ReceiverStackedArray`s in `inputs`. If `out` is a
+        `ReceiverStackedArray`, the result is written to its shards.
+        """
+        inputs = [np.asarray(input_) if isinstance(input_, ReceiverStackedArray) else input_ for input_ in inputs]
+        if out is not None and isinstance(out[0], ReceiverStackedArray):
+            out[0][...] = getattr(ufunc, method)(*inputs, **kwargs)
+            return out[0]
+        if out is not None:
+            kwargs['out'] = out
+        return getattr(ufunc, method)(*inputs, **kwargs)
+
+    def __array_function__(self, func: Callable, types: tuple, args: tuple, kwargs: dict):
+        """ Apply the `numpy` function `func` to the stacked arrays, only the shape is known without stacking. """
+        if func in (np.shape, np.ndim, np.size) and len(args) == 1 and not kwargs:
+            return {np.shape: self.shape, np.ndim: self.ndim, np.size: self.size}[func]
+        args = [np.asarray(arg) if isinstance(arg, ReceiverStackedArray) else arg for arg in args]
+        return func(*args, **kwargs)
+
+    def __getitem__(self, index) -> np.ndarray:
+        """
+        Return `self` indexed at `index`, only the shards of the indexed receivers are opened and read.
+        Indices that do not select along the axes separately, e.g. boolean masks of the full shape, stack all
+        shards first.
+        """
+        if (split_index := self._split_index(index=index)) is None:
+            return np.asarray(self)[index]
+        time_index, frequency_index, receiver_index = split_index
+        if isinstance(receiver_index, int | np.integer):
+            return self._shard(i_receiver=receiver_index)[time_index, frequency_index]
+        parts = [self._shard(i_receiver=i_receiver)[time_index, frequency_index] for i_receiver in receiver_index]
+        if len(parts) == 1:
+            return parts[0][..., np.newaxis]
+        if not parts:
+            return np.empty(np.broadcast_to(0, self.shape[:2])[time_index, frequency_index].shape + (0,),
+                            dtype=self.dtype)
+        return np.stack(parts, axis=-1)
+
+    def __setitem__(self, index, value: np.ndarray):
+        """
+        Write `value` to the copy-on-write shards at `index`.
+        :raise ValueError: if `index` does not select along the axes separately
+        """
+        if (split_index := self._split_index(index=index)) is None:
+            raise ValueError(f'Cannot assign to a `ReceiverStackedArray` at index {index}.')
+        time_index, frequency_index, receiver_index = split_index
+        if isinstance(receiver_index, int | np.integer):
+            self._shard(i_receiver=receiver_index)[time_index, frequency_index] = value
+            return
+        shard_shape = np.broadcast_to(0, self.shape[:2])[time_index, frequency_index].shape
+        value = np.broadcast_to(value, shard_shape + (len(receiver_index),))
+        for i_value, i_receiver in enumerate(receiver_index):
+            self._shard(i_receiver=i_receiver)[time_index, frequency_index] = value[..., i_value]
+
+    @property
+    def real(self) -> 'ReceiverStackedArray | np.ndarray':
+        """ Return `self` if it is real, otherwise the real part of the stacked array. """
+        if np.iscomplexobj(np.empty(0, dtype=self.dtype)):
+            return np.asarray(self).real
+        return self
+
+    def _shard(self, i_receiver: int) -> np.ndarray:
+        """ Return the shard of the receiver at index `i_receiver`, it is opened on first access. """
+        if self._shards[i_receiver] is None:
+            self._shards[i_receiver] = self._load_shard(i_receiver)
+        return self._shards[i_receiver]
+
+    def _split_index(self, index) -> tuple | None:
+        """
+        Return `index` as a `tuple` of the time index, the frequency index and an integer or a `list` of receiver
+        indices, or `None` if it cannot be applied to the shards separately.
+        """
+        index = index if isinstance(index, tuple) else (index,)
+        ellipses = [i for i, index_ in enumerate(index) if index_ is Ellipsis]
+        if len(ellipses) > 1:
+            return
+        if ellipses:
+            index = index[:ellipses[0]] + (slice(None),) * (self.ndim - len(index) + 1) + index[ellipses[0] + 1:]
+        index = index + (slice(None),) * (self.ndim - len(index))
+        if len(index) != self.ndim or any(index_ is None or np.ndim(index_) > 1 for index_ in index):
+            return
+        time_index, frequency_index, receiver_index = index
+        if isinstance(receiver_index, int | np.integer | slice):
+            receivers = range(self.shape[2])[receiver_index]
+        else:
+            receiver_index = np.asarray(receiver_index)
+            # `numpy` moves the indexed axes to the front if they are separated by a slice
+            is_separated = not isinstance(time_index, slice) and isinstance(frequency_index, slice)
+            if receiver_index.ndim != 1 or receiver_index.dtype.kind not in 'iub' or is_separated \
+                    or any(np.ndim(index_) > 0 for index_ in (time_index, frequency_index)):
+                return
+            if receiver_index.dtype == bool:
+                receiver_index = np.flatnonzero(receiver_index)
+            receivers = [range(self.shape[2])[i_receiver] for i_receiver in receiver_index.tolist()]
+        if isinstance(receivers, range):
+            receivers = list(receivers)
+        return time_index, frequency_index, receivers
+
+
+class VisibilityCache:
+    """
+    Class to store visibility, flag and weight data in a cache directory and load them again.
+    The cache is sharded by receiver: each receiver has its own sub-directory containing one uncompressed
+    `npy` file per array, which allows to memory-map it on load. A versioned `json` manifest records the dataset
+    name and selection, the shape and `dtype`s shared by all shards and, per receiver, a truncation check of each
+    of its files. A manifest of another version, dataset or selection invalidates the entire cache,
+    a file failing its truncation check invalidates only the receiver it belongs to.
+    The truncation check is cheap on purpose, it consists of the file size and a CRC32 of the first and last
+    64 KiB only. It detects truncated, partially written and replaced files, but not changes in the middle of a
+    file, which is not expected to happen to a cache that is only written through this class.
+    Once a receiver is completely written, its flags are packed to one bit per entry along the frequency axis
+    with `np.packbits`, they are unpacked on load for the requested dumps only.
+    If a `ChunkedCodec` is given, the shards are compressed chunk by chunk once they are completely written and
+    replace the `npy` files. Compressed shards are decompressed in parallel on load and only the chunks containing
+    the requested dumps are read.
+    """
+
+    _array_names = ['visibility', 'flags', 'weights']
+    _index_file_name = 'index.json'
+    _version = 4
+    _truncation_check_block_size = 1 << 16
+
+    def __init__(self,
+                 cache_directory: str,
+                 dataset_name: str | None = None,
+                 selection: dict | None = None,
+                 codec: ChunkedCodec | None = None):
+        """
+        Initialise
+        :param cache_directory: directory containing the receiver shards of one observation block
+        :param dataset_name: optional name of the `katdal` dataset, recorded in and checked against the manifest
+        :param selection: optional `json` serialisable `dict` describing the data selection,
+                          recorded in and checked against the manifest
+        :param codec: optional `ChunkedCodec` to compress shards with, if `None`, shards are stored uncompressed
+        """
+        self.cache_directory = cache_directory
+        self.dataset_name = dataset_name
+        self.selection = selection
+        self.codec = codec
+
+    def exists(self) -> bool:
+        """
+        Return `True` if a readable manifest of the current version is present
+        and matches `self.dataset_name` and `self.selection`.
+        """
+        if not os.path.exists(self._index_file()):
+            return False
+        try:
+            index = self._read_index()
+        except (OSError, ValueError):
+            return False
+        return (index.get('version') == self._version
+                and index.get('name') == self.dataset_name
+                and index.get('selection') == self.selection)
+
+    def receiver_names(self) -> list[str]:
+        """ Return the names of all receivers in the manifest, an empty `list` if there is no valid cache. """
+        if not self.exists():
+            return []
+        return list(self._read_index()['receivers'])
+
+    def contains(self, receiver_names: list[str]) -> bool:
+        """ Return `True` if all receivers in `receiver_names` are in the cache and their files are intact. """
+        return not self.missing_receiver_names(receiver_names=receiver_names)
+
+    def missing_receiver_names(self, receiver_names: list[str]) -> list[str]:
+        """
+        Return the receivers in `receiver_names` that are not in the manifest or whose files do not match
+        the truncation check recorded in it. Only the head and tail of each file are read for this check.
+        :param receiver_names: `str` names of the receivers, e.g. `['m000h']`
+        :return: `list` of the missing receiver names in the order of `receiver_names`
+        """
+        if not self.exists():
+            return list(receiver_names)
+        cached_files = self._read_index()['receivers']
+        return [receiver_name for receiver_name in receiver_names
+                if receiver_name not in cached_files
+                or not self._is_intact(receiver_name=receiver_name, truncation_checks=cached_files[receiver_name])]
+
+    def dtypes(self) -> list[np.dtype] | None:
+        """ Return the `dtype`s of visibility, flags and weights recorded in the cache, `None` if there is no cache. """
+        if not self.exists():
+            return
+        return [np.dtype(dtype) for dtype in self._read_index()['dtypes']]
+
+    def store(self,
+              visibility: np.ndarray,
+              flags: np.ndarray,
+              weights: np.ndarray,
+              receiver_names: list[str]):
+        """
+        Store visibility, flags and weights to one shard per receiver and add the receivers to the index.
+        Shards of receivers not in `receiver_names` are left untouched.
+        :param visibility: visibilities as 3-dimensional `numpy` array, `(time, frequency, receivers)`
+        :param flags: flags as 4-dimensional `numpy` array, `(1, time, frequency, receivers)`
+        :param weights: weights as 3-dimensional `numpy` array, `(time, frequency, receivers)`
+        :param receiver_names: `str` names of the receivers along the last axis of the arrays, e.g. `['m000h']`
+        :raise ValueError: if the time and frequency shape does not match the shards already in the cache
+        """
+        targets = self.create_shards(receiver_names=receiver_names,
+                                     shape=visibility.shape[:2],
+                                     dtypes=[visibility.dtype, flags.dtype, weights.dtype])
+        for target, array in zip(targets, [visibility, flags[0], weights]):
+            target[...] = array
+            target.flush()
+        self.add_to_index(receiver_names=receiver_names,
+                          shape=visibility.shape[:2],
+                          dtypes=[visibility.dtype, flags.dtype, weights.dtype])
+
+    def create_shards(self,
+                      receiver_names: list[str],
+                      shape: tuple[int, int],
+                      dtypes: list[np.dtype]) -> list[ReceiverShardedArray]:
+        """
+        Create empty writable shards of visibility, flags and weights for the receivers in `receiver_names`.
+        The receivers are only added to the index by `self.add_to_index()` once the shards are completely written.
+        Receivers already in the index are removed from it first, so interrupted writes never look valid, and their
+        shard directories are emptied. Shard directories of other receivers are left untouched, as they may be
+        written by another process at the same time.
+        :param receiver_names: `str` names of the receivers, e.g. `['m000h']`
+        :param shape: `(time, frequency)` shape of each shard
+        :param dtypes: `list` of the `dtype`s of visibility, flags and weights
+        :raise ValueError: if `shape` or `dtypes` do not match the shards already in the cache
+        :return: a `list` of `ReceiverShardedArray`s for visibility, flags and weights
+        """
+        self._check_compatibility(shape=shape, dtypes=dtypes)
+        self._remove_from_index(receiver_names=receiver_names)
+        for receiver_name in receiver_names:
+            shutil.rmtree(self._shard_directory(receiver_name=receiver_name), ignore_errors=True)
+            os.makedirs(self._shard_directory(receiver_name=receiver_name))
+        return [ReceiverShardedArray(shards=[
+            np.lib.format.open_memmap(self._file(receiver_name=receiver_name, name=name),
+                                      mode='w+',
+                                      dtype=dtype,
+                                      shape=tuple(shape))
+            for receiver_name in receiver_names
+        ]) for name, dtype in zip(self._array_names, dtypes)]
+
+    def add_to_index(self, receiver_names: list[str], shape: tuple[int, int], dtypes: list[np.dtype]):
+        """
+        Add `receiver_names` to the manifest together with the truncation check of their files,
+        after which their shards are regarded as valid cache. If no valid manifest exists, a new one is started.
+        If `self.codec` is set, the shards are compressed first.
+        :param receiver_names: `str` names of the receivers, e.g. `['m000h']`
+        :param shape: `(time, frequency)` shape of each shard
+        :param dtypes: `list` of the `dtype`s of visibility, flags and weights
+        :raise ValueError: if `shape` or `dtypes` do not match the shards already in the cache
+        """
+        self._check_compatibility(shape=shape, dtypes=dtypes)
+        cached_files = self._read_index()['receivers'] if self.exists() else {}
+        for receiver_name in receiver_names:
+            for name in self._array_names:
+                self._finalise_file(receiver_name=receiver_name, name=name)
+                self._sync(path=self._stored_file(receiver_name=receiver_name, name=name))
+            cached_files[receiver_name] = {
+                name: self._truncation_check(file=self._stored_file(receiver_name=receiver_name, name=name))
+                for name in self._array_names
+            }
+        self._write_index(receiver_files=cached_files, shape=shape, dtypes=dtypes)
+
+    def load(self, receiver_names: list[str], dumps: list[int] | None = None) \
+            -> tuple[np.ndarray | ReceiverStackedArray, np.ndarray, np.ndarray | ReceiverStackedArray]:
+        """
+        Return visibility, flags and weights of the receivers in `receiver_names`, only their shards are read.
+        The shards are opened copy-on-write, i.e. changes to the returned arrays are never written back to the
+        cache. The visibility and weights of a single receiver are views of its shards, those of several receivers
+        are `ReceiverStackedArray`s, which open a shard only when it is indexed. Uncompressed shards are
+        memory-mapped, so data is only read from disc when it is accessed. The flags are always unpacked in memory.
+        :param receiver_names: `str` names of the receivers to load
+        :param dumps: optional sorted dump indices to read, if `None`, all dumps are read
+        :return: a tuple of visibility, flags and weights
+        """
+        visibility, flags, weights = [
+            self._load_array(receiver_names=receiver_names, name=name, dumps=dumps) for name in self._array_names
+        ]
+        return visibility, flags[np.newaxis], weights
+
+    def _load_array(self, receiver_names: list[str], name: str, dumps: list[int] | None) \
+            -> np.ndarray | ReceiverStackedArray:
+        """
+        Return the 3-dimensional array called `name` of the receivers in `receiver_names`.
+        If `dumps` is given, only the contiguous dump ranges contained in `dumps` are read from each shard.
+        A single receiver is returned as a view of its shard, several receivers as a `ReceiverStackedArray`.
+        Flags are unpacked and stacked in memory one shard at a time.
+        """
+        def load_shard(i_receiver: int) -> np.ndarray:
+            shard = self._load_shard(receiver_name=receiver_names[i_receiver], name=name, dumps=dumps)
+            if name == 'flags':
+                shard = np.unpackbits(shard, axis=1, count=n_frequency).view(bool)
+            return shard
+
+        index = self._read_index()
+        n_time, n_frequency = index['shape']
+        if len(receiver_names) == 1:
+            return load_shard(i_receiver=0)[:, :, np.newaxis]
+        dtype = index['dtypes'][self._array_names.index(name)]
+        shape = (n_time if dumps is None else len(dumps), n_frequency, len(receiver_names))
+        if name != 'flags':
+            return ReceiverStackedArray(load_shard=load_shard, shape=shape, dtype=dtype)
+        flags = np.empty(shape, dtype=bool)
+        for i_receiver in range(len(receiver_names)):
+            flags[:, :, i_receiver] = load_shard(i_receiver=i_receiver)
+        return flags
+
+    def _load_shard(self, receiver_name: str, name: str, dumps: list[int] | None) -> np.ndarray:
+        """
+        Return the 2-dimensional shard of `receiver_name` called `name`, decompressed if it is compressed and
+        memory-mapped otherwise. If `dumps` is given, only these dumps are read.
+        """
+        compressed_file = self._compressed_file(receiver_name=receiver_name, name=name)
+        if os.path.exists(compressed_file):
+            return (self.codec or ChunkedCodec()).read(file=compressed_file, indices=dumps)
+        shard = np.load(self._file(receiver_name=receiver_name, name=name), mmap_mode='c')
+        if dumps is None:
+            return shard
+        return np.concatenate([shard[start:stop] for start, stop in self._contiguous_ranges(indices=dumps)])
+
+    @staticmethod
+    def _contiguous_ranges(indices: list[int]) -> list[tuple[int, int]]:
+        """ Return `indices`, which must be sorted, as a `list` of contiguous `(start, stop)` ranges. """
+        indices = np.asarray(indices, dtype=int)
+        if len(indices) == 0:
+            return [(0, 0)]
+        breaks = np.where(np.diff(indices) != 1)[0] + 1
+        starts = indices[np.concatenate([[0], breaks])]
+        stops = indices[np.concatenate([breaks - 1, [len(indices) - 1]])] + 1
+        return list(zip(starts.tolist(), stops.tolist()))
+
+    def _check_compatibility(self, shape: tuple[int, int], dtypes: list[np.dtype]):
+        """
+        Check if `shape` and `dtypes` match the shards already in the cache.
+        :raise ValueError: if the shapes or `dtype`s do not match
+        """
+        if not self.exists():
+            return
+        if (cached_shape := tuple(self._read_index()['shape'])) != tuple(shape):
+            raise ValueError(f'Cannot add receivers with shape {tuple(shape)} to cache with shape {cached_shape}.')
+        if (cached_dtypes := self.dtypes()) != [np.dtype(dtype) for dtype in dtypes]:
+            raise ValueError(f'Cannot add receivers with dtypes {dtypes} to cache with dtypes {cached_dtypes}.')
+
+    def _finalise_file(self, receiver_name: str, name: str):
+        """
+        Compress the written `npy` file of `receiver_name` called `name` and remove it if `self.codec` is set,
+        otherwise remove an outdated compressed file of the same array. Flags are packed first.
+        """
+        file = self._file(receiver_name=receiver_name, name=name)
+        compressed_file = self._compressed_file(receiver_name=receiver_name, name=name)
+        if name == 'flags':
+            self._pack_flags(file=file)
+        if self.codec is None:
+            if os.path.exists(compressed_file):
+                os.remove(compressed_file)
+            return
+        if not os.path.exists(file):
+            return
+        self.codec.write(file=compressed_file, array=np.load(file, mmap_mode='r'))
+        os.remove(file)
+
+    @staticmethod
+    def _pack_flags(file: str):
+        """
+        Replace the boolean flags in the `npy` file `file` by their bits packed along the frequency axis.
+        Nothing is done if `file` does not exist or is packed already.
+        """
+        if not os.path.exists(file) or (flags := np.load(file, mmap_mode='r')).dtype != bool:
+            return
+        temporary_file = f'{file}.tmp'
+        with open(temporary_file, 'wb') as packed_file:
+            np.save(packed_file, np.packbits(flags, axis=1))
+        del flags
+        os.replace(temporary_file, file)
+
+    def _remove_from_index(self, receiver_names: list[str]):
+        """ Remove `receiver_names` from the manifest if they are in it. """
+        if not self.exists():
+            return
+        index = self._read_index()
+        if not any(receiver_name in index['receivers'] for receiver_name in receiver_names):
+            return
+        for receiver_name in receiver_names:
+            index['receivers'].pop(receiver_name, None)
+        self._write_index(receiver_files=index['receivers'], shape=index['shape'], dtypes=index['dtypes'])
+
+    @staticmethod
+    def _sync(path: str):
+        """ Flush the file or directory at `path` to disc. """
+        file_descriptor = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(file_descriptor)
+        finally:
+            os.close(file_descriptor)
+
+    def _is_intact(self, receiver_name: str, truncation_checks: dict[str, dict]) -> bool:
+        """ Return `True` if all files of `receiver_name` pass their recorded `truncation_checks`. """
+        for name in self._array_names:
+            file = self._stored_file(receiver_name=receiver_name, name=name)
+            if not os.path.exists(file) or self._truncation_check(file=file) != truncation_checks.get(name):
+                return False
+        return True
+
+    def _truncation_check(self, file: str) -> dict[str, int]:
+        """
+        Return the size in bytes and a CRC32 of the first and last `self._truncation_check_block_size` bytes of
+        `file`. The size detects truncated files, the CRC32 detects overwritten headers and partially written data,
+        both without reading the entire file. It is not a checksum of the entire file.
+        """
+        size = os.path.getsize(file)
+        block_size = self._truncation_check_block_size
+        with open(file, 'rb') as opened_file:
+            head_tail_crc32 = zlib.crc32(opened_file.read(block_size))
+            if size > block_size:
+                opened_file.seek(max(block_size, size - block_size))
+                head_tail_crc32 = zlib.crc32(opened_file.read(), head_tail_crc32)
+        return {'size': size, 'head_tail_crc32': head_tail_crc32}
+
+    def _read_index(self) -> dict:
+        """ Return the content of the manifest file. """
+        with open(self._index_file()) as index_file:
+            return json.load(index_file)
+
+    def _write_index(self, receiver_files: dict[str, dict], shape: tuple[int, int], dtypes: list[np.dtype]):
+        """
+        Write the manifest with the file truncation checks per receiver in `receiver_files`, the shard `shape` and
+        the `dtypes`. The manifest is written to a temporary file first, flushed to disc and then moved in place,
+        which makes it a durable marker of the completely written shards.
+        """
+        os.makedirs(self.cache_directory, exist_ok=True)
+        temporary_file = f'{self._index_file()}.tmp'
+        with open(temporary_file, 'w') as index_file:
+            json.dump({'version': self._version,
+                       'name': self.dataset_name,
+                       'selection': self.selection,
+                       'receivers': receiver_files,
+                       'shape': list(shape),
+                       'dtypes': [np.dtype(dtype).name for dtype in dtypes]},
+                      index_file)
+            index_file.flush()
+            os.fsync(index_file.fileno())
+        os.replace(temporary_file, self._index_file())
+        self._sync(path=self.cache_directory)
+
+    def _index_file(self) -> str:
+        """ Return the path of the index file. """
+        return os.path.join(self.cache_directory, self._index_file_name)
+
+    def _shard_directory(self, receiver_name: str) -> str:
+        """ Return the directory of the shard belonging to `receiver_name`. """
+        return os.path.join(self.cache_directory, receiver_name)
+
+    def _file(self, receiver_name: str, name: str) -> str:
+        """ Return the path of the `npy` file storing the array called `name` of receiver `receiver_name`. """
+        return os.path.join(self._shard_directory(receiver_name=receiver_name), f'{name}.npy')
+
+    def _compressed_file(self, receiver_name: str, name: str) -> str:
+        """ Return the path of the compressed file storing the array called `name` of receiver `receiver_name`. """
+        return os.path.join(self._shard_directory(receiver_name=receiver_name), f'{name}.npc')
+
+    def _stored_file(self, receiver_name: str, name: str) -> str:
+        """ Return the path of the compressed file of array `name` if it exists, else the path of the `npy` file. """
+        compressed_file = self._compressed_file(receiver_name=receiver_name, name=name)
+        if os.path.exists(compressed_file):
+            return compressed_file
+        return self._file(receiver_name=receiver_name, name=name)
@@ -19,6 +19,15 @@ InPlugin = ConfigSection(
     do_save_visibility_to_disc=True,
     do_store_context=False,
     context_folder=None,  # directory to store results, if `None`, 'results/' is chosen
+    weights_dtype='float64',  # 'float32' halves the memory and cache size of the weights
+    channels=None,  # optional `range` of channel indices to load, e.g. `range(570, 765)`, `None` means all
+    frequency_range=None,  # optional lower and upper frequency [MHz] limits to load, e.g. `(975, 1015)`
+    cache_max_bytes=None,  # optional byte budget of the cache directory, e.g. `500 * 1024 ** 3`, `None` means no limit
+    cache_codec=None,  # 'zlib', 'bz2' or 'lzma' compresses the cache in parallel chunks, `None` means uncompressed
+    cache_compression_level=None,  # compression level of `cache_codec`, `None` means the codec's default
+    loader_threads=None,  # number of threads to load the correlator data with, `None` means the `dask` default
+    loader_dump_batch_size=None,  # minimum dumps per chunk-aligned read, `None` means all dumps at once
+    loader_report_progress=False,  # if `True`, loading progress and throughput are printed
 )
 OutPlugin = ConfigSection(
     output_folder=None  # folder to store results, `None` means default location is chosen
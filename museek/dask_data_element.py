@@ -0,0 +1,238 @@
+import numbers
+from typing import Callable, Union
+
+import dask.array as da
+import numpy as np
+import scipy
+
+from museek.data_element import DataElement
+
+
+class DaskDataElement(DataElement):
+    """
+    `DataElement` wrapping a `dask` array, e.g. the visibility of a `katdal` `DataSet`, which is not loaded to memory.
+    Indexing, arithmetic and reductions only extend the `dask` graph, the result is computed chunk by chunk when
+    `self.compute()` or `self.squeeze` is called. Reductions of data larger than the memory are therefore possible.
+    The `flags` of the reductions can be a `FlagList` or a boolean `DaskDataElement`, which is not computed.
+    """
+
+    def __init__(self, array: da.Array | np.ndarray):
+        """
+        :param array: a `dask` or `numpy` array of shape `(n_dump | 1, n_frequency | 1, n_receiver | 1)`,
+                      a `numpy` array is wrapped in a `dask` array with automatic chunks
+        :raise ValueError: if `array is not 3-dimensional
+        """
+        super().__init__(array=da.asarray(array))
+
+    def __eq__(self, other: DataElement):
+        """ Return `True` if the computed underlying arrays are equal. """
+        if self.shape != other.shape:
+            return False
+        return bool((self.array == other.array).all().compute())
+
+    def __getitem__(self, index: int | list[int]) -> np.ndarray:
+        """ Returns `numpy`s getitem evaluated at `index` coupled with a `squeeze` after computing. """
+        return np.squeeze(self.array[index].compute())
+
+    def __str__(self):
+        """ Return the string of the underlying `dask` array, no data is computed. """
+        return str(self.array)
+
+    @property
+    def squeeze(self) -> np.ndarray:
+        """ Computes and returns a `numpy` `array` containing the all dumps of `self` without redundant dimensions. """
+        return self.compute().squeeze
+
+    def compute(self) -> DataElement:
+        """ Compute the `dask` graph and return the result as an in-memory `DataElement`. """
+        return DataElement(array=self.array.compute())
+
+    def get(self,
+            *,  # force named parameters
+            time: int | list[int] | slice | range | None = None,
+            freq: int | list[int] | slice | range | None = None,
+            recv: int | list[int] | slice | range | None = None,
+            copy: bool = True,
+            ) -> 'DaskDataElement':
+        """
+        Simplified indexing, only the `dask` graph is extended.
+        :param time: indices or slice along the zeroth (dump) axis
+        :param freq: indices or slice along the first (frequency) axis
+        :param recv: indices or slice along the second (receiver) axis
+        :param copy: ignored, `dask` arrays are never changed in place
+        :return: `self` indexed at the input indices
+        """
+        array = self.array
+        for axis, index in enumerate([time, freq, recv]):
+            basic, gather = self._split_index(index=index, length=array.shape[axis])
+            array = array[(slice(None),) * axis + (basic,)]
+            if gather is not None:
+                array = array[(slice(None),) * axis + (gather,)]
+        return DaskDataElement(array=array)
+
+    def sum(self, axis: int | list[int, int] | tuple[int, int]) -> 'DaskDataElement':
+        """ Return the sum of `self` along `axis` as a `DaskDataElement`, i.e. the dimensions are kept. """
+        return DaskDataElement(array=da.sum(self.array, axis=axis, keepdims=True))
+
+    def min(self, axis: int | list[int, int] | tuple[int, int]) -> 'DaskDataElement':
+        """ Wrapper of `dask.array.min()`. """
+        return DaskDataElement(array=da.min(self.array, axis=axis, keepdims=True))
+
+    def max(self, axis: int | list[int, int] | tuple[int, int]) -> 'DaskDataElement':
+        """ Wrapper of `dask.array.max()`. """
+        return DaskDataElement(array=da.max(self.array, axis=axis, keepdims=True))
+
+    def reduce_by_groups(
+            self,
+            operations: list[str],
+            labels: np.ndarray | list[int] | None = None,
+            boundaries: np.ndarray | list[int] | None = None,
+            flags: Union['FlagList', DataElement, None] = None,
+            n_groups: int | None = None
+    ) -> dict[str, 'DaskDataElement']:
+        """
+        Reduce groups of dumps of `self` along the time axis like `DataElement.reduce_by_groups()`, but lazily
+        with one `dask` reduction per group, the results are concatenated along the time axis.
+        :param operations: `list` of reductions to return, any of `'count'`, `'sum'`, `'mean'`, `'standard_deviation'`
+        :param labels: group index of each dump, dumps with negative labels belong to no group
+        :param boundaries: increasing dump indices, group `i` contains the dumps `boundaries[i]:boundaries[i + 1]`
+        :param flags: optional, only entries not flagged by these are used
+        :param n_groups: optional number of groups defined by `labels`, if `None`, it is the largest label plus one
+        :raise ValueError: if not exactly one of `labels` and `boundaries` is given, if they do not fit the time axis,
+                           if `n_groups` is given with `boundaries` or is not larger than all `labels`
+                           or if an operation is unknown
+        :return: `dict` of the `DaskDataElement`s of shape `(n_group, n_frequency, n_receiver)` keyed by operation
+        """
+        group_dumps, sizes = self._group_dumps(operations=operations,
+                                               labels=labels,
+                                               boundaries=boundaries,
+                                               n_groups=n_groups)
+        array = self.array[group_dumps]
+        if flags is None:
+            unflagged = da.ones_like(array, dtype=bool)
+        else:
+            unflagged = ~self._mask(flags=flags)[group_dumps]
+        reductions = {operation: [] for operation in ['count', 'sum', 'mean', 'standard_deviation']}
+        for start, size in zip(np.cumsum(sizes) - sizes, sizes):
+            group_unflagged = unflagged[start:start + size]
+            group_array = da.where(group_unflagged, array[start:start + size], 0)
+            count = group_unflagged.sum(axis=0, keepdims=True)
+            total = group_array.sum(axis=0, keepdims=True)
+            mean = da.where(count > 0, total / da.maximum(count, 1), 0)
+            reductions['count'].append(count)
+            reductions['sum'].append(total)
+            reductions['mean'].append(mean)
+            if 'standard_deviation' in operations:
+                deviation = da.where(group_unflagged, group_array - mean, 0)
+                variance = da.where(count > 0, (deviation ** 2).sum(axis=0, keepdims=True) / da.maximum(count, 1), 0)
+                reductions['standard_deviation'].append(da.sqrt(variance))
+        empty = self._concatenate_groups(reductions=reductions['count']) == 0
+        results = {operation: self._concatenate_groups(reductions=reductions[operation]) for operation in operations}
+        return {operation: DaskDataElement(array=da.ma.masked_array(result, mask=empty)
+                                           if operation in ['mean', 'standard_deviation'] else result)
+                for operation, result in results.items()}
+
+    def _apply_operation(self,
+                         operation: np.ufunc,
+                         other: Union[DataElement, np.ndarray, da.Array, numbers.Number],
+                         out: Union[DataElement, np.ndarray, None]) -> 'DaskDataElement':
+        """
+        Apply the binary `operation` to `self` and `other` lazily and return the result as a `DaskDataElement`.
+        If `out` is `self`, the `dask` graph of `self` is replaced by the result, other targets are not supported.
+        :raise ValueError: if the shapes of `self` and `other` cannot be broadcast or `out` is not `self`
+        """
+        if not isinstance(other, DataElement | np.ndarray | da.Array | numbers.Number):
+            return NotImplemented
+        if isinstance(other, DataElement):
+            other = other.array
+        if not isinstance(other, numbers.Number):
+            self._check_broadcastable(shape=other.shape)
+        result = operation(self.array, other)
+        if out is None:
+            return DaskDataElement(array=result)
+        if out is not self:
+            raise ValueError('Input `out` of a `DaskDataElement` operation can only be the element itself.')
+        if result.shape != self.shape:
+            raise ValueError(f'Input `out` must have the shape of the result {result.shape}, got {self.shape}.')
+        self.array = result
+        return self
+
+    def _mean(self, axis: int | list[int, int] | tuple[int, int]) -> 'DaskDataElement':
+        """ Return a `DaskDataElement` created from the output of `dask.array.mean` applied along `axis`. """
+        return DaskDataElement(array=da.mean(self.array, axis=axis, keepdims=True))
+
+    def _median(self, axis: int | list[int, int] | tuple[int, int]) -> 'DaskDataElement':
+        """ Return a `DaskDataElement` of the median along `axis`, computed block by block along the other axes. """
+        return self._reduce_blocks(function=np.median, axis=axis)
+
+    def _std(self, axis: int | list[int, int] | tuple[int, int]) -> 'DaskDataElement':
+        """ Return a `DaskDataElement` created from the output of `dask.array.std` applied along `axis`. """
+        return DaskDataElement(array=da.std(self.array, axis=axis, keepdims=True))
+
+    def _kurtosis(self, axis: int | list[int, int] | tuple[int, int]) -> 'DaskDataElement':
+        """ Return a `DaskDataElement` of the kurtosis along `axis`, computed block by block along the other axes. """
+        return self._reduce_blocks(function=scipy.stats.kurtosis, axis=axis)
+
+    def _flagged_mean(self, axis: int | list[int, int] | tuple[int, int], flags: 'FlagList') -> 'DaskDataElement':
+        """ Return the mean of the entries in `self` not flagged by `flags` along `axis` as a `DaskDataElement`. """
+        return DaskDataElement(array=self._masked(flags=flags).mean(axis=axis, keepdims=True))
+
+    def _flagged_median(self, axis: int | list[int, int] | tuple[int, int], flags: 'FlagList') -> 'DaskDataElement':
+        """ Return the median of the entries in `self` not flagged by `flags` along `axis` as a `DaskDataElement`. """
+        return self._reduce_blocks(function=np.ma.median, axis=axis, flags=flags)
+
+    def _flagged_std(self, axis: int | list[int, int] | tuple[int, int], flags: 'FlagList') -> 'DaskDataElement':
+        """
+        Return the standard deviation of the entries in `self` not flagged by `flags` along `axis`
+        as a `DaskDataElement`.
+        """
+        return DaskDataElement(array=self._masked(flags=flags).std(axis=axis, keepdims=True))
+
+    def _flagged_kurtosis(self, axis: int | list[int, int] | tuple[int, int], flags: 'FlagList') -> 'DaskDataElement':
+        """
+        Return the kurtosis of the entries in `self` not flagged by `flags` along `axis` as a `DaskDataElement`.
+        """
+        return self._reduce_blocks(function=scipy.stats.kurtosis, axis=axis, flags=flags)
+
+    def _masked(self, flags: Union['FlagList', DataElement]) -> da.Array:
+        """ Return `self.array` as a masked `dask` array, masked where `flags` are set, see `self._mask()`. """
+        return da.ma.masked_array(self.array, mask=self._mask(flags=flags))
+
+    def _mask(self, flags: Union['FlagList', DataElement]) -> da.Array:
+        """
+        Return the boolean mask of `flags` broadcast to the shape of `self` as a `dask` array. `flags` is either a
+        `FlagList`, masking where any of its flags is set, or a boolean `DataElement`, e.g. the `DaskDataElement`
+        of the flags returned by `TimeOrderedData.dask_visibility_flags_weights()`, which is not computed.
+        """
+        if isinstance(flags, DataElement):
+            mask = flags.array
+        else:
+            mask = flags.combine(threshold=1).array
+        return da.broadcast_to(da.asarray(mask).astype(bool), self.shape)
+
+    def _concatenate_groups(self, reductions: list[da.Array]) -> da.Array:
+        """ Return the per group `reductions` concatenated along the time axis, they may be an empty `list`. """
+        if not reductions:
+            return da.zeros((0,) + self.shape[1:], dtype=np.int64)
+        return da.concatenate(reductions, axis=0)
+
+    def _reduce_blocks(self,
+                       function: Callable,
+                       axis: int | list[int, int] | tuple[int, int],
+                       flags: Union['FlagList', None] = None) -> 'DaskDataElement':
+        """
+        Apply `function`, a reduction taking `axis` and `keepdims` arguments, to blocks of `self` which span the
+        complete `axis`. Only reductions without a `dask` equivalent, e.g. the median, need this.
+        :param function: the reduction, e.g. `np.median`
+        :param axis: axis along which to reduce
+        :param flags: optional, `function` is applied to a masked array that masks the entries flagged by these,
+                      a `FlagList` or a boolean `DataElement`
+        :return: `DaskDataElement` containing the reduction along `axis`
+        """
+        axes = tuple(sorted({axis % 3} if isinstance(axis, int | np.integer) else {axis_ % 3 for axis_ in axis}))
+        array = self._masked(flags=flags) if flags is not None else self.array
+        array = array.rechunk({axis_: -1 for axis_ in axes})
+        chunks = tuple((1,) if axis_ in axes else chunks for axis_, chunks in enumerate(array.chunks))
+        return DaskDataElement(array=array.map_blocks(lambda block: function(block, axis=axes, keepdims=True),
+                                                      chunks=chunks,
+                                                      dtype=np.result_type(array.dtype, np.float64)))
@@ -5,6 +5,7 @@ import numpy as np
 import scipy
 
 from museek.abstract_data_element import AbstractDataElement
+from museek.util.masked_reductions import masked_median, masked_kurtosis
 
 
 class DataElement(AbstractDataElement):
@@ -17,58 +18,102 @@ class DataElement(AbstractDataElement):
     def __mul__(self, other: Union['DataElement', np.ndarray, numbers.Number]) -> 'DataElement':
         """
         Multiplication of two `DataElement`s and of one `DataElement` with a `np.ndarray` or any `Number`.
-        :raise ValueError: if the shapes of `self` and `other` do not match
+        :raise ValueError: if the shapes of `self` and `other` cannot be broadcast
         """
-        if not isinstance(other, numbers.Number):
-            if self.shape != other.shape:
-                raise ValueError(f'Cannot multiply instances with different shapes, '
-                                 f'got {self.shape} and {other.shape}.')
-        if isinstance(other, DataElement):
-            return DataElement(array=self.array * other.array)
-        if isinstance(other, np.ndarray | numbers.Number):
-            return DataElement(array=self.array * other)
+        return self.multiply(other=other)
 
     def __truediv__(self, other: Union['DataElement', np.ndarray, numbers.Number]) -> 'DataElement':
         """
         Division of two `DataElement`s and of one `DataElement` with a `np.ndarray` or any `Number`.
-        :raise ValueError: if the shapes of `self` and `other` do not match
+        :raise ValueError: if the shapes of `self` and `other` cannot be broadcast
         """
-        if not isinstance(other, numbers.Number):
-            if self.shape != other.shape:
-                raise ValueError(f'Cannot multiply instances with different shapes, '
-                                 f'got {self.shape} and {other.shape}.')
-        if isinstance(other, DataElement):
-            return DataElement(array=self.array / other.array)
-        if isinstance(other, np.ndarray | numbers.Number):
-            return DataElement(array=self.array / other)
+        return self.divide(other=other)
 
     def __sub__(self, other: Union['DataElement', np.ndarray, numbers.Number]) -> 'DataElement':
         """
         Subtraction of two `DataElement`s and of one `DataElement` with a `np.ndarray` or any `Number`.
-        :raise ValueError: if the shapes of `self` and `other` do not match
+        :raise ValueError: if the shapes of `self` and `other` cannot be broadcast
         """
-        if not isinstance(other, numbers.Number):
-            if self.shape != other.shape:
-                raise ValueError(f'Cannot subtract instances with different shapes, '
-                                 f'got {self.shape} and {other.shape}.')
-        if isinstance(other, DataElement):
-            return DataElement(array=self.array - other.array)
-        if isinstance(other, np.ndarray | numbers.Number):
-            return DataElement(array=self.array - other)
+        return self.subtract(other=other)
 
     def __add__(self, other: Union['DataElement', np.ndarray, numbers.Number]) -> 'DataElement':
         """
         Addition of two `DataElement`s and of one `DataElement` with a `np.ndarray` or any `Number`.
-        :raise ValueError: if the shapes of `self` and `other` do not match
+        :raise ValueError: if the shapes of `self` and `other` cannot be broadcast
         """
-        if not isinstance(other, numbers.Number):
-            if self.shape != other.shape:
-                raise ValueError(f'Cannot add instances with different shapes, '
-                                 f'got {self.shape} and {other.shape}.')
-        if isinstance(other, DataElement):
-            return DataElement(array=self.array + other.array)
-        if isinstance(other, np.ndarray | numbers.Number):
-            return DataElement(array=self.array + other)
+        return self.add(other=other)
+
+    def __imul__(self, other: Union['DataElement', np.ndarray, numbers.Number]) -> 'DataElement':
+        """
+        In-place multiplication of `self` with a `DataElement`, a `np.ndarray` or any `Number`.
+        :raise ValueError: if `other` cannot be broadcast to the shape of `self`
+        """
+        return self.multiply(other=other, out=self)
+
+    def __itruediv__(self, other: Union['DataElement', np.ndarray, numbers.Number]) -> 'DataElement':
+        """
+        In-place division of `self` by a `DataElement`, a `np.ndarray` or any `Number`.
+        :raise ValueError: if `other` cannot be broadcast to the shape of `self`
+        """
+        return self.divide(other=other, out=self)
+
+    def __isub__(self, other: Union['DataElement', np.ndarray, numbers.Number]) -> 'DataElement':
+        """
+        In-place subtraction of a `DataElement`, a `np.ndarray` or any `Number` from `self`.
+        :raise ValueError: if `other` cannot be broadcast to the shape of `self`
+        """
+        return self.subtract(other=other, out=self)
+
+    def __iadd__(self, other: Union['DataElement', np.ndarray, numbers.Number]) -> 'DataElement':
+        """
+        In-place addition of a `DataElement`, a `np.ndarray` or any `Number` to `self`.
+        :raise ValueError: if `other` cannot be broadcast to the shape of `self`
+        """
+        return self.add(other=other, out=self)
+
+    def multiply(self,
+                 other: Union['DataElement', np.ndarray, numbers.Number],
+                 out: Union['DataElement', np.ndarray, None] = None) -> 'DataElement':
+        """
+        Return the product of `self` and `other`, broadcasting axes of length one.
+        :param other: a `DataElement`, a 3-dimensional `np.ndarray` or any `Number`
+        :param out: optional `DataElement` or `np.ndarray` to write the result to, e.g. `self`
+        :raise ValueError: if the shapes of `self` and `other` cannot be broadcast or do not fit into `out`
+        """
+        return self._apply_operation(operation=np.multiply, other=other, out=out)
+
+    def divide(self,
+               other: Union['DataElement', np.ndarray, numbers.Number],
+               out: Union['DataElement', np.ndarray, None] = None) -> 'DataElement':
+        """
+        Return `self` divided by `other`, broadcasting axes of length one.
+        :param other: a `DataElement`, a 3-dimensional `np.ndarray` or any `Number`
+        :param out: optional `DataElement` or `np.ndarray` to write the result to, e.g. `self`
+        :raise ValueError: if the shapes of `self` and `other` cannot be broadcast or do not fit into `out`
+        """
+        return self._apply_operation(operation=np.true_divide, other=other, out=out)
+
+    def subtract(self,
+                 other: Union['DataElement', np.ndarray, numbers.Number],
+                 out: Union['DataElement', np.ndarray, None] = None) -> 'DataElement':
+        """
+        Return `self` minus `other`, broadcasting axes of length one.
+        :param other: a `DataElement`, a 3-dimensional `np.ndarray` or any `Number`
+        :param out: optional `DataElement` or `np.ndarray` to write the result to, e.g. `self`
+        :raise ValueError: if the shapes of `self` and `other` cannot be broadcast or do not fit into `out`
+        """
+        return self._apply_operation(operation=np.subtract, other=other, out=out)
+
+    def add(self,
+            other: Union['DataElement', np.ndarray, numbers.Number],
+            out: Union['DataElement', np.ndarray, None] = None) -> 'DataElement':
+        """
+        Return the sum of `self` and `other`, broadcasting axes of length one.
+        :param other: a `DataElement`, a 3-dimensional `np.ndarray` or any `Number`
+        :param out: optional `DataElement` or `np.ndarray` to write the result to, e.g. `self`
+        :raise ValueError: if the shapes of `self` and `other` cannot be broadcast or do not fit into `out`
+        """
+        return self._apply_operation(operation=np.add, other=other, out=out)
 
     def mean(
             self,
@@ -134,6 +179,59 @@ class DataElement(AbstractDataElement):
             return self._kurtosis(axis=axis)
         return self._flagged_kurtosis(axis=axis, flags=flags)
 
+    def reduce_by_groups(
+            self,
+            operations: list[str],
+            labels: np.ndarray | list[int] | None = None,
+            boundaries: np.ndarray | list[int] | None = None,
+            flags: Union['FlagList', None] = None,
+            n_groups: int | None = None
+    ) -> dict[str, 'DataElement']:
+        """
+        Reduce groups of dumps of `self` along the time axis in one vectorised pass instead of one `get()` and
+        reduction per group. Group `i` of the results is found at dump index `i`. Groups without any unflagged
+        entry are masked in the `'mean'` and `'standard_deviation'` results.
+        :param operations: `list` of reductions to return, any of `'count'`, `'sum'`, `'mean'`, `'standard_deviation'`
+        :param labels: group index of each dump, dumps with negative labels belong to no group
+        :param boundaries: increasing dump indices, group `i` contains the dumps `boundaries[i]:boundaries[i + 1]`
+        :param flags: optional, only entries not flagged by these are used
+        :param n_groups: optional number of groups defined by `labels`, if `None`, it is the largest label plus one,
+                         trailing groups without any dump are only returned if this is given
+        :raise ValueError: if not exactly one of `labels` and `boundaries` is given, if they do not fit the time axis,
+                           if `n_groups` is given with `boundaries` or is not larger than all `labels`
+                           or if an operation is unknown
+        :return: `dict` of the `DataElement`s of shape `(n_group, n_frequency, n_receiver)` keyed by operation
+        """
+        group_dumps, sizes = self._group_dumps(operations=operations,
+                                               labels=labels,
+                                               boundaries=boundaries,
+                                               n_groups=n_groups)
+        array = self.array[group_dumps]
+        starts = np.cumsum(sizes) - sizes
+
+        def group_sums(summand: np.ndarray) -> np.ndarray:
+            result = np.zeros((len(sizes),) + summand.shape[1:], dtype=summand.dtype)
+            result[sizes > 0] = np.add.reduceat(summand, starts[sizes > 0], axis=0)
+            return result
+
+        if flags is None:
+            unflagged = np.ones((1, 1, 1), dtype=bool)
+            count = np.broadcast_to(sizes[:, np.newaxis, np.newaxis], (len(sizes),) + self.shape[1:])
+            total = group_sums(array)
+        else:
+            unflagged = ~np.broadcast_to(flags.combine(threshold=1).array, self.shape)[group_dumps]
+            count = group_sums(unflagged.astype(np.int64))
+            total = group_sums(np.where(unflagged, array, 0))
+        mean = self._divide_by_count(total, count=count)
+        results = {'count': DataElement(array=count),
+                   'sum': DataElement(array=total),
+                   'mean': DataElement(array=np.ma.masked_array(mean, mask=count == 0))}
+        if 'standard_deviation' in operations:
+            deviation = np.where(unflagged, array - np.repeat(mean, sizes, axis=0), 0)
+            variance = self._divide_by_count(group_sums(deviation ** 2), count=count)
+            results['standard_deviation'] = DataElement(array=np.ma.masked_array(np.sqrt(variance), mask=count == 0))
+        return {operation: results[operation] for operation in operations}
+
     def sum(self, axis: int | list[int, int] | tuple[int, int]) -> 'DataElement':
         """ Return the sum of `self` along `axis` as a `DataElement`, i.e. the dimensions are kept. """
         return DataElement(array=np.sum(self.array, axis=axis, keepdims=True))
@@ -146,6 +244,49 @@ class DataElement(AbstractDataElement):
         """ Wrapper of `numpy.max(). """
         return DataElement(array=np.max(self.array, axis=axis, keepdims=True))
 
+    def _apply_operation(self,
+                         operation: np.ufunc,
+                         other: Union['DataElement', np.ndarray, numbers.Number],
+                         out: Union['DataElement', np.ndarray, None]) -> 'DataElement':
+        """
+        Apply the binary `operation` to `self` and `other` and return the result as a `DataElement`.
+        If `out` is given, the result is written to it without allocating a new array.
+        :param operation: a binary `numpy` `ufunc`, e.g. `np.multiply`
+        :param other: a `DataElement`, a 3-dimensional `np.ndarray` or any `Number`
+        :param out: optional `DataElement` or `np.ndarray` to write the result to
+        :raise ValueError: if the shapes of `self` and `other` cannot be broadcast or do not fit into `out`
+                           or if `out` is read-only, e.g. a view returned by `get(copy=False)`
+        :return: the result or `NotImplemented` if the type of `other` is not supported, so that `python` tries
+                 the reflected operator of `other`, e.g. of a `LazyDataElement`
+        """
+        if not isinstance(other, DataElement | np.ndarray | numbers.Number):
+            return NotImplemented
+        if isinstance(other, DataElement):
+            other = other.array
+        if not isinstance(other, numbers.Number):
+            self._check_broadcastable(shape=other.shape)
+        if out is None:
+            return DataElement(array=operation(self.array, other))
+        out_array = out.array if isinstance(out, DataElement) else out
+        result_shape = np.broadcast_shapes(self.shape, np.shape(other))
+        if out_array.shape != result_shape:
+            raise ValueError(f'Input `out` must have the shape of the result {result_shape}, got {out_array.shape}.')
+        if isinstance(out_array, np.ndarray) and not out_array.flags.writeable:
+            raise ValueError('Input `out` is read-only, it is probably a view returned by `get(copy=False)`, '
+                             'use `get()` for a writable copy.')
+        operation(self.array, other, out=out_array)
+        return out if isinstance(out, DataElement) else DataElement(array=out_array)
+
+    def _check_broadcastable(self, shape: tuple[int, ...]):
+        """
+        Check that `shape` and the shape of `self` are equal along each axis unless one of them is `1`.
+        :raise ValueError: if `shape` is not 3-dimensional or the shapes cannot be broadcast
+        """
+        if len(shape) != 3 or any(size != other_size and 1 not in (size, other_size)
+                                  for size, other_size in zip(self.shape, shape)):
+            raise ValueError(f'Cannot combine instances with shapes {self.shape} and {shape}, '
+                             f'axes must be equal or of length 1.')
+
     def _mean(self, axis: int | list[int, int] | tuple[int, int]) -> 'DataElement':
         """ Return a `DataElement` created from the output of `np.mean` applied along `axis`. """
         return DataElement(array=np.mean(self.array, axis=axis, keepdims=True))
@@ -165,49 +306,110 @@ class DataElement(AbstractDataElement):
     def _flagged_mean(self, axis: int | list[int, int] | tuple[int, int], flags: 'FlagList') -> 'DataElement':
         """
         Return the mean of the unflagged entries in `self` along `axis` as a `DataElement`,
-        i.e. the dimensions are kept.
+        i.e. the dimensions are kept. Entries without any unflagged value are masked.
         :param axis: axis along which to calculate the mean
         :param flags: only entries not flagged by these are used
         :return: `DataElement` containing the mean along `axis`
         """
-        combined = flags.combine(threshold=1)
-        masked = np.ma.masked_array(self.array, combined.array)
-        return DataElement(array=masked.mean(axis=axis, keepdims=True))
+        unflagged, count = self._unflagged_and_count(axis=axis, flags=flags)
+        mean = self._divide_by_count(np.sum(self.array, axis=axis, keepdims=True, where=unflagged), count=count)
+        return DataElement(array=np.ma.masked_array(mean, mask=count == 0))
 
     def _flagged_median(self, axis: int | list[int, int] | tuple[int, int], flags: 'FlagList') -> 'DataElement':
         """
         Return the median of the unflagged entries in `self` along `axis` as a `DataElement`,
-        i.e. the dimensions are kept.
+        i.e. the dimensions are kept. Entries without any unflagged value are masked.
         :param axis: axis along which to calculate the median
         :param flags: only entries not flagged by these are used
         :return: `DataElement` containing the median along `axis`
         """
-        combined = flags.combine(threshold=1)
-        masked = np.ma.masked_array(self.array, combined.array)
-        return DataElement(array=np.ma.median(masked, axis=axis, keepdims=True))
-
+        mask = flags.combine(threshold=1).array
+        median = masked_median(array=self.array, mask=mask, axis=axis)
+        count = np.sum(~np.broadcast_to(mask, self.shape), axis=axis, keepdims=True)
+        return DataElement(array=np.ma.masked_array(median, mask=count == 0))
 
     def _flagged_std(self, axis: int | list[int, int] | tuple[int, int], flags: 'FlagList') -> 'DataElement':
         """
         Return the standard deviation of the unflagged entries in `self` along `axis` as a `DataElement`,
-        i.e. the dimensions are kept.
+        i.e. the dimensions are kept. Entries without any unflagged value are masked.
         :param axis: axis along which to calculate the mean
         :param flags: only entries not flagged by these are used
         :return: `DataElement` containing the standard deviation along `axis`
         """
-        combined = flags.combine(threshold=1)
-        masked = np.ma.masked_array(self.array, combined.array)
-        return DataElement(array=masked.std(axis=axis, keepdims=True))
+        unflagged, count = self._unflagged_and_count(axis=axis, flags=flags)
+        mean = self._divide_by_count(np.sum(self.array, axis=axis, keepdims=True, where=unflagged), count=count)
+        deviation = np.subtract(self.array, mean, out=np.zeros(self.shape), where=unflagged)
+        variance = self._divide_by_count(np.sum(deviation ** 2, axis=axis, keepdims=True), count=count)
+        return DataElement(array=np.ma.masked_array(np.sqrt(variance), mask=count == 0))
 
     def _flagged_kurtosis(self, axis: int | list[int, int] | tuple[int, int], flags: 'FlagList') -> 'DataElement':
         """
         Return the kurtosis of the unflagged entries in `self` along `axis` as a `DataElement`,
-        i.e. the dimensions are kept.
+        i.e. the dimensions are kept. Entries without any unflagged value are `nan`.
         :param axis: axis along which to calculate the kurtosis
         :param flags: only entries not flagged by these are used
         :return: `DataElement` containing the kurtosis along `axis`
         """
-        combined = flags.combine(threshold=1)
-        masked = np.ma.masked_array(self.array, combined.array)
-        return DataElement(array=scipy.stats.kurtosis(masked, axis=axis, keepdims=True))
+        return DataElement(array=masked_kurtosis(array=self.array, mask=flags.combine(threshold=1).array, axis=axis))
+
+    def _unflagged_and_count(self, axis: int | list[int, int] | tuple[int, int], flags: 'FlagList') \
+            -> tuple[np.ndarray, np.ndarray]:
+        """
+        Return a boolean array of the entries in `self` not flagged by `flags` and their number along `axis`.
+        """
+        unflagged = ~np.broadcast_to(flags.combine(threshold=1).array, self.shape)
+        return unflagged, np.sum(unflagged, axis=axis, keepdims=True)
+
+    def _group_dumps(self,
+                     operations: list[str],
+                     labels: np.ndarray | list[int] | None,
+                     boundaries: np.ndarray | list[int] | None,
+                     n_groups: int | None) -> tuple[np.ndarray | slice, np.ndarray]:
+        """
+        Return the indices of the dumps in any group sorted by group and the number of dumps in each group defined
+        by either `labels` and `n_groups` or `boundaries`, see `self.reduce_by_groups()`.
+        :raise ValueError: if not exactly one of `labels` and `boundaries` is given, if they do not fit the time axis,
+                           if `n_groups` is given with `boundaries` or if one of `operations` is unknown
+        """
+        unknown = set(operations) - {'count', 'sum', 'mean', 'standard_deviation'}
+        if unknown:
+            raise ValueError(f'Unknown group reductions {sorted(unknown)}.')
+        if (labels is None) == (boundaries is None):
+            raise ValueError('Exactly one of the inputs `labels` and `boundaries` must be given.')
+        if labels is not None:
+            return self._group_dumps_from_labels(labels=np.asarray(labels), n_groups=n_groups)
+        if n_groups is not None:
+            raise ValueError('Input `n_groups` can only be given together with `labels`.')
+        return self._group_dumps_from_boundaries(boundaries=np.asarray(boundaries))
+
+    def _group_dumps_from_labels(self, labels: np.ndarray, n_groups: int | None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Return the dump indices sorted by group and the number of dumps in each of the `n_groups` groups defined by
+        `labels`. If `n_groups` is `None`, it is the largest label plus one.
+        :raise ValueError: if `labels` is not one integer per dump or if a label is not smaller than `n_groups`
+        """
+        if labels.shape != (self.shape[0],) or not np.issubdtype(labels.dtype, np.integer):
+            raise ValueError(f'Input `labels` must contain one integer per dump, got shape {labels.shape} '
+                             f'and dtype {labels.dtype}.')
+        if n_groups is not None and len(labels) > 0 and labels.max() >= n_groups:
+            raise ValueError(f'All `labels` must be smaller than `n_groups` {n_groups}, got {labels.max()}.')
+        group_dumps = np.argsort(labels, kind='stable')
+        group_dumps = group_dumps[labels[group_dumps] >= 0]
+        sizes = np.bincount(labels[group_dumps], minlength=n_groups or 0)
+        return group_dumps, sizes
+
+    def _group_dumps_from_boundaries(self, boundaries: np.ndarray) -> tuple[slice, np.ndarray]:
+        """
+        Return the `slice` of the dumps in any group and the number of dumps in each group defined by `boundaries`.
+        :raise ValueError: if `boundaries` is not increasing or outside of the time axis
+        """
+        if boundaries.ndim != 1 or len(boundaries) < 1 or np.any(np.diff(boundaries) < 0) \
+                or boundaries[0] < 0 or boundaries[-1] > self.shape[0]:
+            raise ValueError(f'Input `boundaries` must be increasing dump indices between 0 and {self.shape[0]}, '
+                             f'got {boundaries}.')
+        return slice(boundaries[0], boundaries[-1]), np.diff(boundaries)
 
+    @staticmethod
+    def _divide_by_count(total: np.ndarray, count: np.ndarray) -> np.ndarray:
+        """ Return `total` divided by `count`, entries with zero `count` are set to zero instead. """
+        return np.divide(total, count, out=np.zeros(np.shape(total)), where=count > 0)
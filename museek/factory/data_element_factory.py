@@ -1,7 +1,9 @@
 from abc import ABC, abstractmethod
 
+import dask.array as da
 import numpy as np
 
+from museek.dask_data_element import DaskDataElement
 from museek.data_element import DataElement
 from museek.flag_element import FlagElement
 
@@ -26,6 +28,24 @@ class DataElementFactory(AbstractDataElementFactory):
         return DataElement(array=array)
 
 
+class DaskDataElementFactory(AbstractDataElementFactory):
+    """ `DaskDataElement` factory, the created elements are evaluated lazily. """
+
+    def __init__(self, chunks: str | tuple[int, int, int] = 'auto'):
+        """
+        Initialise with `chunks` used to wrap `numpy` arrays in `dask` arrays.
+        :param chunks: chunk shape of wrapped `numpy` arrays, `dask` arrays keep their chunks
+        """
+        super().__init__()
+        self._chunks = chunks
+
+    def create(self, array: np.ndarray | da.Array) -> DaskDataElement:
+        """ Initialise and return a `DaskDataElement` object with `array`. """
+        if not isinstance(array, da.Array):
+            array = da.from_array(array, chunks=self._chunks)
+        return DaskDataElement(array=array)
+
+
 class FlagElementFactory(AbstractDataElementFactory):
     """ `FlagElement` factory. """
 
@@ -39,7 +59,9 @@ class ScanElementFactory(AbstractDataElementFactory):
     `AbstractDataElement` factory specific to a certain scan state. Follows the decorator pattern.
     """
 
-    def __init__(self, scan_dumps: list[int], component: DataElementFactory | FlagElementFactory):
+    def __init__(self,
+                 scan_dumps: list[int],
+                 component: DataElementFactory | DaskDataElementFactory | FlagElementFactory):
         """
         Initialise super class and set a `DataElementFactory` as a component.
         :param scan_dumps: dump indices belonging to the scan state
@@ -15,6 +15,17 @@ class FlagElement(AbstractDataElement):
         """
         super().__init__(array=self._make_boolean(array=array))
 
+    def __getstate__(self) -> dict:
+        """ Return the state for pickling with the flags packed by `np.packbits` along the frequency axis. """
+        return {'packed_array': np.packbits(self.array, axis=1), 'shape': self.shape}
+
+    def __setstate__(self, state: dict):
+        """ Restore the state, packed flags are unpacked, states pickled before packing are used as they are. """
+        if 'packed_array' not in state:
+            self.__dict__.update(state)
+            return
+        self.array = np.unpackbits(state['packed_array'], axis=1, count=state['shape'][1]).view(bool)
+
     def __add__(self, other: 'FlagElement'):
         """
         Adding to masks gives the combined mask.
@@ -48,6 +59,8 @@ class FlagElement(AbstractDataElement):
         :raise ValueError: if `array` is not binary
         :return: boolean array
         """
+        if array.dtype == bool:  # avoid copying, e.g. memory-mapped flags
+            return array
         boolean_array = array.astype(bool)
         if not np.array_equal(array, boolean_array):
             raise ValueError('`FlagElement` can only initialise with a binary array.')
@@ -2,28 +2,87 @@ from typing import Union
 
 import numpy as np
 
+from museek.abstract_data_element import AbstractDataElement
 from museek.factory.data_element_factory import FlagElementFactory
 from museek.flag_element import FlagElement
 
 
 class FlagList:
-    """ Class to contain a `list` of flags encapsulated as `FlagElement`s each. """
+    """
+    Class to contain a `list` of flags. The flags are stored as bit planes of a single unsigned integer array,
+    bit `i` of each entry is the `i`-th flag. Combined flags are cached per threshold until the flags change.
+    Flags may have length `1` along any axis, e.g. shape `(1, n_frequency, 1)` to flag whole channels. They are
+    broadcast against each other, so the bit planes are only as large as the largest flag and the combined flags
+    have to be broadcast to the data shape by their users.
+    When pickled, each flag is packed to one bit per entry along the frequency axis. An unpickled `FlagList` is
+    only unpacked when its flags are first accessed.
+    """
+
+    _bit_plane_dtypes = [np.uint8, np.uint16, np.uint32, np.uint64]
+    _popcount_table = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.uint8)
 
     def __init__(self, flags: list[FlagElement]):
-        """ Initialise with `flags`, a `list of `FlagElement`s. """
-        self._flags = flags
-        self._check_flags()
+        """
+        Initialise with `flags`, a `list of `FlagElement`s.
+        :raise ValueError: if the `flags` are not `FlagElement`s of broadcastable shapes or more than 64
+        """
         self._flag_element_factory = FlagElementFactory()
+        self._n_flags = 0
+        self._packed_flags: tuple[np.ndarray, tuple[int, int, int]] | None = None
+        self._bit_plane_array: np.ndarray | None = None
+        self._combined: dict[int, FlagElement] = {}
+        self._check_flags(flags=flags)
+        for flag in flags:
+            self._add_bit_plane(flag=flag.array)
 
     def __len__(self):
-        """ Return the number of `FlagElement`s in `self`. """
-        return len(self._flags)
+        """ Return the number of flags in `self`. """
+        return self._n_flags
 
     def __eq__(self, other: 'FlagList'):
         """ Return `True` if all flags in `self` are equal to the flags in `other` at the same index. """
         if len(self) != len(other):
             return False
-        return all([self_flag == other_flag for self_flag, other_flag in zip(self._flags, other._flags)])
+        if len(self) == 0:
+            return True
+        return self.shape == other.shape and np.array_equal(self._bit_planes, other._bit_planes)
+
+    def __getstate__(self) -> dict:
+        """
+        Return the state for pickling without the cached combined flags. The flags are packed with `np.packbits`
+        along the frequency axis one at a time together with their shape, so only one boolean flag is unpacked at once.
+        """
+        state = self.__dict__.copy()
+        state['_combined'] = {}
+        if self._bit_plane_array is not None:
+            state['_packed_flags'] = (self._pack(), self.shape)
+            state['_bit_plane_array'] = None
+        return state
+
+    def __setstate__(self, state: dict):
+        """
+        Restore the state, packed flags are kept until they are accessed.
+        `FlagList`s pickled before the bit planes were introduced are converted.
+        """
+        if '_flags' in state:
+            flags = state.pop('_flags')
+            self.__dict__.update(state)
+            self.__init__(flags=flags)
+            return
+        self.__dict__.update(state)
+
+    @property
+    def _bit_planes(self) -> np.ndarray | None:
+        """ The bit planes of all flags, unpacked first if `self` was unpickled. """
+        if self._packed_flags is not None:
+            self._unpack()
+        return self._bit_plane_array
+
+    @_bit_planes.setter
+    def _bit_planes(self, bit_planes: np.ndarray | None):
+        """ Set the bit planes of all flags. """
+        self._packed_flags = None
+        self._bit_plane_array = bit_planes
 
     @classmethod
     def from_array(cls, array: np.ndarray, element_factory: FlagElementFactory) -> 'FlagList':
@@ -42,69 +101,159 @@ class FlagList:
 
     @property
     def shape(self):
-        """ Return the shape of the first element in `self._flags`. All elements have the same shape. """
-        return self._flags[0].shape
+        """ Return the shape of the flags in `self`, i.e. the broadcast shape of all flags added so far. """
+        if self._packed_flags is not None:
+            return self._packed_flags[1]
+        return self._bit_planes.shape
 
     @property
     def array(self) -> np.ndarray[bool]:
         """ Return the flags in format for storage as a `numpy` array. """
-        return np.asarray([flag.array for flag in self._flags])
+        return np.asarray([self._bit_plane(index=index) for index in range(len(self))])
 
     def add_flag(self, flag: Union[FlagElement, 'FlagList']):
         """ Append `flag` to `self` and check for compatibility. """
         if isinstance(flag, FlagList):
             if flag_len := len(flag) > 1:
                 raise ValueError(f'Adding more than one flag at once is not implemented yet. Got {flag_len} flags.')
-            flag = flag._flags[0]
-        self._flags.append(flag)
-        self._check_flags()
+            flag = self._flag_element_factory.create(array=flag._bit_plane(index=0))
+        self._check_flags(flags=[flag])
+        self._add_bit_plane(flag=flag.array)
 
     def remove_flag(self, index: int):
-        """ Remove `flag` at `index` in `self.flags`. """
-        self._flags = [flag for i, flag in enumerate(self._flags) if i != index]
-        self._check_flags()
+        """ Remove the flag at `index`, the bits of all following flags are shifted down by one. """
+        index = range(len(self))[index]
+        bit_planes = self._bit_planes
+        lower = bit_planes & bit_planes.dtype.type((1 << index) - 1)
+        if index + 1 < np.iinfo(bit_planes.dtype).bits:
+            upper = (bit_planes >> bit_planes.dtype.type(index + 1)) << bit_planes.dtype.type(index)
+            lower |= upper
+        self._bit_planes = lower
+        self._n_flags -= 1
+        self._combined.clear()
 
     def combine(self, threshold: int = 1) -> FlagElement:
         """
-        Combine all flags and return them as a single boolean `FlagElement` after thresholding with `threshold`.
+        Combine all flags and return them as a single boolean `FlagElement` after thresholding with `threshold`,
+        i.e. an entry is flagged if at least `threshold` flags are set. The result is cached until the flags change,
+        its array is read-only.
         """
-        result_array = np.zeros(self.shape)
-        for flag in self._flags:
-            result_array += flag.get_array()
-        result_array[result_array < threshold] = 0
-        return self._flag_element_factory.create(array=np.asarray(result_array, dtype=bool))
+        if threshold not in self._combined:
+            if threshold <= 1:
+                combined = self._bit_planes != 0
+            else:
+                combined = self._popcount() >= threshold
+            combined.setflags(write=False)
+            self._combined[threshold] = self._flag_element_factory.create(array=combined)
+        return self._combined[threshold]
 
     def get(self, **kwargs) -> 'FlagList':
-        """ Wraps `FlagElement.get()` around each flag in `self` and returns a new `FlagList`. """
-        return FlagList(flags=[flag.get(**kwargs) for flag in self._flags])
+        """
+        Index all flags in `self` like `FlagElement.get()` and return a new `FlagList`.
+        Axes of length `1` are not indexed, they remain broadcastable.
+        The bit planes are always copied, so changes of the result do not affect `self`.
+        """
+        kwargs = {name: index for axis, name in enumerate(['time', 'freq', 'recv'])
+                  if (index := kwargs.get(name)) is not None and self.shape[axis] > 1}
+        result = FlagList(flags=[])
+        result._n_flags = self._n_flags
+        result._bit_planes = AbstractDataElement(array=self._bit_planes).get(**kwargs).array
+        return result
 
-    def insert_receiver_flag(self, flag: FlagElement, i_receiver: int, index: int):
-        """ Insert `flag` for receiver with index `i_receiver` into the flag in `self` at `index`. """
+    def insert_receiver_flag(self, flag: FlagElement, i_receiver: int, index: int, n_receiver: int | None = None):
+        """
+        Insert `flag` for receiver with index `i_receiver` into the flag in `self` at `index`.
+        The bit planes are broadcast to the dump and frequency axes of `flag` if needed, and to `n_receiver`
+        receivers if their receiver axis is collapsed.
+        :param flag: needs to contain only one receiver
+        :param i_receiver: the index of the receiver wrt the receiver list
+        :param index: index of the flag in `self` to insert into
+        :param n_receiver: number of receivers, only needed if the receiver axis of `self` has length `1`
+        :raise ValueError: if `flag` is not for exactly one receiver or `i_receiver` is outside the receiver axis
+        """
         if flag.shape[-1] != 1:
             raise ValueError(f'Input `flag` needs to be for exactly one receiver, but got {flag.shape[-1]}')
-        flag_at_index = self._flags[index]
-        flag_at_index.insert_receiver_flag(i_receiver=i_receiver, flag=flag)
-        self._flags[index] = flag_at_index
+        n_receiver = n_receiver or self.shape[2]
+        if not 0 <= i_receiver < n_receiver or self.shape[2] not in (1, n_receiver):
+            raise ValueError(f'Cannot insert receiver {i_receiver} into flags of shape {self.shape} '
+                             f'for {n_receiver} receivers.')
+        self._broadcast_bit_planes(shape=np.broadcast_shapes(self.shape[:2], flag.shape[:2]) + (n_receiver,))
+        bit = self._bit_planes.dtype.type(1 << range(len(self))[index])
+        self._bit_planes[:, :, i_receiver] |= flag.array[:, :, 0] * bit
+        self._combined.clear()
+
+    def _add_bit_plane(self, flag: np.ndarray):
+        """ Append the boolean array `flag` as the highest bit plane, the integer type is widened if needed. """
+        if self._n_flags == np.iinfo(self._bit_plane_dtypes[-1]).bits:
+            raise ValueError(f'A `FlagList` can hold at most {self._n_flags} flags.')
+        dtype = next(dtype_ for dtype_ in self._bit_plane_dtypes if np.iinfo(dtype_).bits > self._n_flags)
+        if self._bit_planes is None:
+            self._bit_planes = np.zeros(flag.shape, dtype=dtype)
+        elif self._bit_planes.dtype != dtype:
+            self._bit_planes = self._bit_planes.astype(dtype)
+        self._broadcast_bit_planes(shape=np.broadcast_shapes(self.shape, flag.shape))
+        self._bit_planes |= flag.astype(dtype) << dtype(self._n_flags)
+        self._n_flags += 1
+        self._combined.clear()
+
+    def _pack(self) -> np.ndarray:
+        """ Return all flags packed with `np.packbits` along the frequency axis, packed one flag at a time. """
+        time, freq, recv = self.shape
+        packed = np.empty((len(self), time, (freq + 7) // 8, recv), dtype=np.uint8)
+        for index in range(len(self)):
+            packed[index] = np.packbits(self._bit_plane(index=index), axis=1)
+        return packed
+
+    def _unpack(self):
+        """ Unpack the flags packed by `self.__getstate__()` to bit planes one flag at a time. """
+        (packed, shape), self._packed_flags = self._packed_flags, None
+        self._n_flags = 0
+        for packed_flag in packed:
+            self._add_bit_plane(flag=np.unpackbits(packed_flag, axis=1, count=shape[1]).view(bool))
+
+    def _broadcast_bit_planes(self, shape: tuple[int, int, int]):
+        """ Broadcast the bit planes to `shape` if they are smaller, only then they are copied. """
+        if self.shape != shape:
+            self._bit_planes = np.broadcast_to(self._bit_planes, shape).copy()
+
+    def _bit_plane(self, index: int) -> np.ndarray:
+        """ Return the flag at `index` as a boolean array. """
+        return ((self._bit_planes >> self._bit_planes.dtype.type(index)) & 1) == 1
+
+    def _popcount(self) -> np.ndarray:
+        """
+        Return the number of flags set for each entry, counted byte by byte with a lookup table.
+        The bytes are extracted by shifting and masking, so the bit planes need not be contiguous.
+        """
+        bit_planes = self._bit_planes
+        count = np.zeros(self.shape, dtype=np.uint8)
+        for byte in range(bit_planes.itemsize):
+            byte_values = (bit_planes >> bit_planes.dtype.type(8 * byte)) & bit_planes.dtype.type(0xFF)
+            count += self._popcount_table[byte_values]
+        return count
 
-    def _check_flags(self):
-        """ Check if all flags are compatible. """
-        self._check_flag_shapes()
-        self._check_flag_types()
+    def _check_flags(self, flags: list[FlagElement]):
+        """ Check if all `flags` are compatible with each other and with `self`. """
+        self._check_flag_types(flags=flags)
+        self._check_flag_shapes(flags=flags)
 
-    def _check_flag_shapes(self):
+    def _check_flag_shapes(self, flags: list[FlagElement]):
         """
-        Check if the flag shapes are identical.
-        :raise ValueError: if not all shapes are identical
+        Check if the shapes of `flags` and the flags in `self` can be broadcast, i.e. are identical along each axis
+        unless one of them is `1`.
+        :raise ValueError: if the shapes cannot be broadcast
         """
-        for flag in self._flags:
-            if flag.shape != self.shape:
-                raise ValueError(f'All input flags need to have the same shape {self.shape}. Got {flag.shape}.')
+        shapes = [flag.shape for flag in flags] + ([self.shape] if self._bit_planes is not None else [])
+        if any(len(shape) != 3 for shape in shapes) \
+                or any(len(set(lengths) - {1}) > 1 for lengths in zip(*shapes)):
+            raise ValueError(f'All input flags need to have broadcastable shapes. Got {shapes}.')
 
-    def _check_flag_types(self):
+    @staticmethod
+    def _check_flag_types(flags: list[FlagElement]):
         """
-        Check if all flags are of type `FlagElement`.
+        Check if all `flags` are of type `FlagElement`.
         :raise ValueError: if at least one of the flags is not a `FlagElement`
         """
-        for flag in self._flags:
+        for flag in flags:
             if not isinstance(flag, FlagElement):
                 raise ValueError(f'All input flags need to be `FlagElement`s. Got {type(flag)}.')
@@ -0,0 +1,241 @@
+import numbers
+from typing import Callable, Union
+
+import numba
+import numpy as np
+
+from museek.data_element import DataElement
+from museek.flag_list import FlagList
+
+
+class LazyDataElement:
+    """
+    Class to hold an unevaluated arithmetic expression of `DataElement`s, `np.ndarray`s and numbers.
+    Arithmetic on a `LazyDataElement` only extends the expression. It is evaluated in one fused pass with a
+    `numba`-compiled `ufunc` when `self.array`, `self.evaluate()` or a reduction is requested. The evaluation
+    runs chunk by chunk along the time axis, so no full-size intermediate array is ever created.
+    All operands are broadcast along axes of length one, like in `DataElement`.
+    """
+
+    __array_ufunc__ = None  # `numpy` then defers to the reflected operators of this class
+    _max_ufunc_operands = 31  # `numpy` limits the number of `ufunc` arguments including `out`
+    _compiled_expressions: dict[str, Callable] = {}
+
+    def __init__(self,
+                 expression: str,
+                 operands: list[np.ndarray | numbers.Number],
+                 chunk_size: int = 256):
+        """
+        Initialise
+        :param expression: the expression as a format string, the `i`-th operand is referred to as `{i}`
+        :param operands: `list` of 3-dimensional `np.ndarray`s and numbers referred to in `expression`
+        :param chunk_size: number of dumps evaluated at once
+        :raise ValueError: if `chunk_size` is not positive or the operand shapes cannot be broadcast
+        """
+        if chunk_size < 1:
+            raise ValueError(f'Input `chunk_size` must be positive, got {chunk_size}.')
+        self.expression = expression
+        self.operands = operands
+        self.chunk_size = chunk_size
+        array_shapes = [operand.shape for operand in operands if isinstance(operand, np.ndarray)]
+        if not array_shapes or any(len(shape) != 3 for shape in array_shapes):
+            raise ValueError(f'At least one operand is needed and all array operands must be 3-dimensional, '
+                             f'got shapes {array_shapes}.')
+        self.shape = np.broadcast_shapes(*array_shapes)
+
+    @classmethod
+    def from_data_element(cls, data_element: DataElement, chunk_size: int = 256) -> 'LazyDataElement':
+        """
+        Return a `LazyDataElement` holding `data_element`, arithmetic on the result is evaluated lazily.
+        :param data_element: the `DataElement`, its array is not copied
+        :param chunk_size: number of dumps evaluated at once
+        """
+        return cls(expression='{0}', operands=[data_element.array], chunk_size=chunk_size)
+
+    def __add__(self, other: Union['LazyDataElement', DataElement, np.ndarray, numbers.Number]) -> 'LazyDataElement':
+        """ Return the lazy sum of `self` and `other`. """
+        return self._combine(operator='+', left=self, right=other)
+
+    def __radd__(self, other: DataElement | np.ndarray | numbers.Number) -> 'LazyDataElement':
+        """ Return the lazy sum of `other` and `self`. """
+        return self._combine(operator='+', left=other, right=self)
+
+    def __sub__(self, other: Union['LazyDataElement', DataElement, np.ndarray, numbers.Number]) -> 'LazyDataElement':
+        """ Return the lazy difference of `self` and `other`. """
+        return self._combine(operator='-', left=self, right=other)
+
+    def __rsub__(self, other: DataElement | np.ndarray | numbers.Number) -> 'LazyDataElement':
+        """ Return the lazy difference of `other` and `self`. """
+        return self._combine(operator='-', left=other, right=self)
+
+    def __mul__(self, other: Union['LazyDataElement', DataElement, np.ndarray, numbers.Number]) -> 'LazyDataElement':
+        """ Return the lazy product of `self` and `other`. """
+        return self._combine(operator='*', left=self, right=other)
+
+    def __rmul__(self, other: DataElement | np.ndarray | numbers.Number) -> 'LazyDataElement':
+        """ Return the lazy product of `other` and `self`. """
+        return self._combine(operator='*', left=other, right=self)
+
+    def __truediv__(self,
+                    other: Union['LazyDataElement', DataElement, np.ndarray, numbers.Number]) -> 'LazyDataElement':
+        """ Return the lazy quotient of `self` and `other`. """
+        return self._combine(operator='/', left=self, right=other)
+
+    def __rtruediv__(self, other: DataElement | np.ndarray | numbers.Number) -> 'LazyDataElement':
+        """ Return the lazy quotient of `other` and `self`. """
+        return self._combine(operator='/', left=other, right=self)
+
+    @property
+    def array(self) -> np.ndarray:
+        """ Returns the evaluated expression as `np.ndarray`. """
+        return self.evaluate().array
+
+    def evaluate(self, out: DataElement | np.ndarray | None = None) -> DataElement:
+        """
+        Evaluate the expression in one pass per time chunk and return the result as a `DataElement`.
+        :param out: optional `DataElement` or `np.ndarray` of `self.shape` to write the result to, it may be
+                    one of the operands, e.g. to correct the visibility in place
+        :raise ValueError: if `out` does not have the shape `self.shape`
+        """
+        if out is None:
+            out_array = np.empty(self.shape, dtype=self._result_dtype())
+        else:
+            out_array = out.array if isinstance(out, DataElement) else out
+            if out_array.shape != self.shape:
+                raise ValueError(f'Input `out` must have shape {self.shape}, got {out_array.shape}.')
+        for time_slice in self._time_slices():
+            self._evaluate_chunk(time_slice=time_slice, out=out_array[time_slice])
+        return out if isinstance(out, DataElement) else DataElement(array=out_array)
+
+    def sum(self, axis: int | list[int, int] | tuple[int, int]) -> DataElement:
+        """ Return the sum of the expression along `axis` as a `DataElement`, i.e. the dimensions are kept. """
+        total, = self._reduce(axis=axis,
+                              reduction=lambda chunk, axes: np.sum(chunk, axis=axes, keepdims=True)[np.newaxis])
+        return DataElement(array=total)
+
+    def mean(self, axis: int | list[int, int] | tuple[int, int], flags: FlagList | None = None) -> DataElement:
+        """
+        Return the mean of the unflagged entries of the expression along `axis` as a `DataElement`,
+        i.e. the dimensions are kept. Entries without any unflagged value are masked.
+        :param axis: axis along which to calculate the mean
+        :param flags: optional, only entries not flagged by these are used
+        :return: `DataElement` containing the mean along `axis`
+        """
+        axes = self._axes(axis=axis)
+        if flags is None:
+            total = self.sum(axis=axes)
+            return DataElement(array=total.array / np.prod([self.shape[axis_] for axis_ in axes]))
+
+        def masked_sum_and_count(chunk: np.ndarray, mask: np.ndarray, axes_: tuple[int, ...]) -> np.ndarray:
+            unmasked = ~np.broadcast_to(mask, chunk.shape)
+            return np.stack([np.sum(chunk, axis=axes_, keepdims=True, where=unmasked),
+                             np.sum(unmasked, axis=axes_, keepdims=True)])
+
+        total, count = self._reduce(axis=axes, reduction=masked_sum_and_count, flags=flags)
+        mean = np.divide(total, count, out=np.zeros_like(total), where=count > 0)
+        return DataElement(array=np.ma.masked_array(mean, mask=count == 0))
+
+    @classmethod
+    def _combine(cls,
+                 operator: str,
+                 left: Union['LazyDataElement', DataElement, np.ndarray, numbers.Number],
+                 right: Union['LazyDataElement', DataElement, np.ndarray, numbers.Number]) -> 'LazyDataElement':
+        """
+        Return a `LazyDataElement` of the expression `left operator right`
+        or `NotImplemented` if the type of `left` or `right` is not supported.
+        """
+        left, right = cls._expression_of(operand=left), cls._expression_of(operand=right)
+        if left is None or right is None:
+            return NotImplemented
+        (left_expression, left_operands, left_chunk_size), (right_expression, right_operands, right_chunk_size) \
+            = left, right
+        shifted = right_expression.format(*[f'{{{i + len(left_operands)}}}' for i in range(len(right_operands))])
+        return cls(expression=f'({left_expression} {operator} {shifted})',
+                   operands=left_operands + right_operands,
+                   chunk_size=min(left_chunk_size or right_chunk_size, right_chunk_size or left_chunk_size))
+
+    @staticmethod
+    def _expression_of(operand: Union['LazyDataElement', DataElement, np.ndarray, numbers.Number]) \
+            -> tuple[str, list[np.ndarray | numbers.Number], int | None] | None:
+        """
+        Return the expression, the operands and the chunk size of `operand` as a `tuple`, the chunk size is `None`
+        unless `operand` is a `LazyDataElement`. Returns `None` if the type of `operand` is not supported.
+        """
+        if isinstance(operand, LazyDataElement):
+            return operand.expression, operand.operands, operand.chunk_size
+        if isinstance(operand, DataElement):
+            return '{0}', [operand.array], None
+        if isinstance(operand, np.ndarray | numbers.Number):
+            return '{0}', [operand], None
+        return None
+
+    def _reduce(self,
+                axis: int | list[int, int] | tuple[int, int],
+                reduction: Callable,
+                flags: FlagList | None = None) -> np.ndarray:
+        """
+        Apply `reduction` chunk by chunk and return the combined chunk results. `reduction` is called with the
+        evaluated chunk, the combined flags of the chunk if `flags` are given, and the reduced axes. It must return
+        its additive results stacked along a new zeroth axis, with the dimensions of the chunk kept. The chunk
+        results are summed if the time axis is reduced and concatenated along time otherwise.
+        """
+        axes = self._axes(axis=axis)
+        result = None
+        for time_slice in self._time_slices():
+            chunk = self._evaluate_chunk(time_slice=time_slice)
+            if flags is None:
+                chunk_result = reduction(chunk, axes)
+            else:
+                chunk_flags = flags.get(time=time_slice) if flags.shape[0] > 1 else flags
+                chunk_result = reduction(chunk, chunk_flags.combine(threshold=1).array, axes)
+            if 0 in axes:
+                result = chunk_result if result is None else result + chunk_result
+            else:
+                result = chunk_result if result is None else np.concatenate([result, chunk_result], axis=1)
+        return result
+
+    def _evaluate_chunk(self, time_slice: slice, out: np.ndarray | None = None) -> np.ndarray:
+        """ Evaluate the expression for the dumps in `time_slice` and return the result. """
+        operands = [operand[time_slice] if isinstance(operand, np.ndarray) and operand.shape[0] > 1 else operand
+                    for operand in self.operands]
+        if len(operands) > self._max_ufunc_operands:
+            result = self._python_function()(*operands)
+            if out is None:
+                return result
+            out[...] = result
+            return out
+        if out is None:
+            return self._ufunc()(*operands)
+        return self._ufunc()(*operands, out=out)
+
+    def _time_slices(self) -> list[slice]:
+        """ Return the `slice`s of the time chunks. """
+        return [slice(start, start + self.chunk_size) for start in range(0, self.shape[0], self.chunk_size)]
+
+    def _result_dtype(self) -> np.dtype:
+        """ Return the `dtype` of the result, determined by evaluating the expression for one element. """
+        samples = [operand.flat[:1] if isinstance(operand, np.ndarray) else operand for operand in self.operands]
+        return np.asarray(self._python_function()(*samples)).dtype
+
+    def _python_function(self) -> Callable:
+        """ Return the expression as a plain `python` function of the operands. """
+        arguments = [f'x{i}' for i in range(len(self.operands))]
+        namespace = {}
+        exec(f'def expression({", ".join(arguments)}):\n    return {self.expression.format(*arguments)}', namespace)
+        return namespace['expression']
+
+    def _ufunc(self) -> Callable:
+        """
+        Return the expression compiled to a `numba` `ufunc`. Compiled expressions are shared by all instances,
+        numbers are passed as arguments, so expressions differing only in their numbers are compiled once.
+        """
+        if self.expression not in self._compiled_expressions:
+            self._compiled_expressions[self.expression] = numba.vectorize(self._python_function())
+        return self._compiled_expressions[self.expression]
+
+    @staticmethod
+    def _axes(axis: int | list[int, int] | tuple[int, int]) -> tuple[int, ...]:
+        """ Return `axis` as a `tuple` of non-negative axes. """
+        if isinstance(axis, int | np.integer):
+            axis = [axis]
+        return tuple(sorted(int(axis_) % 3 for axis_ in axis))
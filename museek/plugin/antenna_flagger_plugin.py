@@ -5,11 +5,8 @@ from ivory.plugin.abstract_plugin import AbstractPlugin
 from ivory.utils.requirement import Requirement
 from ivory.utils.result import Result
 from museek.antenna_sanity.constant_elevation_scans import ConstantElevationScans
-from museek.data_element import DataElement
 from museek.enums.result_enum import ResultEnum
 from museek.flag_element import FlagElement
-from museek.flag_factory import FlagFactory
-from museek.flag_list import FlagList
 from museek.time_ordered_data import TimeOrderedData
 from museek.util.clustering import Clustering
 
@@ -50,16 +47,12 @@ class AntennaFlaggerPlugin(AbstractPlugin):
 
     def flag_outlier_antennas(self, data: TimeOrderedData):
         """ Add a new flag to `data` to exclude antennas with non-constant elevation readings. """
-        shape = data.visibility.shape
-        new_flag = FlagList(flags=[FlagFactory().empty_flag(shape=shape)])
-        full_flag = FlagElement(array=np.ones((shape[0], shape[1], 1)))
+        new_flag = np.zeros((1, 1, data.visibility.shape[2]), dtype=bool)  # whole receivers are flagged
         _, antennas = self.outlier_antenna_indices(data=data, distance_threshold=self.outlier_threshold)
         for antenna in antennas:
             print(f'Outliers: flagged antenna {antenna.name}.')
-            i_receiver_list = data.receiver_indices_of_antenna(antenna)
-            for i_receiver in i_receiver_list:
-                new_flag.insert_receiver_flag(flag=full_flag, i_receiver=i_receiver, index=0)
-        data.flags.add_flag(flag=new_flag)
+            new_flag[:, :, data.receiver_indices_of_antenna(antenna)] = True
+        data.flags.add_flag(flag=FlagElement(array=new_flag))
 
     @staticmethod
     def outlier_antenna_indices(data: TimeOrderedData, distance_threshold: float) -> tuple[list[int], list[Antenna]]:
@@ -87,14 +80,10 @@ class AntennaFlaggerPlugin(AbstractPlugin):
 
     def flag_for_elevation(self, data: TimeOrderedData):
         """ Add a new flag to `data` to exclude antennas with non-constant elevation readings. """
-        shape = data.visibility.shape
-        new_flag = FlagList(flags=[FlagFactory().empty_flag(shape=shape)])
-        full_flag = DataElement(array=np.ones((shape[0], shape[1], 1)))
+        new_flag = np.zeros((1, 1, data.visibility.shape[2]), dtype=bool)  # whole receivers are flagged
         for antenna in ConstantElevationScans.get_antennas_with_non_constant_elevation(
                 data=data,
                 threshold=self.elevation_threshold
         ):
             print(f'Non-constant elevation: flagged antenna {antenna.name}.')
-            i_receiver_list = data.receiver_indices_of_antenna(antenna)
-            for i_receiver in i_receiver_list:
-                new_flag.insert_receiver_flag(flag=full_flag, i_receiver=i_receiver, index=0)
+            new_flag[:, :, data.receiver_indices_of_antenna(antenna)] = True
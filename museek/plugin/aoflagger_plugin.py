@@ -1,6 +1,7 @@
 import os
 from typing import Generator
 
+import numpy as np
 from matplotlib import pyplot as plt
 
 from definitions import ROOT_DIR
@@ -75,7 +76,10 @@ class AoflaggerPlugin(AbstractParallelJoblibPlugin):
         :param block_name: name of the data block, not used here but for setting results
         """
         scan_data.load_visibility_flags_weights()
-        initial_flags = scan_data.flags.combine(threshold=self.flag_combination_threshold)
+        initial_flags = FlagElement(array=np.broadcast_to(
+            scan_data.flags.combine(threshold=self.flag_combination_threshold).array,
+            scan_data.visibility.shape
+        ))
 
         for i_receiver, receiver in enumerate(scan_data.receivers):
             if not os.path.isdir(receiver_path := os.path.join(output_path, receiver.name)):
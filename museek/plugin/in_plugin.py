@@ -20,7 +20,16 @@ class InPlugin(AbstractPlugin):
                  force_load_from_correlator_data: bool,
                  do_save_visibility_to_disc: bool,
                  do_store_context: bool,
-                 context_folder: str | None):
+                 context_folder: str | None,
+                 weights_dtype: str,
+                 channels: range | None,
+                 frequency_range: tuple[float, float] | None,
+                 cache_max_bytes: int | None,
+                 cache_codec: str | None,
+                 cache_compression_level: int | None,
+                 loader_threads: int | None,
+                 loader_dump_batch_size: int | None,
+                 loader_report_progress: bool):
         """
         Initialise the plugin.
         :param block_name: the name of the block, usually an integer timestamp as string
@@ -33,6 +42,20 @@ class InPlugin(AbstractPlugin):
                                  if `True` it is recommended to also have `do_save_visibility_to_disc` set to `True`
         :param context_folder: the context is stored to this directory after finishing the plugin, if `None`, a
                                   default directory is chosen
+        :param weights_dtype: `dtype` name of the weights loaded from the correlator data, e.g. 'float32'
+        :param channels: optional `range` of channel indices to load, if `None`, all channels are loaded
+        :param frequency_range: optional lower and upper frequency [MHz] limits of the channels to load
+        :param cache_max_bytes: optional byte budget of the cache directory, least recently used cache entries of
+                                other blocks are evicted when it is exceeded, if `None`, nothing is evicted
+        :param cache_codec: optional codec to compress the visibility cache with, 'zlib', 'bz2' or 'lzma',
+                            if `None`, the cache is uncompressed
+        :param cache_compression_level: optional compression level of `cache_codec`, `None` means its default
+        :param loader_threads: optional number of threads to load the correlator data with, if `None`, the `dask`
+                               default is used
+        :param loader_dump_batch_size: optional minimum number of dumps loaded from the correlator data at once,
+                                       if `None`, all dumps are loaded at once
+        :param loader_report_progress: if `True`, the progress and throughput of loading the correlator data
+                                       is printed after each batch of dumps
         """
         super().__init__()
         self.block_name = block_name
@@ -42,6 +65,15 @@ class InPlugin(AbstractPlugin):
         self.force_load_from_correlator_data = force_load_from_correlator_data
         self.do_save_visibility_to_disc = do_save_visibility_to_disc
         self.do_store_context = do_store_context
+        self.weights_dtype = weights_dtype
+        self.channels = channels
+        self.frequency_range = frequency_range
+        self.cache_max_bytes = cache_max_bytes
+        self.cache_codec = cache_codec
+        self.cache_compression_level = cache_compression_level
+        self.loader_threads = loader_threads
+        self.loader_dump_batch_size = loader_dump_batch_size
+        self.loader_report_progress = loader_report_progress
 
         self.context_folder = context_folder
         if self.context_folder is None:
@@ -67,15 +99,24 @@ class InPlugin(AbstractPlugin):
             receivers=receivers,
             force_load_from_correlator_data=self.force_load_from_correlator_data,
             do_create_cache=self.do_save_visibility_to_disc,
+            weights_dtype=self.weights_dtype,
+            channels=self.channels,
+            frequency_range=self.frequency_range,
+            cache_max_bytes=self.cache_max_bytes,
+            cache_codec=self.cache_codec,
+            cache_compression_level=self.cache_compression_level,
+            loader_threads=self.loader_threads,
+            loader_dump_batch_size=self.loader_dump_batch_size,
+            loader_progress_callback=self._report_loader_progress if self.loader_report_progress else None,
         )
 
         # observation date from file name
         observation_date = datetime.fromtimestamp(int(data.name.split('_')[0]))
 
         if self.do_store_context:
-            # to create cache file
-            data.load_visibility_flags_weights()
-            data.delete_visibility_flags_weights()
+            # the cache files are flushed to disc in the background while the loaded data is passed on,
+            # the first reader of the cache waits for them
+            data.load_visibility_flags_weights(write_cache_in_background=True)
 
             context_file_name = 'in_plugin.pickle'
             context_directory = os.path.join(self.context_folder, f'{self.block_name}/')
@@ -89,6 +130,11 @@ class InPlugin(AbstractPlugin):
         self.set_result(result=Result(location=ResultEnum.OBSERVATION_DATE, result=observation_date))
         self.set_result(result=Result(location=ResultEnum.BLOCK_NAME, result=self.block_name))
 
+    @staticmethod
+    def _report_loader_progress(n_loaded_dumps: int, n_dumps: int, bytes_per_second: float):
+        """ Prints the progress and the throughput of loading the correlator data. """
+        print(f'Loaded {n_loaded_dumps} of {n_dumps} dumps at {bytes_per_second / 1024 ** 2:.1f} MiB/s.')
+
     def check_context_folder_exists(self):
         """ Raises a `ValueError` if `self.context_folder` does not exist. """
         if not os.path.exists(self.context_folder):
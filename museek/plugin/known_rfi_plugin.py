@@ -53,7 +53,7 @@ class KnownRfiPlugin(AbstractPlugin):
         """
         mega = 1e6
         data.load_visibility_flags_weights()
-        new_flag = np.zeros(data.shape, dtype=bool)
+        new_flag = np.zeros((1, data.shape[1], 1), dtype=bool)  # whole channels are flagged
         for channel, frequency in enumerate(data.frequencies.squeeze):
             for rfi_tuple in self.rfi_list:
                 if rfi_tuple[0] <= frequency / mega <= rfi_tuple[1]:
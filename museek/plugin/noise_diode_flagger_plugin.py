@@ -35,9 +35,8 @@ class NoiseDiodeFlaggerPlugin(AbstractPlugin):
         data.load_visibility_flags_weights()
         noise_diode = NoiseDiode(dump_period=data.dump_period, observation_log=data.obs_script_log)
         noise_diode_off_dumps = noise_diode.get_noise_diode_off_scan_dumps(timestamps=data.original_timestamps)
-        new_mask = np.ones(data.shape, dtype=bool)
-        for i in noise_diode_off_dumps:
-            new_mask[i] = False
+        new_mask = np.ones((data.shape[0], 1, 1), dtype=bool)  # whole dumps are flagged
+        new_mask[noise_diode_off_dumps] = False
         data.flags.add_flag(flag=self.data_element_factory.create(array=new_mask))
         self.set_result(result=Result(location=ResultEnum.DATA, result=data, allow_overwrite=True))
 
@@ -1,5 +1,4 @@
 import os
-from copy import deepcopy
 
 from definitions import ROOT_DIR
 from ivory.plugin.abstract_plugin import AbstractPlugin
@@ -13,7 +12,8 @@ from museek.time_ordered_data import TimeOrderedData
 class ScanTrackSplitPlugin(AbstractPlugin):
     """
     Plugin to split the scanning and tracking part from the data.
-    For the scanning part and calibrator tracking parts new `TimeOrderedData` objects are created.
+    For the scanning part and calibrator tracking parts new `TimeOrderedData` objects are created, which share
+    the metadata of the data and index visibility, flags and weights only when they are first accessed.
     """
 
     def __init__(self, do_delete_unsplit_data: bool, do_store_context: bool):
@@ -39,13 +39,11 @@ class ScanTrackSplitPlugin(AbstractPlugin):
         :param data: the complete time ordered data
         :param block_name: name of the observation block
         """
-        scan_data = deepcopy(data)
-        scan_data.set_data_elements(scan_state=ScanStateEnum.SCAN)
+        scan_data = data.split(scan_state=ScanStateEnum.SCAN)
 
         scan_observation_start, scan_observation_end = self._observation_start_end(data=scan_data)
 
-        track_data = deepcopy(data)
-        track_data.set_data_elements(scan_state=ScanStateEnum.TRACK)
+        track_data = data.split(scan_state=ScanStateEnum.TRACK)
 
         if self.do_delete_unsplit_data:
             data = None
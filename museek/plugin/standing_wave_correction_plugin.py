@@ -100,14 +100,15 @@ class StandingWaveCorrectionPlugin(AbstractPlugin):
 
         line_width = 0.5
 
+        flags = scan_data.flags.get(freq=target_channels, recv=receiver_index)
+        mean_bandpasses = scan_data.visibility.get(freq=target_channels, recv=receiver_index).reduce_by_groups(
+            operations=['mean'],
+            boundaries=swing_turnaround_dumps,
+            flags=flags
+        )['mean']
+
         for i in range(len(swing_turnaround_dumps) - 1):
-            times = range(swing_turnaround_dumps[i], swing_turnaround_dumps[i + 1])
-            flags = scan_data.flags.get(time=times,
-                                        freq=target_channels,
-                                        recv=receiver_index)
-            mean_bandpass = scan_data.visibility.get(time=times,
-                                                     freq=target_channels,
-                                                     recv=receiver_index).mean(axis=0, flags=flags)
+            mean_bandpass = mean_bandpasses.get(time=i)
             bandpass = mean_bandpass.squeeze / mean_bandpass.squeeze[0]
             model_bandpass = legendre * (1 + epsilon)
             model_bandpass /= model_bandpass[0]  # normalize
@@ -164,16 +165,16 @@ class StandingWaveCorrectionPlugin(AbstractPlugin):
         """ Old plotting function to check for azimuth dependence. """
 
         azimuth_digitized, azimuth_bins = self.azimuth_digitizer(azimuth=scan_data.azimuth.get(recv=antenna_index))
-        corrected_azimuth_binned_bandpasses = []
-        for index in range(len(azimuth_bins)):
-            time_dumps = np.where(azimuth_digitized == index)[0]
-            visibility = scan_data.visibility.get(time=time_dumps,
-                                                  freq=target_channels,
-                                                  recv=i_receiver)
-            flag = scan_data.flags.get(time=time_dumps,
-                                       freq=target_channels,
-                                       recv=i_receiver)
-            corrected_azimuth_binned_bandpasses.append(visibility.mean(axis=0, flags=flag).squeeze / (1 + epsilon))
+        labels = np.where(azimuth_digitized < len(azimuth_bins), azimuth_digitized, -1)
+        flags = scan_data.flags.get(freq=target_channels, recv=i_receiver)
+        azimuth_binned_bandpasses = scan_data.visibility.get(freq=target_channels, recv=i_receiver).reduce_by_groups(
+            operations=['mean'],
+            labels=labels,
+            flags=flags,
+            n_groups=len(azimuth_bins)
+        )['mean']
+        corrected_azimuth_binned_bandpasses = [azimuth_binned_bandpasses.get(time=index).squeeze / (1 + epsilon)
+                                               for index in range(len(azimuth_bins))]
 
         plt.figure(figsize=(8, 6))
         for i, bandpass in enumerate(corrected_azimuth_binned_bandpasses):
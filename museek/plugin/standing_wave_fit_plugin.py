@@ -129,18 +129,19 @@ class StandingWaveFitPlugin(AbstractPlugin):
         bandpasses_std_dict = dict()
         bandpasses_dict = dict()
         track_times_dict = dict()
+        target_visibility = track_data.visibility.get(recv=i_receiver, freq=self.target_channels)
+        labels = np.full(target_visibility.shape[0], -1)
         for i_label, pointing_times in enumerate(times_list):
-            label = pointing_labels[i_label]
             track_times = list(np.asarray(times)[pointing_times])
-            track_times_dict[label] = track_times
-            target_visibility = track_data.visibility.get(recv=i_receiver,
-                                                          freq=self.target_channels,
-                                                          time=track_times)
-            flags = None
-            bandpass_std_pointing = target_visibility.standard_deviation(axis=0, flags=flags)
-            bandpass_pointing = target_visibility.mean(axis=0, flags=flags)
-            bandpasses_std_dict[label] = bandpass_std_pointing
-            bandpasses_dict[label] = bandpass_pointing
+            track_times_dict[pointing_labels[i_label]] = track_times
+            labels[track_times] = i_label
+        pointing_reductions = target_visibility.reduce_by_groups(operations=['mean', 'standard_deviation'],
+                                                                 labels=labels,
+                                                                 n_groups=len(times_list))
+        for i_label in range(len(times_list)):
+            label = pointing_labels[i_label]
+            bandpasses_std_dict[label] = pointing_reductions['standard_deviation'].get(time=i_label)
+            bandpasses_dict[label] = pointing_reductions['mean'].get(time=i_label)
 
         return bandpasses_std_dict, bandpasses_dict, track_times_dict
 
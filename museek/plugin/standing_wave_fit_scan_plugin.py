@@ -9,9 +9,12 @@ from definitions import MEGA
 from ivory.plugin.abstract_plugin import AbstractPlugin
 from ivory.utils.requirement import Requirement
 from ivory.utils.result import Result
+from museek.data_element import DataElement
 from museek.enums.result_enum import ResultEnum
+from museek.flag_element import FlagElement
 from museek.model.bandpass_model import BandpassModel
 from museek.time_ordered_data import TimeOrderedData
+from museek.util.streaming_statistics import StreamingStatistics
 
 
 class StandingWaveFitScanPlugin(AbstractPlugin):
@@ -61,7 +64,7 @@ class StandingWaveFitScanPlugin(AbstractPlugin):
                                f'{scan_data.frequencies.get(freq=self.target_channels[-1]).squeeze / MEGA:.0f}' \
                                f'_MHz.json'
 
-        scan_data.load_visibility_flags_weights()
+        bandpass_estimators = self.bandpass_estimators(data=scan_data)
         epsilon_function_dict = {}  # type: dict[dict[[Callable]]]
         legendre_function_dict = {}  # type: dict[dict[[Callable]]]
         parameters_dict = {}  # type: dict[dict[dict[float]]]
@@ -83,14 +86,8 @@ class StandingWaveFitScanPlugin(AbstractPlugin):
                 standing_wave_displacements=[14.7, 13.4, 16.2, 17.9, 12.4, 19.6, 11.7, 5.8],
                 legendre_degree=1,
             )
-            flags = scan_data.flags.get(time=times,
-                                        freq=self.target_channels,
-                                        recv=i_receiver)
-            bandpass_estimator = scan_data.visibility.get(time=times,
-                                                          freq=self.target_channels,
-                                                          recv=i_receiver).mean(axis=0, flags=flags)
             bandpass_model.fit(frequencies,
-                               estimator=bandpass_estimator,
+                               estimator=bandpass_estimators.get(recv=i_receiver),
                                receiver_path=receiver_path,
                                calibrator_label=self.calibrator_label)
             epsilon_function_dict[receiver.name][self.calibrator_label] = bandpass_model.epsilon_function
@@ -114,6 +111,25 @@ class StandingWaveFitScanPlugin(AbstractPlugin):
                                       result=self.calibrator_label,
                                       allow_overwrite=False))
 
+    def bandpass_estimators(self, data: TimeOrderedData, chunk_size: int = 256) -> DataElement:
+        """
+        Return the flagged mean of the visibility in `data` over the calibrator dumps of each receiver at the
+        target channels. It is accumulated in one pass over chunks of `chunk_size` dumps, dumps that are not
+        calibrator dumps of a receiver are flagged for it. The mean is fully masked for a receiver without
+        calibrator dumps.
+        """
+        is_calibrator = np.zeros((data.timestamps.shape[0], 1, len(data.receivers)), dtype=bool)
+        for i_receiver, receiver in enumerate(data.receivers):
+            times = np.asarray(self.calibrator_times(data=data,
+                                                     i_antenna=receiver.antenna_index(receivers=data.receivers)))
+            is_calibrator[times[times < len(is_calibrator)], :, i_receiver] = True
+        statistics = StreamingStatistics(max_moment=2)
+        for chunk in data.iter_chunks(n_dumps=chunk_size):
+            flags = chunk.flags.get(freq=self.target_channels)
+            flags.add_flag(flag=FlagElement(array=~is_calibrator[chunk.dumps.start:chunk.dumps.stop]))
+            statistics.update(data=chunk.visibility.get(freq=self.target_channels), flags=flags)
+        return statistics.mean
+
     def calibrator_times(self, data: TimeOrderedData, i_antenna: int) -> range | np.ndarray:
         """ Return the calibration time dump indices for antenna `i_antenna` in `data` as `range` or `np.ndarray`. """
         if self.calibrator_label == self.first_scan_dumps_label:
@@ -7,6 +7,7 @@ from matplotlib import pyplot as plt
 from museek.data_element import DataElement
 from museek.factory.data_element_factory import FlagElementFactory
 from museek.flag_element import FlagElement
+from museek.util.streaming_statistics import StreamingStatistics
 
 """
 A collection of functions for RFI flagging using the AOflagger algorithm.
@@ -238,15 +239,22 @@ def _sum_threshold_mask(
     return result
 
 
-def plot_moments(data, output_path: str):
+def plot_moments(data, output_path: str, chunk_size: int = 256):
     """
     Plot standard divation and mean of data.
+    The moments are accumulated over chunks of `chunk_size` dumps, so no temporary array of the size of `data`
+    is created.
     """
-
-    std_time = np.std(data, axis=0)
-    mean_time = np.mean(data, axis=0)
-    std_freuqency = np.std(data, axis=1)
-    mean_freuqency = np.mean(data, axis=1)
+    statistics = StreamingStatistics(max_moment=2)
+    std_freuqency = np.empty(data.shape[0])
+    mean_freuqency = np.empty(data.shape[0])
+    for start in range(0, data.shape[0], chunk_size):
+        chunk = data[start:start + chunk_size]
+        statistics.update(data=DataElement(array=chunk[:, :, np.newaxis]))
+        std_freuqency[start:start + chunk_size] = np.std(chunk, axis=1)
+        mean_freuqency[start:start + chunk_size] = np.mean(chunk, axis=1)
+    std_time = statistics.standard_deviation.squeeze
+    mean_time = statistics.mean.squeeze
     plt.subplot(221)
     plt.plot(mean_time)
     plt.xlabel('time')
@@ -1,21 +1,32 @@
 import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from copy import copy
 from datetime import datetime
-from typing import Optional, NamedTuple, Any
+from typing import Optional, NamedTuple, Any, Generator, Callable
 
+import dask
+import dask.array as da
 import katdal
 import numpy as np
 from katdal import DataSet
 from katdal.lazy_indexer import DaskLazyIndexer
 from katpoint import Target, Antenna
 
-from definitions import ROOT_DIR
+from definitions import ROOT_DIR, MEGA
+from museek.cache.cache_manager import CacheManager
+from museek.cache.chunked_codec import ChunkedCodec
+from museek.cache.metadata_cache import MetadataCache, CachedDataSet
+from museek.cache.visibility_cache import VisibilityCache, ReceiverShardedArray
+from museek.dask_data_element import DaskDataElement
 from museek.data_element import DataElement
 from museek.enums.scan_state_enum import ScanStateEnum
-from museek.factory.data_element_factory import AbstractDataElementFactory, DataElementFactory, FlagElementFactory
+from museek.factory.data_element_factory import AbstractDataElementFactory, DataElementFactory, FlagElementFactory, \
+    DaskDataElementFactory
 from museek.flag_list import FlagList
 from museek.receiver import Receiver
 from museek.util.clustering import Clustering
+from museek.util.data_set_pool import data_set_pool
 
 
 class ScanTuple(NamedTuple):
@@ -30,11 +41,32 @@ class ScanTuple(NamedTuple):
     target: Target
 
 
+class TimeOrderedDataChunk(NamedTuple):
+    """
+    A `NamedTuple` to hold the `DataElement`s of a window of consecutive dumps of `TimeOrderedData`.
+    The `dumps` are the indices of the window relative to the dumps of the `TimeOrderedData`.
+    """
+    dumps: range
+    visibility: DataElement
+    flags: FlagList
+    weights: DataElement
+    timestamps: DataElement
+    azimuth: DataElement
+    elevation: DataElement
+    right_ascension: DataElement
+    declination: DataElement
+
+
 class TimeOrderedData:
     """
     Class for handling time ordered data coming from `katdal`.
     """
 
+    # autocorrelations are real and `katdal` provides single precision visibilities
+    _visibility_dtype = np.dtype(np.float32)
+    # pending background writes to the visibility cache by cache directory, shared by all copies of an instance
+    _cache_writes: dict[str, Future] = {}
+
     def __init__(self,
                  block_name: str,
                  receivers: list[Receiver],
@@ -42,7 +74,17 @@ class TimeOrderedData:
                  data_folder: Optional[str],
                  scan_state: ScanStateEnum | None = None,
                  force_load_from_correlator_data: bool = False,
-                 do_create_cache: bool = True):
+                 do_create_cache: bool = True,
+                 weights_dtype: str = 'float64',
+                 channels: range | None = None,
+                 frequency_range: tuple[float, float] | None = None,
+                 selected_scan_states: list[ScanStateEnum] | None = None,
+                 cache_max_bytes: int | None = None,
+                 cache_codec: str | None = None,
+                 cache_compression_level: int | None = None,
+                 loader_threads: int | None = None,
+                 loader_dump_batch_size: int | None = None,
+                 loader_progress_callback: Callable[[int, int, float], None] | None = None):
         """
         Initialise
         :param block_name: name of the observation block
@@ -51,11 +93,31 @@ class TimeOrderedData:
         :param data_folder: folder where data is stored
         :param scan_state: optional `ScanStateEnum` defining the scan state name. If it is given, only timestamps for
                            that scan state are loaded.
-        :param force_load_from_correlator_data: if `True` ignores local cache files of visibility, flag or weights
-        :param do_create_cache: if `True` a cache file of visibility, flag and weight data is created if it is not
-                                already present
+        :param force_load_from_correlator_data: if `True` ignores local cache files of metadata, visibility, flag
+                                                or weights
+        :param do_create_cache: if `True` cache files of metadata, visibility, flag and weight data are created if
+                                they are not already present
+        :param weights_dtype: `dtype` name of the weights loaded from the correlator data, e.g. 'float32',
+                              weights loaded from cache keep the `dtype` recorded in the cache
+        :param channels: optional `range` of channel indices to select, if `None`, all channels are selected
+        :param frequency_range: optional lower and upper frequency [MHz] limits of the channels to select
+        :param selected_scan_states: optional `list` of `ScanStateEnum`s, if given, only dumps of these scan states
+                                     are selected in `katdal` or read from the cache, no cache is created
+        :param cache_max_bytes: optional byte budget of the cache directory, least recently used cache entries
+                                of other blocks are evicted when it is exceeded, if `None`, nothing is evicted
+        :param cache_codec: optional codec to compress the visibility cache with in parallel chunks, one of
+                            'zlib', 'bz2' or 'lzma', if `None`, the cache is stored uncompressed and memory-mapped
+        :param cache_compression_level: optional compression level of `cache_codec`, `None` means its default
+        :param loader_threads: optional number of `dask` threads to load visibility, flags and weights from
+                               `katdal` with, if `None`, the `dask` default is used
+        :param loader_dump_batch_size: optional minimum number of dumps loaded from `katdal` per batch, batches are
+                                       extended to the next `katdal` chunk boundary, if `None`, all dumps are
+                                       loaded in one batch
+        :param loader_progress_callback: optional callable receiving the number of loaded dumps, the total
+                                         number of dumps and the throughput in bytes per second after each batch
         """
         # these can consume a lot of memory, so they are only loaded when needed
+        self._unsplit_visibility_flags_weights: tuple[DataElement, FlagList, DataElement] | None = None
         self.visibility: DataElement | None = None
         self.flags: FlagList | None = None
         self.weights: DataElement | None = None
@@ -71,17 +133,37 @@ class TimeOrderedData:
 
         self._force_load_from_correlator_data = force_load_from_correlator_data
         self._do_create_cache = do_create_cache
+        self._weights_dtype = np.dtype(weights_dtype)
+        self._channels = channels
+        self._frequency_range = frequency_range
+        self._selected_scan_states = selected_scan_states
+        self._loader_threads = loader_threads
+        self._loader_dump_batch_size = loader_dump_batch_size
+        self._loader_progress_callback = loader_progress_callback
+        self._cache_manager = CacheManager(cache_directory=os.path.join(ROOT_DIR, 'cache'), max_bytes=cache_max_bytes)
+        self._metadata_cache_name = f'{block_name}_metadata'
+        self._metadata_cache = MetadataCache(cache_directory=os.path.join(ROOT_DIR, 'cache', self._metadata_cache_name))
 
         data = self._get_data()
         self.receivers = self._get_receivers(requested_receivers=receivers, data=data)
         self.correlator_products = self._get_correlator_products()
         self.all_antennas = data.ants
+        self._scan_tuple_list = self._get_scan_tuple_list(data=data)
+        # dump indices of the entire block that are selected, `None` means all dumps
+        self._selected_dumps = self._dumps_of_scan_states(scan_states=selected_scan_states)
+        if self._selected_dumps is not None:
+            self._do_create_cache = False  # only the entire data can be stored, not individual scan states
         self._select(data=data)
+        if isinstance(data, DataSet):
+            data_set_pool.put(open_argument=self._katdal_open_argument, selection=self._selection(), data=data)
         self._data_str = str(data)
-        self._cache_file_name = f'{data.name}_auto_visibility_flags_weights.npz'
-        cache_file_directory = os.path.join(ROOT_DIR, 'cache')
-        os.makedirs(cache_file_directory, exist_ok=True)
-        self._cache_file = os.path.join(cache_file_directory, self._cache_file_name)
+        self._visibility_cache_name = self._cache_name(data=data)
+        self._cache_directory = os.path.join(ROOT_DIR, 'cache', self._visibility_cache_name)
+        codec = None if cache_codec is None else ChunkedCodec(codec=cache_codec, level=cache_compression_level)
+        self._visibility_cache = VisibilityCache(cache_directory=self._cache_directory,
+                                                 dataset_name=data.name,
+                                                 selection=self._cache_selection(data=data),
+                                                 codec=codec)
 
         self.obs_script_log = data.obs_script_log
         self.shape = data.shape
@@ -109,32 +191,117 @@ class TimeOrderedData:
         self.humidity: DataElement | None = None
         self.pressure: DataElement | None = None
 
-        self._scan_tuple_list = self._get_scan_tuple_list(data=data)
         self.set_data_elements(data=data, scan_state=scan_state)
 
         self.gain_solution: DataElement | None = None
 
+        # cache entry pinned by `self` while its visibility, flags and weights are loaded from it
+        self._pinned_cache_name: str | None = None
+
     def __str__(self):
         """ Returns the same `str` as `katdal`. """
         return self._data_str
 
-    def set_data_elements(self, scan_state: ScanStateEnum | None, data: DataSet | None = None):
+    def __getstate__(self) -> dict:
+        """
+        Returns the state of `self` for pickling and copying, without the loader progress callback, which may not
+        be picklable, and without the cache pin, which stays with `self`.
+        """
+        state = self.__dict__.copy()
+        state['_loader_progress_callback'] = None
+        state['_pinned_cache_name'] = None
+        return state
+
+    def __setstate__(self, state: dict):
+        """
+        Sets the state of `self` from `state`, including states pickled before visibility, flags and weights
+        became properties.
+        """
+        for name in ['visibility', 'flags', 'weights']:
+            if name in state:
+                state[f'_{name}'] = state.pop(name)
+        state.setdefault('_unsplit_visibility_flags_weights', None)
+        state.setdefault('_pinned_cache_name', None)
+        state.pop('_cache_write_future', None)
+        self.__dict__.update(state)
+
+    @property
+    def visibility(self) -> DataElement | None:
+        """ The visibility `DataElement`, indexed to `self.scan_state` when first accessed after `self.split()`. """
+        self._materialise_visibility_flags_weights()
+        return self._visibility
+
+    @visibility.setter
+    def visibility(self, visibility: DataElement | None):
+        self._materialise_visibility_flags_weights()
+        self._visibility = visibility
+
+    @property
+    def flags(self) -> FlagList | None:
+        """ The `FlagList`, indexed to `self.scan_state` when first accessed after `self.split()`. """
+        self._materialise_visibility_flags_weights()
+        return self._flags
+
+    @flags.setter
+    def flags(self, flags: FlagList | None):
+        self._materialise_visibility_flags_weights()
+        self._flags = flags
+
+    @property
+    def weights(self) -> DataElement | None:
+        """ The weights `DataElement`, indexed to `self.scan_state` when first accessed after `self.split()`. """
+        self._materialise_visibility_flags_weights()
+        return self._weights
+
+    @weights.setter
+    def weights(self, weights: DataElement | None):
+        self._materialise_visibility_flags_weights()
+        self._weights = weights
+
+    def split(self, scan_state: ScanStateEnum | None) -> 'TimeOrderedData':
+        """
+        Returns a copy of `self` with its `DataElement`s set for `scan_state`.
+        The containers of `self`, e.g. the `list` of receivers, are copied, their items and the cache handles are
+        shared. Only the small `DataElement`s like timestamps and pointing are indexed right away, visibility,
+        flags and weights are indexed when first accessed on the copy, they are writable copies of the dumps of
+        `scan_state` only.
+        :param scan_state: the scan state as a `ScanStateEnum`
+        :return: the `TimeOrderedData` of `scan_state`
+        """
+        self._materialise_visibility_flags_weights()
+        split_data = copy(self)
+        for name, value in vars(split_data).items():
+            if isinstance(value, list | dict | set | np.ndarray):
+                setattr(split_data, name, copy(value))
+        split_data.set_data_elements(scan_state=scan_state)
+        return split_data
+
+    def set_data_elements(self, scan_state: ScanStateEnum | None, data: DataSet | CachedDataSet | None = None):
         """
         Initialises all `DataElement`s for `scan_state` using either a `katdal` `DataSet` or `self`.
         :param scan_state: the scan state as a `ScanStateEnum`, this is set as an attribute to `self`
-        :param data: a `DataSet` object from `katdal`, can be `None`
+        :param data: a `DataSet` object from `katdal` or a `CachedDataSet`, can be `None`
         """
         if self.timestamps is None:
             self._set_data_elements_from_katdal(data=data, scan_state=scan_state)
         else:
             self._set_data_elements_from_self(scan_state=scan_state)
 
-    def load_visibility_flags_weights(self):
-        """ Load visibility, flag and weights and set them as attributes to `self`. """
+    def load_visibility_flags_weights(self, write_cache_in_background: bool = False):
+        """
+        Load visibility, flag and weights and set them as attributes to `self`.
+        If a visibility cache exists afterwards, it is pinned until `self.delete_visibility_flags_weights()`
+        is called, so other processes sharing the cache directory do not evict it meanwhile.
+        :param write_cache_in_background: if `True` and the cache needs to be written, the data is loaded to memory
+                                          and copied to the cache shards, which are flushed to disc by a
+                                          background thread, see `self.wait_for_cache_write()`
+        """
         if self.flags is not None and self.weights is not None and self.visibility is not None:
             print('Visibility, flag and weight data is already loaded.')
             return
-        visibility_array, flag_array, weight_array = self._visibility_flags_weights()
+        visibility_array, flag_array, weight_array = self._visibility_flags_weights(
+            write_cache_in_background=write_cache_in_background
+        )
         self.visibility = self._element_factory.create(array=visibility_array)
         if self.flags is not None:
             print('Overwriting existing flags.')
@@ -142,12 +309,68 @@ class TimeOrderedData:
         if self.weights is not None:
             print('Overwriting existing weights.')
         self.weights = self._element_factory.create(array=weight_array)
+        if self._pinned_cache_name is None and self._visibility_cache.exists():
+            self._pinned_cache_name = self._visibility_cache_name
+            self._cache_manager.pin(name=self._pinned_cache_name)
+
+    def iter_chunks(self, n_dumps: int, overlap: int = 0) -> Generator[TimeOrderedDataChunk, None, None]:
+        """
+        Iterate through windows of at most `n_dumps` consecutive dumps and yield a `TimeOrderedDataChunk` for each.
+        The visibility, flags and weights are taken from memory if they are loaded, otherwise they are read
+        window by window from the cache or, if the cache does not contain all receivers, from `katdal`.
+        The memory consumption is therefore bounded by the size of one window.
+        :param n_dumps: maximum number of dumps per window
+        :param overlap: number of dumps shared by consecutive windows
+        :raise ValueError: if `overlap` is negative or not smaller than `n_dumps`
+        """
+        if not 0 <= overlap < n_dumps:
+            raise ValueError(f'Input `overlap` must be non-negative and smaller than `n_dumps` {n_dumps}, '
+                             f'got {overlap}.')
+        n_dumps_total = self.timestamps.shape[0]
+        selected_dump_indices = self._selected_dump_indices()
+        data = None
+        if self.visibility is None and not self._visibility_cache_contains_receivers():
+            data = self._open_selected_data()
+        element_factory = DataElementFactory()
+        flag_element_factory = FlagElementFactory()
+        for start in range(0, n_dumps_total, n_dumps - overlap):
+            dumps = range(start, min(start + n_dumps, n_dumps_total))
+            visibility, flags, weights = self._visibility_flags_weights_of_dumps(
+                dumps=dumps,
+                selected_dumps=[selected_dump_indices[dump] for dump in dumps],
+                data=data
+            )
+            yield TimeOrderedDataChunk(
+                dumps=dumps,
+                visibility=element_factory.create(array=visibility),
+                flags=FlagList.from_array(array=flags, element_factory=flag_element_factory),
+                weights=element_factory.create(array=weights),
+                timestamps=self.timestamps.get(time=slice(dumps.start, dumps.stop)),
+                azimuth=self.azimuth.get(time=slice(dumps.start, dumps.stop)),
+                elevation=self.elevation.get(time=slice(dumps.start, dumps.stop)),
+                right_ascension=self.right_ascension.get(time=slice(dumps.start, dumps.stop)),
+                declination=self.declination.get(time=slice(dumps.start, dumps.stop)),
+            )
+            if dumps.stop == n_dumps_total:
+                break
+
+    def wait_for_cache_write(self):
+        """
+        Block until a background write of visibility, flags and weights to the cache of `self` or of any copy of
+        `self` is finished. It is called before the cache is read, the interpreter also waits for it before exiting.
+        :raise: the exception raised by the background write if it failed
+        """
+        if (future := self._cache_writes.pop(self._cache_directory, None)) is not None:
+            future.result()
 
     def delete_visibility_flags_weights(self):
-        """ Delete large arrays from memory, i.e. replace them with `None`. """
+        """ Delete large arrays from memory, i.e. replace them with `None`, and unpin their cache entry. """
         self.visibility = None
         self.flags = None
         self.weights = None
+        if self._pinned_cache_name is not None:
+            self._cache_manager.unpin(name=self._pinned_cache_name)
+            self._pinned_cache_name = None
 
     def antenna(self, receiver) -> Antenna:
         """ Returns the `Antenna` object belonging to `receiver`. """
@@ -176,15 +399,32 @@ class TimeOrderedData:
             return
         return self.visibility / self.gain_solution
 
-    def _set_data_elements_from_katdal(self, scan_state: ScanStateEnum | None, data: DataSet | None = None):
+    def dask_visibility_flags_weights(self) -> tuple[DaskDataElement, DaskDataElement, DaskDataElement]:
+        """
+        Returns visibility, flags and weights of `self.scan_state` as `DaskDataElement`s read lazily from `katdal`.
+        Nothing is loaded to memory, so reductions of data larger than the memory are computed chunk by chunk.
+        The flags are the combined `katdal` flags as one `DaskDataElement`, which can be passed as `flags` to the
+        reductions of the visibility without computing it.
+        """
+        data = self._open_selected_data()
+        factory = DaskDataElementFactory()
+        if self.scan_state is not None:
+            factory = self.scan_state.factory(scan_dumps=self._dumps(), component=factory)
+        visibility, flags, weights = [lazy_indexer.dataset
+                                      for lazy_indexer in self._autocorrelation_lazy_indexers(data=data)]
+        return factory.create(array=visibility), factory.create(array=flags), factory.create(array=weights)
+
+    def _set_data_elements_from_katdal(self,
+                                       scan_state: ScanStateEnum | None,
+                                       data: DataSet | CachedDataSet | None = None):
         """
         Initialises all `DataElement`s for `scan_state` using the element factory. Sets the elements as attributes.
         :param scan_state: the scan state as a `ScanStateEnum`, this is set as an attribute to `self`
-        :param data: a `DataSet` object from `katdal`, can be `None`, in which case it is loaded again
+        :param data: a `DataSet` object from `katdal` or a `CachedDataSet`, can be `None`,
+                     in which case it is taken from the `DataSet` pool
         """
         if data is None:
-            data = self._get_data()
-            self._select(data=data)
+            data = self._open_selected_data()
         if scan_state is not None:
             self._do_create_cache = False  # only the entire data can be stored, not individual scan states
         self.scan_state = scan_state
@@ -218,6 +458,8 @@ class TimeOrderedData:
         Re-initialises all `DataElement`s for `scan_state` using the element factory. Sets the elements as attributes.
         :param scan_state: the scan state as a `ScanStateEnum`, this is set as an attribute to `self`
         """
+        # elements pending from a previous split are indexed with the previous factories first
+        self._materialise_visibility_flags_weights()
         if scan_state is not None:
             self._do_create_cache = False  # only the entire data can be stored, not individual scan states
         self.scan_state = scan_state
@@ -241,16 +483,42 @@ class TimeOrderedData:
         self.humidity = self._element_factory.create(array=self.humidity.array)
         self.pressure = self._element_factory.create(array=self.pressure.array)
 
-        # visibility, flags and weights
-        if self.visibility is not None:
-            self.visibility = self._element_factory.create(array=self.visibility.array)
-            self.flags = FlagList.from_array(array=self.flags.array, element_factory=self._flag_element_factory)
-            self.weights = self._element_factory.create(array=self.weights.array)
+        # visibility, flags and weights are only indexed when accessed
+        if self._visibility is not None:
+            self._unsplit_visibility_flags_weights = (self._visibility, self._flags, self._weights)
+            self._visibility, self._flags, self._weights = None, None, None
 
-    def _get_data(self) -> DataSet:
+    def _materialise_visibility_flags_weights(self):
+        """
+        Indexes the visibility, flags and weights pending from `self._set_data_elements_from_self()` at the dumps
+        of `self.scan_state` and sets them as attributes. Does nothing if nothing is pending.
+        Contiguous dumps are indexed with a `slice`. Only the selected dumps are copied, so the results are writable
+        and changes in place do not affect the unsplit data.
+        """
+        if self._unsplit_visibility_flags_weights is None:
+            return
+        visibility, flags, weights = self._unsplit_visibility_flags_weights
+        self._unsplit_visibility_flags_weights = None
+        dump_index = self._dump_index()
+        self._visibility = visibility.get(time=dump_index)
+        self._flags = flags.get(time=dump_index)
+        self._weights = weights.get(time=dump_index)
+
+    def _dump_index(self) -> slice | list[int] | None:
+        """
+        Returns the dump indices of `self._dumps()` as a `slice` if they are contiguous, else unchanged.
+        """
+        dumps = self._dumps()
+        if dumps and dumps[-1] - dumps[0] == len(dumps) - 1:
+            return slice(dumps[0], dumps[-1] + 1)
+        return dumps
+
+    def _get_data(self) -> DataSet | CachedDataSet:
         """
         Loads and returns the data from `katdal` for `self._block_name` using either `self._token`
-        or if it is `None`, the `self._data_folder`.
+        or if it is `None`, the `self._data_folder`. If the metadata sidecar is available, a `CachedDataSet` is
+        returned instead without opening the `rdb` file. If the sidecar is not available and
+        `self._do_create_cache` is `True`, it is created.
         """
         if self._token is not None:
             katdal_open_argument = f'https://archive-gw-1.kat.ac.za/' \
@@ -261,7 +529,17 @@ class TimeOrderedData:
                 f'{self._block_name}/{self._block_name}/{self._block_name}_sdp_l0.full.rdb'
             )
         self._katdal_open_argument = katdal_open_argument
-        return katdal.open(self._katdal_open_argument)
+        if self._metadata_cache.exists() and not self._force_load_from_correlator_data:
+            print(f'Loading metadata for {self._block_name} from cache files...')
+            self._cache_manager.record_hit(name=self._metadata_cache_name)
+            return self._metadata_cache.load()
+        self._cache_manager.record_miss(name=self._metadata_cache_name)
+        data = katdal.open(self._katdal_open_argument)
+        if self._do_create_cache:
+            print(f'Creating metadata cache files for {self._block_name}...')
+            self._metadata_cache.store(data=data)
+            self._enforce_cache_budget(pinned_names=[self._metadata_cache_name])
+        return data
 
     def _dumps_of_scan_state(self) -> list[int] | None:
         """
@@ -269,14 +547,31 @@ class TimeOrderedData:
         """
         if self.scan_state is None:
             return
+        return self._dumps_of_scan_states(scan_states=[self.scan_state])
+
+    def _dumps_of_scan_states(self, scan_states: list[ScanStateEnum] | None) -> list[int] | None:
+        """
+        Returns the sorted dump indices of the entire block that belong to any of `scan_states`.
+        If `scan_states` is `None`, `None` is returned.
+        """
+        if scan_states is None:
+            return
         result = []
         for scan_tuple in self._scan_tuple_list:
-            if scan_tuple.state == self.scan_state:
+            if scan_tuple.state in scan_states:
                 result.extend(scan_tuple.dumps)
-        return result
+        return sorted(result)
 
     def _dumps(self) -> list[int]:
-        return self._dumps_of_scan_state()
+        """
+        Returns the dump indices that belong to `self.scan_state` relative to the dumps in `self`,
+        which are only the `self._selected_dumps` if they are given.
+        """
+        dumps = self._dumps_of_scan_state()
+        if dumps is None or self._selected_dumps is None:
+            return dumps
+        selected_dump_index = {dump: i for i, dump in enumerate(self._selected_dumps)}
+        return [selected_dump_index[dump] for dump in dumps if dump in selected_dump_index]
 
     def _get_data_element_factory(self) -> AbstractDataElementFactory:
         """
@@ -296,93 +591,314 @@ class TimeOrderedData:
             return FlagElementFactory()
         return self.scan_state.factory(scan_dumps=self._dumps(), component=FlagElementFactory())
 
-    def _visibility_flags_weights(self, data: DataSet | None = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    def _visibility_flags_weights(self, data: DataSet | None = None, write_cache_in_background: bool = False) \
+            -> tuple[np.ndarray, np.ndarray, np.ndarray]:
         """
         Returns a tuple of visibility, flags and weights as `np.ndarray`s.
-        It first looks for a cache file containing these. If that file is unavailabe, incomplete or
-        if `self._force_load_from_correlator_data` is `True`, the cache file is created again.
-        :param data: optional `katdal` `DataSet`, defaults to `None`
+        It first looks for intact cache shards of all receivers. Shards of receivers that are missing or corrupt are
+        read from `katdal` and appended to the cache without touching the others, if the cache can be written.
+        If `self._force_load_from_correlator_data` is `True`, the shards of all of `self.receivers` are created again.
+        Only the shards of `self.receivers` are read from the cache, after a pending background write is finished.
+        :param data: optional `katdal` `DataSet` with the selection of `self`, defaults to `None`
+        :param write_cache_in_background: if `True`, all receivers are loaded from `katdal` to memory and the missing
+                                          shards are written from memory by a background thread
         :return: a tuple of visibility, flags and weights as `np.ndarray` each
         """
-        if not os.path.exists(self._cache_file) or self._force_load_from_correlator_data:
+        self.wait_for_cache_write()
+        receiver_names = [receiver.name for receiver in self.receivers]
+        if self._force_load_from_correlator_data:
             self._force_load_from_correlator_data = False
+            missing_receiver_names = receiver_names
+        else:
+            missing_receiver_names = self._visibility_cache.missing_receiver_names(receiver_names=receiver_names)
+
+        if not missing_receiver_names:
+            print(f'Loading visibility, flags and weights for {self.name} from cache files...')
+            self._cache_manager.record_hit(name=self._visibility_cache_name)
+            visibility, flags, weights = self._visibility_cache.load(receiver_names=receiver_names,
+                                                                     dumps=self._selected_dumps)
+        elif self._can_write_cache() and write_cache_in_background:
+            self._cache_manager.record_miss(name=self._visibility_cache_name)
             if data is None:
-                data = katdal.open(self._katdal_open_argument)
-                self._select(data=data)
-            visibility, flags, weights = self._load_autocorrelation_visibility(data=data)
-            if self._do_create_cache:
-                self._visibility_flag_weights_to_cache_file(
-                    visibility=visibility,
-                    flags=flags,
-                    weights=weights,
-                    correlator_products=data.corr_products
-                )
+                data = self._open_selected_data()
+            visibility, flags, weights = self._load_autocorrelation_visibility(data=data, dtypes=self._cache_dtypes())
+            self._write_cache_in_background(visibility=visibility,
+                                            flags=flags,
+                                            weights=weights,
+                                            receiver_names=missing_receiver_names)
+        elif self._can_write_cache():
+            self._cache_manager.record_miss(name=self._visibility_cache_name)
+            missing_receivers = [receiver for receiver in self.receivers if receiver.name in missing_receiver_names]
+            if data is None or len(missing_receivers) < len(self.receivers):
+                data = self._open_selected_data(receivers=missing_receivers)
+            visibility, flags, weights = self._load_autocorrelation_visibility_to_cache_file(data=data)
+            self._enforce_cache_budget(pinned_names=[self._visibility_cache_name, self._metadata_cache_name])
         else:
-            print(f'Loading visibility, flags and weights for {self.name} from cache file...')
-            data_from_cache = np.load(self._cache_file)
-            correlator_products = data_from_cache['correlator_products']
-            try:  # if this fails it means that the cache file does not contain the correlator products
-                correlator_products_indices = self._correlator_products_indices(
-                    all_correlator_products=correlator_products
-                )
-            except ValueError:
-                self._force_load_from_correlator_data = True
-                self._do_create_cache = True
-                return self._visibility_flags_weights(data=data)
-            visibility = data_from_cache['visibility'][:, :, correlator_products_indices]
-            flags = data_from_cache['flags'][:, :, :, correlator_products_indices]
-            weights = data_from_cache['weights'][:, :, correlator_products_indices]
+            self._cache_manager.record_miss(name=self._visibility_cache_name)
+            if data is None:
+                data = self._open_selected_data()
+            visibility, flags, weights = self._load_autocorrelation_visibility(data=data)
         return visibility.real, flags, weights
 
-    def _load_autocorrelation_visibility(self, data: DataSet) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    def _write_cache_in_background(self,
+                                   visibility: np.ndarray,
+                                   flags: np.ndarray,
+                                   weights: np.ndarray,
+                                   receiver_names: list[str]):
+        """
+        Copy the loaded `visibility`, `flags` and `weights` of the receivers in `receiver_names` to new memory-mapped
+        cache shards and flush them to disc in a background thread. The copy is a snapshot, so the loaded arrays
+        may be changed afterwards. Only packing, compressing and syncing the shards and the cache manifest, which
+        is only updated once all shards are on disc, happen in the background.
+        A failure is printed as soon as it happens and raised again by `self.wait_for_cache_write()`.
+        :param visibility: 3-dimensional visibility of all of `self.receivers`
+        :param flags: 4-dimensional flags of all of `self.receivers`
+        :param weights: 3-dimensional weights of all of `self.receivers`
+        :param receiver_names: names of the receivers to write
+        """
+        self.wait_for_cache_write()
+        print(f'Writing cache files for {len(receiver_names)} receivers of {self.name} in the background...')
+        all_receiver_names = [receiver.name for receiver in self.receivers]
+        receiver_indices = [all_receiver_names.index(receiver_name) for receiver_name in receiver_names]
+        dtypes = [visibility.dtype, flags.dtype, weights.dtype]
+        targets = self._visibility_cache.create_shards(receiver_names=receiver_names,
+                                                       shape=self.shape[:2],
+                                                       dtypes=dtypes)
+        for target, array in zip(targets, [visibility, flags[0], weights]):
+            for i_target, i_receiver in enumerate(receiver_indices):
+                target[:, :, i_target:i_target + 1] = array[:, :, i_receiver:i_receiver + 1]
+        executor = ThreadPoolExecutor(max_workers=1)
+        future = executor.submit(self._write_cache, targets=targets, receiver_names=receiver_names, dtypes=dtypes)
+        future.add_done_callback(self._report_cache_write_failure)
+        self._cache_writes[self._cache_directory] = future
+        executor.shutdown(wait=False)
+
+    def _write_cache(self, targets: list[ReceiverShardedArray], receiver_names: list[str], dtypes: list[np.dtype]):
+        """
+        Flush the shards `targets` of `receiver_names` to disc, add them to the cache manifest and enforce the cache
+        budget afterwards.
+        """
+        for target in targets:
+            target.flush()
+        self._visibility_cache.add_to_index(receiver_names=receiver_names, shape=self.shape[:2], dtypes=dtypes)
+        self._enforce_cache_budget(pinned_names=[self._visibility_cache_name, self._metadata_cache_name])
+
+    def _report_cache_write_failure(self, future: Future):
+        """ Print the exception of the background cache write `future` if it failed. """
+        if (exception := future.exception()) is not None:
+            print(f'Writing cache files of {self.name} in the background failed: {exception!r}')
+
+    def _enforce_cache_budget(self, pinned_names: list[str]):
+        """ Evict cache entries to meet the cache budget, except the entries in `pinned_names`. """
+        with self._cache_manager.pinned(names=pinned_names):
+            self._cache_manager.enforce_budget()
+
+    def _can_write_cache(self) -> bool:
+        """
+        Returns `True` if shards can be written to the visibility cache, i.e. if the entire block is selected and
+        cache creation is requested. Without the request, an existing cache is neither appended to nor rewritten.
+        """
+        if self.scan_state is not None or self._selected_dumps is not None:
+            return False
+        return self._do_create_cache
+
+    def _visibility_flags_weights_of_dumps(self, dumps: range, selected_dumps: list[int], data: DataSet | None) \
+            -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns a tuple of visibility, flags and weights at `dumps`.
+        They are taken from memory as read-only views if loaded, else from `data` if it is given, else from the cache.
+        :param dumps: consecutive dump indices relative to the dumps in `self`
+        :param selected_dumps: the same dumps but relative to the dumps selected in `katdal`
+        :param data: optional `katdal` `DataSet` with the selection of `self`
+        :return: a tuple of visibility, flags and weights as `np.ndarray` each, with the visibility and weights
+                 3-dimensional and the flags 4-dimensional
+        """
+        if self.visibility is not None:
+            dump_slice = slice(dumps.start, dumps.stop)
+            return (self.visibility.get(time=dump_slice, copy=False).array,
+                    self.flags.get(time=dump_slice).array,
+                    self.weights.get(time=dump_slice, copy=False).array)
+        if data is not None:
+            with dask.config.set(self._dask_config()):
+                visibility, flags, weights = DaskLazyIndexer.get(
+                    arrays=self._autocorrelation_lazy_indexers(data=data),
+                    keep=selected_dumps
+                )
+            return visibility, flags[np.newaxis], weights
+        block_dumps = selected_dumps
+        if self._selected_dumps is not None:
+            block_dumps = [self._selected_dumps[dump] for dump in selected_dumps]
+        return self._visibility_cache.load(receiver_names=[receiver.name for receiver in self.receivers],
+                                           dumps=block_dumps)
+
+    def _selected_dump_indices(self) -> list[int] | range:
+        """
+        Returns the indices of the dumps in `self` relative to the dumps selected in `katdal`,
+        which differ if `self.scan_state` is not `None`.
+        """
+        if self.scan_state is None:
+            return range(self.shape[0])
+        return self._dumps()
+
+    def _visibility_cache_contains_receivers(self) -> bool:
+        """
+        Returns `True` if the visibility cache can be used and contains intact shards of all receivers,
+        after a pending background write is finished.
+        """
+        if self._force_load_from_correlator_data:
+            return False
+        self.wait_for_cache_write()
+        return self._visibility_cache.contains(receiver_names=[receiver.name for receiver in self.receivers])
+
+    def _load_autocorrelation_visibility(self, data: DataSet, dtypes: list[np.dtype] | None = None) \
+            -> tuple[np.ndarray, np.ndarray, np.ndarray]:
         """
         Loads and returns the visibility, flags and weights from katdal lazy indexer.
+        The visibility is loaded directly as real autocorrelation power in single precision.
         Note: this consumes a lot of memory depending on the selection of `data`.
         :param data: a `katdal` `DataSet`
+        :param dtypes: optional `list` of the `dtype`s of visibility, flags and weights,
+                       defaults to the `dtype`s of `self`
         :return: a tuple of visibility, flags and weights as `np.ndarray` each, with the visibility and weights
                  3-dimensional and the flags 4-dimensional
         """
-        visibility = np.zeros(shape=self.shape, dtype=complex)
-        flags = np.zeros(shape=self.shape, dtype=bool)
-        weights = np.zeros(shape=self.shape, dtype=float)
-        DaskLazyIndexer.get(arrays=[data.vis, data.flags, data.weights],
-                            keep=...,
-                            out=[visibility, flags, weights])
+        if dtypes is None:
+            dtypes = [self._visibility_dtype, np.dtype(bool), self._weights_dtype]
+        visibility, flags, weights = [np.zeros(shape=self.shape, dtype=dtype) for dtype in dtypes]
+        self._store_autocorrelations(data=data, dtypes=dtypes, out=[visibility, flags, weights])
         flags = flags[np.newaxis]  # necessary for compatibility
         return visibility, flags, weights
 
-    def _visibility_flag_weights_to_cache_file(self,
-                                               visibility: np.ndarray,
-                                               flags: np.ndarray,
-                                               weights: np.ndarray,
-                                               correlator_products: np.ndarray[str]):
+    def _load_autocorrelation_visibility_to_cache_file(self, data: DataSet) \
+            -> tuple[np.ndarray, np.ndarray, np.ndarray]:
         """
-        Store visibility, flag and weights to `npz` file.
-        :param visibility: visibilities as 3-dimensional `numpy` array, `(time, frequency, receivers)`
-        :param flags: flags as 3-dimensional `numpy` array, `(time, frequency, receivers)`
-        :param weights: weights as 4-dimensional `numpy` array, `(1, time, frequency, receivers)`
-        :param correlator_products: `numpy` array of the `str` correlator product names, e.g. `[['m000h', 'm000h']]`
-        :raise ValueError: if `self.scan_state` is not `None`
+        Streams the visibility, flags and weights from katdal lazy indexer directly to memory-mapped cache files
+        and returns them loaded from the cache. Each chunk is written to disc as soon as it arrives,
+        so the memory consumption does not depend on the size of the selection of `data`.
+        :param data: a `katdal` `DataSet`
+        :raise ValueError: if `self.scan_state` is not `None` or if only some scan states are selected
+        :return: a tuple of visibility, flags and weights as `np.ndarray` each, with the visibility and weights
+                 3-dimensional and the flags 4-dimensional
         """
         if self.scan_state is not None:
             raise ValueError(f'Data with scan_state {self.scan_state} '
                              f'cannot store visibility, flag and weight data to cache file.')
-        print(f'Creating cache file for {self.name}...')
-        np.savez_compressed(self._cache_file,
-                            visibility=visibility,
-                            flags=flags,
-                            weights=weights,
-                            correlator_products=np.asarray(correlator_products))
+        if self._selected_scan_states is not None:
+            raise ValueError(f'Data with selected scan states {self._selected_scan_states} '
+                             f'cannot store visibility, flag and weight data to cache file.')
+        self._store_autocorrelations_to_cache_file(data=data)
+        return self._visibility_cache.load(receiver_names=[receiver.name for receiver in self.receivers])
+
+    def _store_autocorrelations_to_cache_file(self, data: DataSet):
+        """
+        Streams the visibility, flags and weights of the receivers selected in `data` from katdal lazy indexer
+        to new cache shards and adds them to the cache manifest once they are completely written.
+        :param data: a `katdal` `DataSet`
+        """
+        receiver_names = [correlator_product[0] for correlator_product in data.corr_products]
+        print(f'Creating cache files for {len(receiver_names)} receivers of {self.name}...')
+        dtypes = self._cache_dtypes()
+        targets = self._visibility_cache.create_shards(receiver_names=receiver_names,
+                                                       shape=self.shape[:2],
+                                                       dtypes=dtypes)
+        self._store_autocorrelations(data=data, dtypes=dtypes, out=targets)
+        for target in targets:
+            target.flush()
+        self._visibility_cache.add_to_index(receiver_names=receiver_names, shape=self.shape[:2], dtypes=dtypes)
+
+    def _store_autocorrelations(self, data: DataSet, dtypes: list[np.dtype], out: list):
+        """
+        Loads the visibility, flags and weights of `data` cast to `dtypes` from `katdal` and stores them to the
+        3-dimensional targets in `out` batch by batch. Batches start and end at `katdal` chunk boundaries and are
+        loaded with `self._loader_threads` threads. `self._loader_progress_callback` is called after each batch.
+        :param data: a `katdal` `DataSet`
+        :param dtypes: `list` of the `dtype`s of visibility, flags and weights
+        :param out: `list` of the targets of visibility, flags and weights, e.g. `np.ndarray`s
+        """
+        datasets = [lazy_indexer.dataset
+                    for lazy_indexer in self._autocorrelation_lazy_indexers(data=data, dtypes=dtypes)]
+        n_dumps = datasets[0].shape[0]
+        start_time = time.perf_counter()
+        n_bytes = 0
+        with dask.config.set(self._dask_config()):
+            for start, stop in self._dump_batches(chunks=datasets[0].chunks[0],
+                                                  batch_size=self._loader_dump_batch_size):
+                region = (slice(start, stop), slice(None), slice(None))
+                batch = [dataset[start:stop] for dataset in datasets]
+                da.store(batch, out, regions=[region] * len(batch), lock=False)
+                n_bytes += sum(array.nbytes for array in batch)
+                if self._loader_progress_callback is not None:
+                    elapsed_time = max(time.perf_counter() - start_time, 1e-9)
+                    self._loader_progress_callback(stop, n_dumps, n_bytes / elapsed_time)
+
+    def _dask_config(self) -> dict:
+        """ Returns the `dask` configuration to load data from `katdal` with `self._loader_threads` threads. """
+        if self._loader_threads is None:
+            return {}
+        return {'scheduler': 'threads', 'num_workers': self._loader_threads}
 
-    def _correlator_products_indices(self, all_correlator_products: np.ndarray) -> Any:
+    @staticmethod
+    def _dump_batches(chunks: tuple[int, ...], batch_size: int | None) -> list[tuple[int, int]]:
+        """
+        Returns `(start, stop)` dump ranges of at least `batch_size` dumps that start and end at the boundaries of
+        the `katdal` dump `chunks`, only the last batch can be smaller. If `batch_size` is `None`, all dumps
+        form one batch.
+        :param chunks: the chunk sizes along the dump axis, e.g. `dask.array.Array.chunks[0]`
+        :param batch_size: minimum number of dumps per batch or `None`
+        :raise ValueError: if `batch_size` is not positive
+        """
+        n_dumps = sum(chunks)
+        if batch_size is None:
+            return [(0, n_dumps)]
+        if batch_size < 1:
+            raise ValueError(f'Input `batch_size` must be positive or `None`, got {batch_size}.')
+        batches = []
+        start = 0
+        for boundary in np.cumsum(chunks).tolist():
+            if boundary - start >= batch_size or boundary == n_dumps:
+                batches.append((start, boundary))
+                start = boundary
+        return batches
+
+    def _cache_dtypes(self) -> list[np.dtype]:
+        """
+        Returns the `dtype`s of visibility, flags and weights recorded in the cache, or the `dtype`s of `self`
+        if there is no cache yet.
+        """
+        return self._visibility_cache.dtypes() or [self._visibility_dtype, np.dtype(bool), self._weights_dtype]
+
+    def _autocorrelation_lazy_indexers(self, data: DataSet, dtypes: list[np.dtype] | None = None) \
+            -> list[DaskLazyIndexer]:
+        """
+        Returns lazy indexers of visibility, flags and weights in `data` that cast to `dtypes` chunk by chunk.
+        The visibility is reduced to its real part, which is the autocorrelation power.
+        :param data: a `katdal` `DataSet`
+        :param dtypes: optional `list` of the `dtype`s of visibility, flags and weights,
+                       defaults to the `dtype`s of `self`
+        :return: `list` of `DaskLazyIndexer`s for visibility, flags and weights
+        """
+        if dtypes is None:
+            dtypes = [self._visibility_dtype, np.dtype(bool), self._weights_dtype]
+        visibility_dtype, flag_dtype, weights_dtype = dtypes
+        return [DaskLazyIndexer(data.vis, transforms=[lambda visibility: visibility.real.astype(visibility_dtype)]),
+                DaskLazyIndexer(data.flags, transforms=[lambda flags: flags.astype(flag_dtype)]),
+                DaskLazyIndexer(data.weights, transforms=[lambda weights: weights.astype(weights_dtype)])]
+
+    def _correlator_products_indices(self,
+                                     all_correlator_products: np.ndarray,
+                                     correlator_products: list[list[str, str]] | None = None) -> Any:
         """
         Returns the indices belonging to the autocorrelation of the input receivers
         relative to `all_correlator_products`.
+        :param all_correlator_products: all correlator products in the data
+        :param correlator_products: optional correlator products to look for, defaults to `self.correlator_products`
         """
+        if correlator_products is None:
+            correlator_products = self.correlator_products
         result = [np.where(np.prod(all_correlator_products == correlator_product, axis=1))[0]
-                  for correlator_product in self.correlator_products]
+                  for correlator_product in correlator_products]
         result = np.asarray(result, dtype=object)
-        if len(result) != len(self.correlator_products) or len(result.shape) != 2 or result.shape[1] == 0:
+        if len(result) != len(correlator_products) or len(result.shape) != 2 or result.shape[1] == 0:
             raise ValueError(f'Input `all_correlator_products` must contain all receivers.')
         result = np.atleast_1d(np.squeeze(result)).tolist()
         return result
@@ -394,12 +910,65 @@ class TimeOrderedData:
         """
         return [[str(receiver)] * 2 for receiver in self.receivers]
 
-    def _select(self, data: DataSet):
-        """ Run `data._select()` on the correlator products in `self`. """
-        data.select(corrprods=self._correlator_products_indices(all_correlator_products=data.corr_products))
+    def _open_selected_data(self, receivers: list[Receiver] | None = None) -> DataSet:
+        """
+        Returns the `katdal` `DataSet` of `self` with the selection of `self` from the `DataSet` pool,
+        it is only opened if not in the pool. The returned `DataSet` must not be selected differently.
+        :param receivers: optional subset of `self.receivers` to select, defaults to all of `self.receivers`
+        """
+        return data_set_pool.get(open_argument=self._katdal_open_argument,
+                                 selection=self._selection(receivers=receivers))
+
+    def _select(self, data: DataSet | CachedDataSet, receivers: list[Receiver] | None = None):
+        """
+        Run `data._select()` on the correlator products, the channel or frequency selection
+        and the selected scan states in `self`.
+        :param data: the `katdal` `DataSet` or its cached stand-in
+        :param receivers: optional subset of `self.receivers` to select, defaults to all of `self.receivers`
+        """
+        selection = self._selection(receivers=receivers)
+        selection['corrprods'] = self._correlator_products_indices(all_correlator_products=data.corr_products,
+                                                                   correlator_products=selection['corrprods'])
+        data.select(**selection)
+
+    def _selection(self, receivers: list[Receiver] | None = None) -> dict:
+        """
+        Returns the keyword arguments of `DataSet.select()` for the autocorrelation products, the channel or
+        frequency selection and the selected scan states in `self`. The correlator products are given as pairs of
+        receiver names, which `katdal` accepts as well, so the selection does not depend on an opened `DataSet`.
+        :param receivers: optional subset of `self.receivers` to select, defaults to all of `self.receivers`
+        """
+        if receivers is None:
+            receivers = self.receivers
+        selection = {'corrprods': [[str(receiver)] * 2 for receiver in receivers]}
+        if self._channels is not None:
+            selection['channels'] = self._channels
+        if self._frequency_range is not None:
+            selection['freqrange'] = tuple(frequency * MEGA for frequency in self._frequency_range)
+        if self._selected_scan_states is not None:
+            selection['scans'] = [scan_state.scan_name for scan_state in self._selected_scan_states]
+        return selection
+
+    def _cache_name(self, data: DataSet | CachedDataSet) -> str:
+        """
+        Returns the name of the cache directory of the selection in `data`.
+        If a channel or frequency selection is given, the selected channels are part of the name.
+        """
+        cache_name = f'{data.name}_auto_visibility_flags_weights'
+        if self._channels is None and self._frequency_range is None:
+            return cache_name
+        start, stop, step = self._cache_selection(data=data)['channels']
+        return f'{cache_name}_channels_{start}_{stop}_{step}'
+
+    def _cache_selection(self, data: DataSet | CachedDataSet) -> dict:
+        """ Returns a `json` serialisable description of the selection in `data` for the cache manifest. """
+        channels = data.channels
+        channel_step = channels[1] - channels[0] if len(channels) > 1 else 1
+        return {'channels': [int(channels[0]), int(channels[-1]) + 1, int(channel_step)]}
 
     @staticmethod
-    def _get_receivers(requested_receivers: list[Receiver] | None, data: DataSet) -> list[Receiver]:
+    def _get_receivers(requested_receivers: list[Receiver] | None,
+                       data: DataSet | CachedDataSet) -> list[Receiver]:
         """
         Returns a `list` of the `Receiver`s in `requested_receivers` that are available in `data`.
         If `requested_receivers` is `None`, all available receivers are returned.
@@ -410,7 +979,7 @@ class TimeOrderedData:
         return [Receiver.from_string(receiver_string=name) for name in all_receiver_names]
 
     @staticmethod
-    def _get_scan_tuple_list(data: DataSet) -> list[ScanTuple]:
+    def _get_scan_tuple_list(data: DataSet | CachedDataSet) -> list[ScanTuple]:
         """ Returns a `list` containing all `ScanTuple`s for `data`. """
         scan_tuple_list: list[ScanTuple] = []
         for index, state, target in data.scans():
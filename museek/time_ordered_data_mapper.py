@@ -2,6 +2,7 @@ import numpy as np
 from scipy.interpolate import griddata
 
 from museek.data_element import DataElement
+from museek.flag_element import FlagElement
 from museek.flag_list import FlagList
 from museek.time_ordered_data import TimeOrderedData
 
@@ -27,7 +28,8 @@ class TimeOrderedDataMapper:
         self._declination = declination
         self._to_map = to_map
         if flags is not None:
-            self._flags = flags.combine(threshold=flag_threshold)
+            self._flags = FlagElement(array=np.broadcast_to(flags.combine(threshold=flag_threshold).array,
+                                                            to_map.shape))
             self._channel_iterator = DataElement.flagged_channel_iterator(data_element=self._to_map,
                                                                           flag_element=self._flags)
         else:
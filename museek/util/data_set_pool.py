@@ -0,0 +1,89 @@
+import threading
+from collections import OrderedDict
+
+import katdal
+from katdal import DataSet
+
+
+class DataSetPool:
+    """
+    Process-level pool of opened `katdal` `DataSet`s keyed by their open argument and selection.
+    Opening a `DataSet` parses the `rdb` file and builds the sensor caches, which is avoided for every further
+    request of the same block and selection. Because `DataSet.select()` changes a `DataSet` in place,
+    each selection has its own `DataSet`, which must not be selected differently by its users.
+    """
+
+    def __init__(self, max_size: int | None = None):
+        """
+        Initialise
+        :param max_size: optional maximum number of `DataSet`s, the least recently used is released when exceeded
+        :raise ValueError: if `max_size` is not positive
+        """
+        if max_size is not None and max_size < 1:
+            raise ValueError(f'Input `max_size` must be positive or `None`, got {max_size}.')
+        self.max_size = max_size
+        self._data_sets: OrderedDict[tuple[str, str], DataSet] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """ Returns the number of `DataSet`s in the pool. """
+        return len(self._data_sets)
+
+    def __enter__(self) -> 'DataSetPool':
+        """ Returns `self`, all `DataSet`s are released when the context is left. """
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """ Release all `DataSet`s. """
+        self.clear()
+
+    def get(self, open_argument: str, selection: dict) -> DataSet:
+        """
+        Return the `DataSet` of `open_argument` with `selection` applied, it is only opened if not in the pool.
+        :param open_argument: the argument of `katdal.open()`, e.g. a path or url of an `rdb` file
+        :param selection: keyword arguments of `DataSet.select()`
+        :return: the `DataSet` shared by all requests with the same arguments
+        """
+        key = self._key(open_argument=open_argument, selection=selection)
+        with self._lock:
+            if key in self._data_sets:
+                self._data_sets.move_to_end(key)
+                return self._data_sets[key]
+        data = katdal.open(open_argument)
+        data.select(**selection)
+        self.put(open_argument=open_argument, selection=selection, data=data)
+        return data
+
+    def put(self, open_argument: str, selection: dict, data: DataSet):
+        """
+        Add `data`, which was opened with `open_argument` and has `selection` applied, to the pool.
+        :param open_argument: the argument of `katdal.open()` used to open `data`
+        :param selection: keyword arguments of `DataSet.select()` applied to `data`
+        :param data: the `DataSet`
+        """
+        key = self._key(open_argument=open_argument, selection=selection)
+        with self._lock:
+            self._data_sets[key] = data
+            self._data_sets.move_to_end(key)
+            while self.max_size is not None and len(self._data_sets) > self.max_size:
+                self._data_sets.popitem(last=False)
+
+    def release(self, open_argument: str):
+        """ Release all `DataSet`s opened with `open_argument` from the pool. """
+        with self._lock:
+            for key in [key for key in self._data_sets if key[0] == open_argument]:
+                del self._data_sets[key]
+
+    def clear(self):
+        """ Release all `DataSet`s from the pool. """
+        with self._lock:
+            self._data_sets.clear()
+
+    @staticmethod
+    def _key(open_argument: str, selection: dict) -> tuple[str, str]:
+        """ Return the pool key of `open_argument` and `selection`, independent of the keyword order. """
+        return open_argument, repr(sorted(selection.items()))
+
+
+# the pool shared by all `TimeOrderedData` instances of the process
+data_set_pool = DataSetPool(max_size=8)
@@ -0,0 +1,163 @@
+import numba
+import numpy as np
+
+
+def masked_median(array: np.ndarray, mask: np.ndarray, axis: int | list[int] | tuple[int, ...]) -> np.ndarray:
+    """
+    Return the median of the entries of `array` not masked by `mask` along `axis` with the dimensions kept.
+    The unmasked entries of each result are gathered in their native type and the median is found by quickselect,
+    in parallel over the results. Results without any unmasked entry are `nan`.
+    :param array: the 3-dimensional `numpy` array
+    :param mask: boolean mask of the shape of `array` or broadcastable to it
+    :param axis: axis or axes along which to reduce
+    :return: the medians as a `numpy` array with the dimensions of `array`
+    """
+    return _reduce(function=_masked_median_kernel, array=array, mask=mask, axis=axis)
+
+
+def masked_kurtosis(array: np.ndarray, mask: np.ndarray, axis: int | list[int] | tuple[int, ...]) -> np.ndarray:
+    """
+    Return the Fisher kurtosis of the entries of `array` not masked by `mask` along `axis` with the dimensions kept,
+    like `scipy.stats.kurtosis` with `bias=True`. Results without any unmasked entry or with vanishing variance
+    are `nan`.
+    :param array: the 3-dimensional `numpy` array
+    :param mask: boolean mask of the shape of `array` or broadcastable to it
+    :param axis: axis or axes along which to reduce
+    :return: the kurtosis as a `numpy` array with the dimensions of `array`
+    """
+    return _reduce(function=_masked_kurtosis_kernel, array=array, mask=mask, axis=axis)
+
+
+def _reduce(function, array: np.ndarray, mask: np.ndarray, axis: int | list[int] | tuple[int, ...]) -> np.ndarray:
+    """
+    Apply the `numba` kernel `function` to `array` and `mask` along `axis` and return the result with the dimensions
+    of `array`. Neither `array` nor the broadcast `mask` is copied, the kernel reads them with their strides.
+    :raise ValueError: if `array` is not 3-dimensional
+    """
+    array = np.asarray(array)
+    if array.ndim != 3:
+        raise ValueError(f'Input `array` needs to be 3-dimensional, got {array.ndim}.')
+    axes = [axis] if isinstance(axis, int | np.integer) else list(axis)
+    is_reduced = np.array([axis_ in {axis__ % array.ndim for axis__ in axes} for axis_ in range(array.ndim)])
+    result = np.empty(np.where(is_reduced, 1, array.shape), dtype=np.float64)
+    n_chunks = min(result.size, 4 * numba.get_num_threads())
+    function(array, np.broadcast_to(mask, array.shape), is_reduced, n_chunks, result)
+    return result
+
+
+@numba.njit(cache=True)
+def _gather_unmasked(array: np.ndarray,
+                     mask: np.ndarray,
+                     is_reduced: np.ndarray,
+                     index: int,
+                     result_shape: tuple[int, int, int],
+                     buffer: np.ndarray) -> int:
+    """
+    Copy the unmasked entries of `array` reduced into the result at flat `index` to the start of `buffer`.
+    :return: the number of unmasked entries
+    """
+    i_0 = index // (result_shape[1] * result_shape[2])
+    i_1 = index // result_shape[2] % result_shape[1]
+    i_2 = index % result_shape[2]
+    count = 0
+    for j_0 in range(array.shape[0] if is_reduced[0] else 1):
+        for j_1 in range(array.shape[1] if is_reduced[1] else 1):
+            for j_2 in range(array.shape[2] if is_reduced[2] else 1):
+                if not mask[i_0 + j_0, i_1 + j_1, i_2 + j_2]:
+                    buffer[count] = array[i_0 + j_0, i_1 + j_1, i_2 + j_2]
+                    count += 1
+    return count
+
+
+@numba.njit(cache=True)
+def _select(values: np.ndarray, n: int, k: int):
+    """
+    Reorder the first `n` entries of `values` in place like C++'s `nth_element`, such that the `k`-th smallest entry
+    is at index `k`, no entry before it is larger and no entry after it is smaller. Return that entry.
+    """
+    left = 0
+    right = n - 1
+    while left < right:
+        pivot = values[(left + right) // 2]
+        i = left
+        j = right
+        while i <= j:
+            while values[i] < pivot:
+                i += 1
+            while pivot < values[j]:
+                j -= 1
+            if i <= j:
+                values[i], values[j] = values[j], values[i]
+                i += 1
+                j -= 1
+        if k <= j:
+            right = j
+        elif k >= i:
+            left = i
+        else:
+            break
+    return values[k]
+
+
+@numba.njit(parallel=True, cache=True)
+def _masked_median_kernel(array: np.ndarray,
+                          mask: np.ndarray,
+                          is_reduced: np.ndarray,
+                          n_chunks: int,
+                          result: np.ndarray):
+    """
+    Write the median of the unmasked entries of `array` along the axes in `is_reduced` to `result`.
+    The results are split into `n_chunks` chunks processed in parallel, each chunk gathers into its own buffer of the
+    native type of `array` and selects the median in place.
+    """
+    n_reduced = 1
+    for axis in range(3):
+        if is_reduced[axis]:
+            n_reduced *= array.shape[axis]
+    n_result = result.size
+    flat_result = result.reshape(-1)
+    for chunk in numba.prange(n_chunks):
+        buffer = np.empty(n_reduced, dtype=array.dtype)
+        for index in range(chunk * n_result // n_chunks, (chunk + 1) * n_result // n_chunks):
+            count = _gather_unmasked(array, mask, is_reduced, index, result.shape, buffer)
+            if count == 0 or np.isnan(buffer[:count]).any():
+                value = np.nan
+            else:
+                value = float(_select(buffer, count, (count - 1) // 2))
+                if count % 2 == 0:
+                    value = (value + float(buffer[count // 2:count].min())) / 2
+            flat_result[index] = value
+
+
+@numba.njit(parallel=True, cache=True)
+def _masked_kurtosis_kernel(array: np.ndarray,
+                            mask: np.ndarray,
+                            is_reduced: np.ndarray,
+                            n_chunks: int,
+                            result: np.ndarray):
+    """
+    Write the biased Fisher kurtosis of the unmasked entries of `array` along the axes in `is_reduced` to `result`,
+    the results are split into `n_chunks` chunks processed in parallel.
+    """
+    resolution = 1e-15  # `np.finfo(np.float64).resolution`, below which `scipy` considers the variance zero
+    n_reduced = 1
+    for axis in range(3):
+        if is_reduced[axis]:
+            n_reduced *= array.shape[axis]
+    n_result = result.size
+    flat_result = result.reshape(-1)
+    for chunk in numba.prange(n_chunks):
+        buffer = np.empty(n_reduced, dtype=np.float64)
+        for index in range(chunk * n_result // n_chunks, (chunk + 1) * n_result // n_chunks):
+            count = _gather_unmasked(array, mask, is_reduced, index, result.shape, buffer)
+            if count == 0:
+                flat_result[index] = np.nan
+                continue
+            unmasked = buffer[:count]
+            mean = unmasked.mean()
+            deviation = unmasked - mean
+            second_moment = (deviation ** 2).mean()
+            if second_moment <= (resolution * mean) ** 2:
+                flat_result[index] = np.nan
+                continue
+            flat_result[index] = (deviation ** 4).mean() / second_moment ** 2 - 3.
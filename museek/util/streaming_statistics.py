@@ -0,0 +1,143 @@
+import numpy as np
+
+from museek.data_element import DataElement
+from museek.flag_list import FlagList
+
+
+class StreamingStatistics:
+    """
+    Mergeable accumulator of the count, the mean and the central moments of unflagged data along the time axis,
+    per frequency and receiver. Chunks of dumps are added one by one with `update()` and partial results, e.g. of
+    parallel workers, are combined with `merge()`, so statistics of whole observations are found in one pass with
+    memory independent of the number of dumps. The moments are combined with the pairwise formulas of Chan et al.
+    and Pébay, which are numerically stable like Welford's algorithm.
+    """
+
+    def __init__(self, max_moment: int = 2):
+        """
+        Initialise
+        :param max_moment: highest central moment to accumulate, `2` for mean and standard deviation, `4` to
+                           also get the kurtosis
+        :raise ValueError: if `max_moment` is not `2`, `3` or `4`
+        """
+        if max_moment not in [2, 3, 4]:
+            raise ValueError(f'Input `max_moment` must be 2, 3 or 4, got {max_moment}.')
+        self.max_moment = max_moment
+        self._count: np.ndarray | None = None
+        self._mean: np.ndarray | None = None
+        self._moments: list[np.ndarray] | None = None  # sums of the 2nd up to the `max_moment`-th power deviations
+
+    def update(self, data: DataElement, flags: FlagList | None = None) -> 'StreamingStatistics':
+        """
+        Add the dumps in `data` to the statistics and return `self`.
+        :param data: chunk of dumps of shape `(n_dump, n_frequency, n_receiver)`
+        :param flags: optional flags of `data`, only unflagged entries are used
+        :raise ValueError: if the frequency and receiver axes of `data` do not match the previous chunks
+        :return: `self`
+        """
+        array = np.asarray(data.array, dtype=np.float64)
+        if flags is None:
+            unflagged = np.ones(array.shape, dtype=bool)
+        else:
+            unflagged = ~np.broadcast_to(flags.combine(threshold=1).array, array.shape)
+        count = unflagged.sum(axis=0, keepdims=True)
+        mean = np.divide(np.sum(array, axis=0, keepdims=True, where=unflagged),
+                         count,
+                         out=np.zeros(count.shape),
+                         where=count > 0)
+        deviation = np.subtract(array, mean, out=np.zeros(array.shape), where=unflagged)
+        moments = [np.sum(deviation ** power, axis=0, keepdims=True) for power in range(2, self.max_moment + 1)]
+        return self._merge_moments(count=count, mean=mean, moments=moments)
+
+    def merge(self, other: 'StreamingStatistics') -> 'StreamingStatistics':
+        """
+        Merge the statistics of `other`, accumulated from other dumps, into `self` and return `self`.
+        :raise ValueError: if `other` has a different `max_moment` or shape
+        """
+        if other.max_moment != self.max_moment:
+            raise ValueError(f'Cannot merge statistics with `max_moment` {other.max_moment} into {self.max_moment}.')
+        if other._count is None:
+            return self
+        return self._merge_moments(count=other._count, mean=other._mean, moments=other._moments)
+
+    @property
+    def count(self) -> DataElement:
+        """ Return the number of unflagged dumps per frequency and receiver. """
+        return DataElement(array=self._accumulated()[0])
+
+    @property
+    def mean(self) -> DataElement:
+        """ Return the mean, masked where no dump is unflagged. """
+        count, mean, _ = self._accumulated()
+        return DataElement(array=np.ma.masked_array(mean, mask=count == 0))
+
+    @property
+    def variance(self) -> DataElement:
+        """ Return the variance with zero degrees of freedom, like `np.var`, masked where no dump is unflagged. """
+        count, _, moments = self._accumulated()
+        variance = np.divide(moments[0], count, out=np.zeros(count.shape), where=count > 0)
+        return DataElement(array=np.ma.masked_array(variance, mask=count == 0))
+
+    @property
+    def standard_deviation(self) -> DataElement:
+        """ Return the standard deviation, like `np.std`, masked where no dump is unflagged. """
+        variance = self.variance.array
+        return DataElement(array=np.ma.masked_array(np.sqrt(variance.data), mask=variance.mask))
+
+    @property
+    def kurtosis(self) -> DataElement:
+        """
+        Return the Fisher kurtosis, like `scipy.stats.kurtosis` with `bias=True`, which is `nan` where no dump is
+        unflagged or the variance vanishes.
+        :raise ValueError: if `self.max_moment` is less than `4`
+        """
+        if self.max_moment < 4:
+            raise ValueError(f'The kurtosis needs `max_moment` 4, got {self.max_moment}.')
+        count, _, moments = self._accumulated()
+        second, fourth = moments[0], moments[2]
+        valid = second > 0
+        kurtosis = np.divide(count * fourth, second ** 2, out=np.full(count.shape, np.nan), where=valid) - 3.
+        return DataElement(array=kurtosis)
+
+    def _merge_moments(self, count: np.ndarray, mean: np.ndarray, moments: list[np.ndarray]) \
+            -> 'StreamingStatistics':
+        """
+        Combine the accumulated statistics with the `count`, `mean` and central `moments` of other dumps.
+        :raise ValueError: if the shape of `count` does not match the accumulated statistics
+        """
+        if self._count is None:
+            self._count, self._mean, self._moments = count.copy(), mean.copy(), [moment.copy() for moment in moments]
+            return self
+        if count.shape != self._count.shape:
+            raise ValueError(f'Cannot combine statistics of shape {count.shape} with {self._count.shape}.')
+        count_a, count_b = self._count, count
+        total = count_a + count_b
+        delta = mean - self._mean
+        delta_over_total = np.divide(delta, total, out=np.zeros(total.shape), where=total > 0)
+        product = count_a * count_b
+        second_a, second_b = self._moments[0], moments[0]
+        merged = [second_a + second_b + delta * delta_over_total * product]
+        if self.max_moment >= 3:
+            third_a, third_b = self._moments[1], moments[1]
+            merged.append(third_a + third_b
+                          + delta * delta_over_total ** 2 * product * (count_a - count_b)
+                          + 3 * delta_over_total * (count_a * second_b - count_b * second_a))
+        if self.max_moment >= 4:
+            fourth_a, fourth_b = self._moments[2], moments[2]
+            merged.append(fourth_a + fourth_b
+                          + delta * delta_over_total ** 3 * product * (count_a ** 2 - product + count_b ** 2)
+                          + 6 * delta_over_total ** 2 * (count_a ** 2 * second_b + count_b ** 2 * second_a)
+                          + 4 * delta_over_total * (count_a * third_b - count_b * third_a))
+        self._mean = self._mean + delta_over_total * count_b
+        self._count = total
+        self._moments = merged
+        return self
+
+    def _accumulated(self) -> tuple[np.ndarray, np.ndarray, list[np.ndarray]]:
+        """
+        Return the accumulated count, mean and central moments.
+        :raise ValueError: if no data was added yet
+        """
+        if self._count is None:
+            raise ValueError('No data was added to the statistics yet.')
+        return self._count, self._mean, self._moments
@@ -73,7 +73,7 @@ def waterfall(visibility: DataElement, flags: FlagList | None, flag_threshold: i
     :param imshow_kwargs: keyword arguments for `plt.imshow()`
     """
     if flags:
-        all_flags = flags.combine(threshold=flag_threshold).squeeze
+        all_flags = np.broadcast_to(flags.combine(threshold=flag_threshold).array, visibility.shape).squeeze()
     else:
         all_flags = None
     masked = np.ma.array(visibility.squeeze, mask=all_flags)
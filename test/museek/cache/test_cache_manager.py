@@ -0,0 +1,144 @@
+import json
+import os
+import shutil
+import unittest
+from unittest.mock import patch
+
+from museek.cache.cache_manager import CacheManager
+
+
+class TestCacheManager(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_directory = './test/museek/cache/cache_manager/'
+        self.cache_manager = CacheManager(cache_directory=self.cache_directory, max_bytes=250)
+        for name, size in [('block_a', 100), ('block_b', 100), ('block_c', 100)]:
+            self._create_entry(name=name, size=size)
+
+    def tearDown(self):
+        if os.path.exists(self.cache_directory):
+            shutil.rmtree(self.cache_directory)
+
+    def _create_entry(self, name: str, size: int):
+        os.makedirs(os.path.join(self.cache_directory, name), exist_ok=True)
+        with open(os.path.join(self.cache_directory, name, 'data.npy'), 'wb') as data_file:
+            data_file.write(b'\x00' * size)
+
+    def test_init_when_max_bytes_negative_expect_raise(self):
+        self.assertRaises(ValueError, CacheManager, cache_directory=self.cache_directory, max_bytes=-1)
+
+    def test_init_when_policy_unknown_expect_raise(self):
+        self.assertRaises(ValueError, CacheManager, cache_directory=self.cache_directory, policy='fifo')
+
+    def test_entry_names_expect_ledger_excluded(self):
+        self.cache_manager.record_hit(name='block_a')
+        self.assertListEqual(['block_a', 'block_b', 'block_c'], self.cache_manager.entry_names())
+
+    def test_entry_names_when_directory_missing(self):
+        self.assertListEqual([], CacheManager(cache_directory='./not_existing/').entry_names())
+
+    def test_size(self):
+        self.assertEqual(100, self.cache_manager.size(name='block_a'))
+        self.assertEqual(300, self.cache_manager.size())
+
+    @patch('museek.cache.cache_manager.time')
+    def test_enforce_budget_when_lru(self, mock_time):
+        for i, name in enumerate(['block_b', 'block_a', 'block_c']):
+            mock_time.time.return_value = float(i)
+            self.cache_manager.record_hit(name=name)
+        self.assertListEqual(['block_b'], self.cache_manager.enforce_budget())
+        self.assertListEqual(['block_a', 'block_c'], self.cache_manager.entry_names())
+        self.assertEqual(1, self.cache_manager.statistics()['evictions'])
+
+    @patch('museek.cache.cache_manager.time')
+    def test_enforce_budget_when_lfu(self, mock_time):
+        cache_manager = CacheManager(cache_directory=self.cache_directory, max_bytes=150, policy='lfu')
+        for i, name in enumerate(['block_a', 'block_a', 'block_b', 'block_c', 'block_c']):
+            mock_time.time.return_value = float(i)
+            cache_manager.record_hit(name=name)
+        self.assertListEqual(['block_b', 'block_a'], cache_manager.enforce_budget())
+
+    def test_enforce_budget_when_within_budget(self):
+        cache_manager = CacheManager(cache_directory=self.cache_directory, max_bytes=300)
+        self.assertListEqual([], cache_manager.enforce_budget())
+
+    def test_enforce_budget_when_no_budget(self):
+        cache_manager = CacheManager(cache_directory=self.cache_directory)
+        self.assertListEqual([], cache_manager.enforce_budget())
+        self.assertEqual(3, len(cache_manager.entry_names()))
+
+    @patch('museek.cache.cache_manager.time')
+    def test_enforce_budget_when_pinned(self, mock_time):
+        for i, name in enumerate(['block_b', 'block_a', 'block_c']):
+            mock_time.time.return_value = float(i)
+            self.cache_manager.record_hit(name=name)
+        self.cache_manager.pin(name='block_b')
+        self.assertTrue(self.cache_manager.is_pinned(name='block_b'))
+        self.assertListEqual(['block_a'], self.cache_manager.enforce_budget())
+        self.cache_manager.unpin(name='block_b')
+        self.assertFalse(self.cache_manager.is_pinned(name='block_b'))
+
+    def test_enforce_budget_when_all_pinned(self):
+        with self.cache_manager.pinned(names=['block_a', 'block_b', 'block_c']):
+            self.assertListEqual([], self.cache_manager.enforce_budget())
+        self.assertFalse(self.cache_manager.is_pinned(name='block_a'))
+
+    def test_pinned_when_already_pinned_expect_still_pinned(self):
+        self.cache_manager.pin(name='block_a')
+        with self.cache_manager.pinned(names=['block_a']):
+            pass
+        self.assertTrue(self.cache_manager.is_pinned(name='block_a'))
+
+    def test_pin_when_pinned_twice_expect_unpinned_twice(self):
+        self.cache_manager.pin(name='block_a')
+        self.cache_manager.pin(name='block_a')
+        self.cache_manager.unpin(name='block_a')
+        self.assertTrue(self.cache_manager.is_pinned(name='block_a'))
+        self.cache_manager.unpin(name='block_a')
+        self.assertFalse(self.cache_manager.is_pinned(name='block_a'))
+
+    @patch.object(CacheManager, '_is_running', return_value=False)
+    def test_is_pinned_when_process_not_running(self, mock_is_running):
+        self.cache_manager.pin(name='block_a')
+        self.assertFalse(self.cache_manager.is_pinned(name='block_a'))
+
+    def test_is_pinned_when_pinned_by_other_process(self):
+        with open(os.path.join(self.cache_directory, 'cache_ledger.json'), 'w') as ledger_file:
+            json.dump({'entries': {}, 'pinned': {'block_a': [os.getppid()]}, 'evictions': 0}, ledger_file)
+        self.cache_manager.unpin(name='block_a')
+        self.assertTrue(self.cache_manager.is_pinned(name='block_a'))
+        self.assertNotIn('block_a', self.cache_manager.enforce_budget())
+
+    def test_read_ledger_when_pins_not_per_process(self):
+        with open(os.path.join(self.cache_directory, 'cache_ledger.json'), 'w') as ledger_file:
+            json.dump({'entries': {}, 'pinned': ['block_a'], 'evictions': 0}, ledger_file)
+        self.assertFalse(self.cache_manager.is_pinned(name='block_a'))
+        self.cache_manager.pin(name='block_b')
+        self.assertTrue(self.cache_manager.is_pinned(name='block_b'))
+
+    def test_record_hit_expect_lock_file_not_an_entry(self):
+        self.cache_manager.record_hit(name='block_a')
+        self.assertTrue(os.path.exists(os.path.join(self.cache_directory, 'cache_ledger.json.lock')))
+        self.assertListEqual(['block_a', 'block_b', 'block_c'], self.cache_manager.entry_names())
+
+    def test_statistics(self):
+        self.cache_manager.record_hit(name='block_a')
+        self.cache_manager.record_hit(name='block_a')
+        self.cache_manager.record_hit(name='block_b')
+        self.cache_manager.record_miss(name='block_c')
+        statistics = self.cache_manager.statistics()
+        self.assertEqual(3, statistics['hits'])
+        self.assertEqual(1, statistics['misses'])
+        self.assertEqual(0.75, statistics['hit_rate'])
+        self.assertEqual(300, statistics['size'])
+        self.assertEqual(250, statistics['max_bytes'])
+        self.assertEqual(2, statistics['entries']['block_a']['hits'])
+
+    def test_statistics_when_empty(self):
+        self.assertIsNone(self.cache_manager.statistics()['hit_rate'])
+
+    def test_read_ledger_when_corrupt(self):
+        self.cache_manager.record_hit(name='block_a')
+        with open(os.path.join(self.cache_directory, 'cache_ledger.json'), 'w') as ledger_file:
+            ledger_file.write('{"entr')
+        self.assertEqual(0, self.cache_manager.statistics()['hits'])
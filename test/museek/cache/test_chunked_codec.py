@@ -0,0 +1,88 @@
+import os
+import shutil
+import unittest
+
+import numpy as np
+
+from museek.cache.chunked_codec import ChunkedCodec
+
+
+class TestChunkedCodec(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = './test/museek/cache/chunked_codec/'
+        os.makedirs(self.directory, exist_ok=True)
+        self.file = os.path.join(self.directory, 'array.npc')
+        self.array = np.arange(70 * 3, dtype=np.float32).reshape((70, 3))
+
+    def tearDown(self):
+        if os.path.exists(self.directory):
+            shutil.rmtree(self.directory)
+
+    def test_init_when_codec_unknown_expect_raise(self):
+        self.assertRaises(ValueError, ChunkedCodec, codec='zip')
+
+    def test_init_when_chunk_length_not_positive_expect_raise(self):
+        self.assertRaises(ValueError, ChunkedCodec, chunk_length=0)
+
+    def test_write_and_read(self):
+        for codec in ['zlib', 'bz2', 'lzma']:
+            for shuffle in [True, False]:
+                chunked_codec = ChunkedCodec(codec=codec, level=1, chunk_length=16, shuffle=shuffle, n_workers=2)
+                chunked_codec.write(file=self.file, array=self.array)
+                read = chunked_codec.read(file=self.file)
+                np.testing.assert_array_equal(self.array, read)
+                self.assertEqual(np.float32, read.dtype)
+
+    def test_write_expect_compressed(self):
+        ChunkedCodec(chunk_length=16).write(file=self.file, array=np.zeros((100, 100)))
+        self.assertLess(os.path.getsize(self.file), 100 * 100 * 8 / 10)
+
+    def test_write_expect_no_temporary_file(self):
+        ChunkedCodec().write(file=self.file, array=self.array)
+        self.assertListEqual(['array.npc'], os.listdir(self.directory))
+
+    def test_read_when_indices(self):
+        ChunkedCodec(chunk_length=16).write(file=self.file, array=self.array)
+        indices = [0, 1, 15, 16, 40, 69]
+        np.testing.assert_array_equal(self.array[indices], ChunkedCodec().read(file=self.file, indices=indices))
+
+    def test_read_when_indices_empty(self):
+        ChunkedCodec(chunk_length=16).write(file=self.file, array=self.array)
+        self.assertTupleEqual((0, 3), ChunkedCodec().read(file=self.file, indices=[]).shape)
+
+    def test_read_expect_codec_from_file(self):
+        ChunkedCodec(codec='lzma', chunk_length=16, shuffle=False).write(file=self.file, array=self.array)
+        np.testing.assert_array_equal(self.array, ChunkedCodec(codec='zlib').read(file=self.file))
+
+    def test_read_when_processes(self):
+        chunked_codec = ChunkedCodec(chunk_length=16, n_workers=2, use_processes=True)
+        chunked_codec.write(file=self.file, array=self.array)
+        np.testing.assert_array_equal(self.array, chunked_codec.read(file=self.file))
+
+    def test_read_when_3_dimensional(self):
+        array = np.arange(40).reshape((10, 2, 2)) % 3 == 0
+        ChunkedCodec(chunk_length=3).write(file=self.file, array=array)
+        np.testing.assert_array_equal(array, ChunkedCodec().read(file=self.file))
+
+    def test_read_chunk(self):
+        ChunkedCodec(chunk_length=16).write(file=self.file, array=self.array)
+        np.testing.assert_array_equal(self.array[16:32], ChunkedCodec().read_chunk(file=self.file, chunk_index=1))
+        np.testing.assert_array_equal(self.array[64:], ChunkedCodec().read_chunk(file=self.file, chunk_index=4))
+
+    def test_read_chunk_when_out_of_range_expect_raise(self):
+        ChunkedCodec(chunk_length=16).write(file=self.file, array=self.array)
+        self.assertRaises(ValueError, ChunkedCodec().read_chunk, file=self.file, chunk_index=5)
+
+    def test_header(self):
+        ChunkedCodec(codec='bz2', level=3, chunk_length=16).write(file=self.file, array=self.array)
+        header, data_start = ChunkedCodec().header(file=self.file)
+        self.assertListEqual([70, 3], header['shape'])
+        self.assertEqual('bz2', header['codec'])
+        self.assertEqual(3, header['level'])
+        self.assertEqual(6, len(header['offsets']))
+        self.assertEqual(os.path.getsize(self.file), data_start + header['offsets'][-1])
+
+    def test_header_when_not_compressed_file_expect_raise(self):
+        np.save(os.path.join(self.directory, 'array.npy'), self.array)
+        self.assertRaises(ValueError, ChunkedCodec().header, file=os.path.join(self.directory, 'array.npy'))
@@ -0,0 +1,130 @@
+import os
+import shutil
+import unittest
+
+import numpy as np
+from katpoint import Antenna, Target
+
+from museek.cache.metadata_cache import MetadataCache, CachedDataSet
+
+
+class MockDataSet:
+    """ Minimal mock of a `katdal` `DataSet` with three antennas, six dumps and four channels. """
+
+    def __init__(self):
+        self.name = 'block_sdp_l0'
+        self.dump_period = 2.
+        self.channel_width = 1e6
+        self.obs_script_log = ['line 1', 'line 2']
+        self.ants = [Antenna(f'm00{i}, -30:42:39.8, 21:26:38.0, 1035.0, 13.5') for i in range(3)]
+        self.corr_products = np.asarray([[f'm00{i}{a}', f'm00{j}{b}']
+                                         for i in range(3) for j in range(3) for a in 'hv' for b in 'hv'])
+        self.timestamps = np.arange(6.)
+        self.freqs = np.arange(4) * 1e6 + 1e9
+        self.az = np.arange(18.).reshape((6, 3))
+        self.el = self.az + 100
+        self.ra = self.az + 200
+        self.dec = self.az + 300
+        self.temperature = np.arange(6.) + 10
+        self.humidity = np.arange(6.) + 20
+        self.pressure = np.arange(6.) + 30
+        self.dumps = np.arange(6)
+        self._scans = [(0, 'slew', range(0, 2)), (1, 'track', range(2, 4)), (2, 'scan', range(4, 6))]
+
+    def __str__(self):
+        return 'mock data set'
+
+    def scans(self):
+        for index, state, dumps in self._scans:
+            self.dumps = np.asarray(dumps)
+            yield index, state, Target('target, radec, 0, -30')
+        self.dumps = np.arange(6)
+
+
+class TestMetadataCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_directory = './test/museek/cache/metadata_cache/'
+        self.metadata_cache = MetadataCache(cache_directory=self.cache_directory)
+        self.mock_data = MockDataSet()
+
+    def tearDown(self):
+        if os.path.exists(self.cache_directory):
+            shutil.rmtree(self.cache_directory)
+
+    def test_exists_when_not_stored(self):
+        self.assertFalse(self.metadata_cache.exists())
+
+    def test_store_and_load(self):
+        self.metadata_cache.store(data=self.mock_data)
+        self.assertTrue(self.metadata_cache.exists())
+        data = self.metadata_cache.load()
+        self.assertIsInstance(data, CachedDataSet)
+        self.assertEqual('block_sdp_l0', data.name)
+        self.assertEqual('mock data set', str(data))
+        self.assertEqual(2., data.dump_period)
+        self.assertListEqual(['line 1', 'line 2'], data.obs_script_log)
+        self.assertTupleEqual((6, 4, 6), data.shape)
+        self.assertListEqual(['m000', 'm001', 'm002'], [antenna.name for antenna in data.ants])
+        np.testing.assert_array_equal(self.mock_data.timestamps, data.timestamps)
+        np.testing.assert_array_equal(self.mock_data.freqs, data.freqs)
+        np.testing.assert_array_equal(self.mock_data.az, data.az)
+        np.testing.assert_array_equal(self.mock_data.pressure, data.pressure)
+
+
+class TestCachedDataSet(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_directory = './test/museek/cache/metadata_cache/'
+        metadata_cache = MetadataCache(cache_directory=self.cache_directory)
+        self.mock_data = MockDataSet()
+        metadata_cache.store(data=self.mock_data)
+        self.data = metadata_cache.load()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_directory)
+
+    def test_corr_products(self):
+        expect = [['m000h', 'm000h'], ['m000v', 'm000v'], ['m001h', 'm001h'],
+                  ['m001v', 'm001v'], ['m002h', 'm002h'], ['m002v', 'm002v']]
+        np.testing.assert_array_equal(expect, self.data.corr_products)
+
+    def test_select_corrprods(self):
+        self.data.select(corrprods=[5, 1])
+        np.testing.assert_array_equal([['m000v', 'm000v'], ['m002v', 'm002v']], self.data.corr_products)
+        self.assertListEqual(['m000', 'm002'], [antenna.name for antenna in self.data.ants])
+        np.testing.assert_array_equal(self.mock_data.el[:, [0, 2]], self.data.el)
+        self.assertTupleEqual((6, 4, 2), self.data.shape)
+
+    def test_select_channels(self):
+        self.data.select(channels=range(1, 3))
+        np.testing.assert_array_equal([1, 2], self.data.channels)
+        np.testing.assert_array_equal(self.mock_data.freqs[1:3], self.data.freqs)
+
+    def test_select_freqrange(self):
+        self.data.select(freqrange=(1e9 + 0.5e6, 1e9 + 2.5e6))
+        np.testing.assert_array_equal([1, 2], self.data.channels)
+
+    def test_select_scans(self):
+        self.data.select(scans=['scan', 'slew'])
+        np.testing.assert_array_equal([0, 1, 4, 5], self.data.dumps)
+        np.testing.assert_array_equal(self.mock_data.timestamps[[0, 1, 4, 5]], self.data.timestamps)
+        np.testing.assert_array_equal(self.mock_data.ra[[0, 1, 4, 5]], self.data.ra)
+
+    def test_select_expect_reset(self):
+        self.data.select(scans='scan', channels=[0])
+        self.data.select(corrprods=[0])
+        self.assertTupleEqual((6, 4, 1), self.data.shape)
+
+    def test_scans(self):
+        scan_list = [(index, state, list(self.data.dumps)) for index, state, _ in self.data.scans()]
+        self.assertListEqual([(0, 'slew', [0, 1]), (1, 'track', [2, 3]), (2, 'scan', [4, 5])], scan_list)
+        np.testing.assert_array_equal(np.arange(6), self.data.dumps)
+
+    def test_scans_when_selected(self):
+        self.data.select(scans='track')
+        scan_list = [(index, state) for index, state, _ in self.data.scans()]
+        self.assertListEqual([(1, 'track')], scan_list)
+
+    def test_getattr_when_unknown_expect_raise(self):
+        self.assertRaises(AttributeError, getattr, self.data, 'vis')
@@ -0,0 +1,417 @@
+import json
+import os
+import shutil
+import pickle
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from museek.cache.chunked_codec import ChunkedCodec
+from museek.cache.visibility_cache import VisibilityCache, ReceiverShardedArray, ReceiverStackedArray
+
+
+class TestVisibilityCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_directory = './test/museek/cache/visibility_cache/'
+        self.visibility_cache = VisibilityCache(cache_directory=self.cache_directory)
+        self.shape = (4, 3, 5)
+        self.visibility = np.arange(60).reshape(self.shape) + 1j
+        self.flags = (np.arange(60).reshape(self.shape) % 2 == 0)[np.newaxis]
+        self.weights = np.arange(60).reshape(self.shape) * 0.5
+        self.receiver_names = [f'm00{i}h' for i in range(5)]
+
+    def tearDown(self):
+        if os.path.exists(self.cache_directory):
+            shutil.rmtree(self.cache_directory)
+
+    def _store(self):
+        self.visibility_cache.store(visibility=self.visibility,
+                                    flags=self.flags,
+                                    weights=self.weights,
+                                    receiver_names=self.receiver_names)
+
+    def test_exists_when_not_stored(self):
+        self.assertFalse(self.visibility_cache.exists())
+        self.assertListEqual([], self.visibility_cache.receiver_names())
+
+    def test_exists(self):
+        self._store()
+        self.assertTrue(self.visibility_cache.exists())
+
+    def test_receiver_names(self):
+        self._store()
+        self.assertListEqual(self.receiver_names, self.visibility_cache.receiver_names())
+
+    def test_dtypes(self):
+        self._store()
+        self.assertListEqual([np.dtype(complex), np.dtype(bool), np.dtype(float)], self.visibility_cache.dtypes())
+
+    def test_dtypes_when_not_stored(self):
+        self.assertIsNone(self.visibility_cache.dtypes())
+
+    def test_store_when_dtype_differs_expect_raise(self):
+        self._store()
+        self.assertRaises(ValueError,
+                          self.visibility_cache.store,
+                          visibility=self.visibility.real.astype(np.float32),
+                          flags=self.flags,
+                          weights=self.weights,
+                          receiver_names=['m000v'])
+
+    def test_contains(self):
+        self._store()
+        self.assertTrue(self.visibility_cache.contains(receiver_names=['m004h', 'm001h']))
+        self.assertFalse(self.visibility_cache.contains(receiver_names=['m004h', 'm001v']))
+
+    def test_load(self):
+        self._store()
+        visibility, flags, weights = self.visibility_cache.load(receiver_names=['m004h', 'm000h'])
+        np.testing.assert_array_equal(self.visibility[:, :, [4, 0]], visibility)
+        np.testing.assert_array_equal(self.flags[:, :, :, [4, 0]], flags)
+        np.testing.assert_array_equal(self.weights[:, :, [4, 0]], weights)
+
+    def test_load_when_dumps(self):
+        self._store()
+        visibility, flags, weights = self.visibility_cache.load(receiver_names=['m004h', 'm000h'], dumps=[0, 2, 3])
+        np.testing.assert_array_equal(self.visibility[[0, 2, 3]][:, :, [4, 0]], visibility)
+        np.testing.assert_array_equal(self.flags[:, [0, 2, 3]][:, :, :, [4, 0]], flags)
+        np.testing.assert_array_equal(self.weights[[0, 2, 3]][:, :, [4, 0]], weights)
+
+    def test_load_when_single_receiver_and_dumps(self):
+        self._store()
+        visibility, _, _ = self.visibility_cache.load(receiver_names=['m001h'], dumps=[1, 2])
+        np.testing.assert_array_equal(self.visibility[1:3, :, 1:2], visibility)
+
+    def test_contiguous_ranges(self):
+        self.assertListEqual([(0, 2), (5, 8), (10, 11)],
+                             VisibilityCache._contiguous_ranges(indices=[0, 1, 5, 6, 7, 10]))
+
+    def test_load_when_single_receiver_expect_memory_map(self):
+        self._store()
+        visibility, flags, weights = self.visibility_cache.load(receiver_names=['m002h'])
+        np.testing.assert_array_equal(self.visibility[:, :, 2:3], visibility)
+        np.testing.assert_array_equal(self.flags[:, :, :, 2:3], flags)
+        np.testing.assert_array_equal(self.weights[:, :, 2:3], weights)
+        self.assertIsInstance(visibility, np.memmap)
+        self.assertIsInstance(weights, np.memmap)
+
+    def test_load_when_several_receivers_expect_lazily_stacked(self):
+        self._store()
+        visibility, flags, weights = self.visibility_cache.load(receiver_names=['m004h', 'm000h'])
+        self.assertIsInstance(visibility, ReceiverStackedArray)
+        self.assertIsInstance(weights, ReceiverStackedArray)
+        self.assertTupleEqual((4, 3, 2), visibility.shape)
+        np.testing.assert_array_equal(self.visibility[:, :, [4, 0]], visibility)
+        np.testing.assert_array_equal(self.flags[:, :, :, [4, 0]], flags)
+        np.testing.assert_array_equal(self.weights[:, :, [4, 0]], weights)
+        self.assertListEqual(sorted(self.receiver_names + ['index.json']), sorted(os.listdir(self.cache_directory)))
+
+    @patch.object(VisibilityCache, '_load_shard', autospec=True, side_effect=VisibilityCache._load_shard)
+    def test_load_when_several_receivers_expect_only_indexed_shards_read(self, mock_load_shard):
+        self._store()
+        visibility, _, weights = self.visibility_cache.load(receiver_names=self.receiver_names)
+        loaded = [(call_.kwargs['receiver_name'], call_.kwargs['name']) for call_ in mock_load_shard.call_args_list]
+        self.assertNotIn('visibility', [name for _, name in loaded])
+        mock_load_shard.reset_mock()
+        np.testing.assert_array_equal(self.visibility[1:3, :, 3], visibility[1:3, :, 3])
+        mock_load_shard.assert_called_once_with(self.visibility_cache,
+                                                receiver_name='m003h',
+                                                name='visibility',
+                                                dumps=None)
+
+    def test_load_when_several_receivers_and_dumps(self):
+        self._store()
+        visibility, flags, weights = self.visibility_cache.load(receiver_names=['m001h', 'm003h'], dumps=[0, 2, 3])
+        self.assertTupleEqual((3, 3, 2), visibility.shape)
+        np.testing.assert_array_equal(self.visibility[[0, 2, 3]][:, :, [1, 3]], visibility)
+        np.testing.assert_array_equal(self.flags[:, [0, 2, 3]][..., [1, 3]], flags)
+        np.testing.assert_array_equal(self.weights[[0, 2, 3]][:, :, [1, 3]], weights[...])
+
+    def test_load_when_modified_expect_cache_unchanged(self):
+        self._store()
+        visibility, _, _ = self.visibility_cache.load(receiver_names=['m001h'])
+        visibility[:] = 0
+        visibility, _, _ = self.visibility_cache.load(receiver_names=['m001h'])
+        np.testing.assert_array_equal(self.visibility[:, :, 1:2], visibility)
+
+    def test_store_when_adding_receivers_expect_existing_shards_untouched(self):
+        self._store()
+        shard_file = os.path.join(self.cache_directory, 'm000h', 'visibility.npy')
+        modification_time = os.path.getmtime(shard_file)
+        self.visibility_cache.store(visibility=self.visibility[:, :, :1] * 2,
+                                    flags=self.flags[:, :, :, :1],
+                                    weights=self.weights[:, :, :1],
+                                    receiver_names=['m000v'])
+        self.assertEqual(modification_time, os.path.getmtime(shard_file))
+        self.assertListEqual(self.receiver_names + ['m000v'], self.visibility_cache.receiver_names())
+        visibility, _, _ = self.visibility_cache.load(receiver_names=['m000v'])
+        np.testing.assert_array_equal(self.visibility[:, :, :1] * 2, visibility)
+
+    def test_store_when_shape_differs_expect_raise(self):
+        self._store()
+        self.assertRaises(ValueError,
+                          self.visibility_cache.store,
+                          visibility=self.visibility[1:],
+                          flags=self.flags[:, 1:],
+                          weights=self.weights[1:],
+                          receiver_names=['m000v'])
+
+    def test_create_shards_expect_only_shards_of_recreated_receivers_removed(self):
+        self._store()
+        unlisted_directory = os.path.join(self.cache_directory, 'm009h')
+        os.makedirs(unlisted_directory)
+        stale_file = os.path.join(self.cache_directory, 'm001h', 'stale.npy')
+        open(stale_file, 'w').close()
+        self.visibility_cache.create_shards(receiver_names=['m001h', 'm005h'],
+                                            shape=(4, 3),
+                                            dtypes=[complex, bool, float])
+        self.assertTrue(os.path.isdir(unlisted_directory))
+        self.assertFalse(os.path.exists(stale_file))
+        self.assertTrue(os.path.isdir(os.path.join(self.cache_directory, 'm005h')))
+        self.assertTrue(self.visibility_cache.contains(receiver_names=['m000h', 'm002h', 'm003h', 'm004h']))
+
+    def test_create_shards_when_index_outdated_expect_other_shards_untouched(self):
+        self._store()
+        VisibilityCache(cache_directory=self.cache_directory, dataset_name='other').create_shards(
+            receiver_names=['m005h'],
+            shape=(4, 3),
+            dtypes=[complex, bool, float]
+        )
+        self.assertListEqual(sorted(self.receiver_names + ['index.json', 'm005h']),
+                             sorted(os.listdir(self.cache_directory)))
+
+    def test_create_shards_expect_not_in_index(self):
+        targets = self.visibility_cache.create_shards(receiver_names=['m000h'],
+                                                      shape=(4, 3),
+                                                      dtypes=[complex, bool, float])
+        self.assertEqual(3, len(targets))
+        self.assertFalse(self.visibility_cache.exists())
+
+    def test_create_shards_when_receiver_cached_expect_removed_from_index(self):
+        self._store()
+        self.visibility_cache.create_shards(receiver_names=['m001h'], shape=(4, 3), dtypes=[complex, bool, float])
+        self.assertListEqual(['m000h', 'm002h', 'm003h', 'm004h'], self.visibility_cache.receiver_names())
+        self.assertFalse(self.visibility_cache.contains(receiver_names=['m001h']))
+
+    def test_add_to_index_expect_no_temporary_file(self):
+        self._store()
+        self.assertNotIn('index.json.tmp', os.listdir(self.cache_directory))
+
+    def test_create_shards_and_add_to_index(self):
+        targets = self.visibility_cache.create_shards(receiver_names=self.receiver_names,
+                                                      shape=(4, 3),
+                                                      dtypes=[complex, bool, float])
+        for target, array in zip(targets, [self.visibility, self.flags[0], self.weights]):
+            target[:2, :, :] = array[:2]
+            target[2:, :, 1:] = array[2:, :, 1:]
+            target[2:, :, :1] = array[2:, :, :1]
+            target.flush()
+        self.visibility_cache.add_to_index(receiver_names=self.receiver_names,
+                                           shape=(4, 3),
+                                           dtypes=[complex, bool, float])
+        visibility, flags, weights = self.visibility_cache.load(receiver_names=self.receiver_names)
+        np.testing.assert_array_equal(self.visibility, visibility)
+        np.testing.assert_array_equal(self.flags, flags)
+        np.testing.assert_array_equal(self.weights, weights)
+
+    def test_exists_when_dataset_name_differs(self):
+        VisibilityCache(cache_directory=self.cache_directory, dataset_name='block').store(
+            visibility=self.visibility,
+            flags=self.flags,
+            weights=self.weights,
+            receiver_names=self.receiver_names
+        )
+        self.assertTrue(VisibilityCache(cache_directory=self.cache_directory, dataset_name='block').exists())
+        self.assertFalse(VisibilityCache(cache_directory=self.cache_directory, dataset_name='other').exists())
+
+    def test_exists_when_selection_differs(self):
+        selection = {'channels': [0, 3, 1]}
+        VisibilityCache(cache_directory=self.cache_directory, selection=selection).store(
+            visibility=self.visibility,
+            flags=self.flags,
+            weights=self.weights,
+            receiver_names=self.receiver_names
+        )
+        self.assertTrue(VisibilityCache(cache_directory=self.cache_directory, selection=selection).exists())
+        self.assertFalse(VisibilityCache(cache_directory=self.cache_directory,
+                                         selection={'channels': [1, 3, 1]}).exists())
+
+    def test_exists_when_version_differs(self):
+        self._store()
+        with open(os.path.join(self.cache_directory, 'index.json'), 'w') as index_file:
+            json.dump({'receivers': self.receiver_names, 'shape': [4, 3], 'dtypes': ['complex128', 'bool', 'float64']},
+                      index_file)
+        self.assertFalse(self.visibility_cache.exists())
+        self.assertListEqual(self.receiver_names, self.visibility_cache.missing_receiver_names(self.receiver_names))
+
+    def test_exists_when_index_is_corrupt(self):
+        self._store()
+        with open(os.path.join(self.cache_directory, 'index.json'), 'w') as index_file:
+            index_file.write('{"version": 4, "rece')
+        self.assertFalse(self.visibility_cache.exists())
+
+    def test_missing_receiver_names(self):
+        self._store()
+        self.assertListEqual([], self.visibility_cache.missing_receiver_names(receiver_names=['m004h', 'm001h']))
+        self.assertListEqual(['m001v'],
+                             self.visibility_cache.missing_receiver_names(receiver_names=['m004h', 'm001v']))
+
+    def test_missing_receiver_names_when_file_truncated(self):
+        self._store()
+        shard_file = os.path.join(self.cache_directory, 'm001h', 'weights.npy')
+        with open(shard_file, 'r+b') as opened_file:
+            opened_file.truncate(os.path.getsize(shard_file) - 8)
+        self.assertListEqual(['m001h'], self.visibility_cache.missing_receiver_names(receiver_names=['m000h', 'm001h']))
+        self.assertFalse(self.visibility_cache.contains(receiver_names=['m001h']))
+
+    def test_missing_receiver_names_when_file_overwritten(self):
+        self._store()
+        shard_file = os.path.join(self.cache_directory, 'm002h', 'visibility.npy')
+        with open(shard_file, 'r+b') as opened_file:
+            opened_file.seek(-8, os.SEEK_END)
+            opened_file.write(b'\x00' * 8)
+        self.assertListEqual(['m002h'], self.visibility_cache.missing_receiver_names(receiver_names=['m002h', 'm003h']))
+
+    def test_missing_receiver_names_when_file_deleted(self):
+        self._store()
+        os.remove(os.path.join(self.cache_directory, 'm003h', 'flags.npy'))
+        self.assertListEqual(['m003h'], self.visibility_cache.missing_receiver_names(receiver_names=['m003h']))
+
+    def test_store_when_receiver_corrupt_expect_repaired(self):
+        self._store()
+        shard_file = os.path.join(self.cache_directory, 'm001h', 'weights.npy')
+        with open(shard_file, 'r+b') as opened_file:
+            opened_file.truncate(16)
+        self.visibility_cache.store(visibility=self.visibility[:, :, 1:2],
+                                    flags=self.flags[:, :, :, 1:2],
+                                    weights=self.weights[:, :, 1:2],
+                                    receiver_names=['m001h'])
+        self.assertTrue(self.visibility_cache.contains(receiver_names=self.receiver_names))
+        _, _, weights = self.visibility_cache.load(receiver_names=['m001h'])
+        np.testing.assert_array_equal(self.weights[:, :, 1:2], weights)
+
+    def test_store_when_codec(self):
+        self.visibility_cache.codec = ChunkedCodec(chunk_length=3)
+        self._store()
+        self.assertListEqual(['flags.npc', 'visibility.npc', 'weights.npc'],
+                             sorted(os.listdir(os.path.join(self.cache_directory, 'm000h'))))
+        self.assertTrue(self.visibility_cache.contains(receiver_names=self.receiver_names))
+        visibility, flags, weights = self.visibility_cache.load(receiver_names=['m004h', 'm000h'], dumps=[0, 2, 3])
+        np.testing.assert_array_equal(self.visibility[[0, 2, 3]][:, :, [4, 0]], visibility)
+        np.testing.assert_array_equal(self.flags[:, [0, 2, 3]][:, :, :, [4, 0]], flags)
+        np.testing.assert_array_equal(self.weights[[0, 2, 3]][:, :, [4, 0]], weights)
+
+    def test_load_when_compressed_and_no_codec(self):
+        self.visibility_cache.codec = ChunkedCodec(codec='lzma')
+        self._store()
+        visibility, _, _ = VisibilityCache(cache_directory=self.cache_directory).load(receiver_names=['m001h'])
+        np.testing.assert_array_equal(self.visibility[:, :, 1:2], visibility)
+
+    def test_missing_receiver_names_when_compressed_file_truncated(self):
+        self.visibility_cache.codec = ChunkedCodec()
+        self._store()
+        shard_file = os.path.join(self.cache_directory, 'm001h', 'weights.npc')
+        with open(shard_file, 'r+b') as opened_file:
+            opened_file.truncate(os.path.getsize(shard_file) - 1)
+        self.assertListEqual(['m001h'], self.visibility_cache.missing_receiver_names(receiver_names=['m000h', 'm001h']))
+
+    def test_store_when_uncompressed_after_compressed_expect_compressed_file_removed(self):
+        self.visibility_cache.codec = ChunkedCodec()
+        self._store()
+        self.visibility_cache.codec = None
+        self.visibility_cache.store(visibility=self.visibility[:, :, :1] * 2,
+                                    flags=self.flags[:, :, :, :1],
+                                    weights=self.weights[:, :, :1],
+                                    receiver_names=['m000h'])
+        self.assertListEqual(['flags.npy', 'visibility.npy', 'weights.npy'],
+                             sorted(os.listdir(os.path.join(self.cache_directory, 'm000h'))))
+        visibility, _, _ = self.visibility_cache.load(receiver_names=['m000h'])
+        np.testing.assert_array_equal(self.visibility[:, :, :1] * 2, visibility)
+
+    def test_store_expect_flags_packed(self):
+        self.shape = (4, 11, 5)
+        self.visibility = np.zeros(self.shape, dtype=complex)
+        self.flags = (np.arange(220).reshape(self.shape) % 3 == 0)[np.newaxis]
+        self.weights = np.zeros(self.shape)
+        self._store()
+        packed = np.load(os.path.join(self.cache_directory, 'm001h', 'flags.npy'))
+        self.assertEqual(np.uint8, packed.dtype)
+        self.assertTupleEqual((4, 2), packed.shape)
+        self.assertEqual(np.dtype(bool), self.visibility_cache.dtypes()[1])
+        _, flags, _ = self.visibility_cache.load(receiver_names=['m003h', 'm001h'], dumps=[1, 3])
+        np.testing.assert_array_equal(self.flags[:, [1, 3]][:, :, :, [3, 1]], flags)
+
+    def test_pack_flags_when_packed_expect_unchanged(self):
+        self._store()
+        file = os.path.join(self.cache_directory, 'm001h', 'flags.npy')
+        packed = np.load(file)
+        VisibilityCache._pack_flags(file=file)
+        np.testing.assert_array_equal(packed, np.load(file))
+
+
+class TestReceiverShardedArray(unittest.TestCase):
+
+    def test_setitem(self):
+        shards = [np.zeros((2, 3)), np.zeros((2, 3))]
+        sharded_array = ReceiverShardedArray(shards=shards)
+        self.assertTupleEqual((2, 3, 2), sharded_array.shape)
+        sharded_array[:, 1:, 1:] = np.ones((2, 2, 1))
+        np.testing.assert_array_equal(np.zeros((2, 3)), shards[0])
+        np.testing.assert_array_equal([[0, 1, 1], [0, 1, 1]], shards[1])
+
+    def test_setitem_when_ellipsis(self):
+        shards = [np.zeros((2, 3)), np.zeros((2, 3))]
+        sharded_array = ReceiverShardedArray(shards=shards)
+        sharded_array[...] = np.arange(12).reshape((2, 3, 2))
+        np.testing.assert_array_equal(np.arange(12).reshape((2, 3, 2))[:, :, 1], shards[1])
+
+
+class TestReceiverStackedArray(unittest.TestCase):
+
+    def setUp(self):
+        self.array = np.arange(24, dtype=float).reshape((2, 4, 3))
+        self.loaded = []
+        self.stacked_array = ReceiverStackedArray(load_shard=self._load_shard, shape=(2, 4, 3), dtype=float)
+
+    def _load_shard(self, i_receiver: int) -> np.ndarray:
+        self.loaded.append(i_receiver)
+        return self.array[:, :, i_receiver].copy()
+
+    def test_getitem(self):
+        for index in [np.s_[...], np.s_[1], np.s_[:, 2], np.s_[..., 1], np.s_[0, 1:3, [2, 0]], np.s_[:, 1, [2, 0]],
+                      np.s_[[1, 0], :, 1:],
+                      np.s_[:, :, [True, False, True]], np.s_[:, :, 1:1]]:
+            np.testing.assert_array_equal(self.array[index], self.stacked_array[index])
+
+    def test_getitem_expect_only_indexed_shards_loaded(self):
+        self.stacked_array[:, 1:3, 2]
+        self.stacked_array[0, :, 2:3]
+        self.assertListEqual([2], self.loaded)
+
+    def test_getitem_when_boolean_mask_expect_stacked(self):
+        mask = self.array > 10
+        np.testing.assert_array_equal(self.array[mask], self.stacked_array[mask])
+
+    def test_numpy_functions_and_arithmetic(self):
+        self.assertTupleEqual((2, 4, 3), np.shape(self.stacked_array))
+        self.assertListEqual([], self.loaded)
+        np.testing.assert_array_equal(np.mean(self.array, axis=0), np.mean(self.stacked_array, axis=0))
+        np.testing.assert_array_equal(self.array * 2, self.stacked_array * 2)
+        np.testing.assert_array_equal(self.array < 5, self.stacked_array < 5)
+
+    def test_setitem_and_in_place_arithmetic(self):
+        self.stacked_array[:, 0, 1:] = 0
+        np.multiply(self.stacked_array, 2, out=self.stacked_array)
+        expect = self.array * 2
+        expect[:, 0, 1:] = 0
+        np.testing.assert_array_equal(expect, self.stacked_array)
+
+    def test_real(self):
+        self.assertIs(self.stacked_array, self.stacked_array.real)
+
+    def test_pickle_expect_numpy_array(self):
+        unpickled = pickle.loads(pickle.dumps(self.stacked_array))
+        self.assertIsInstance(unpickled, np.ndarray)
+        np.testing.assert_array_equal(self.array, unpickled)
@@ -1,7 +1,11 @@
 import unittest
 from unittest.mock import patch, Mock, MagicMock
 
-from museek.factory.data_element_factory import DataElementFactory, ScanElementFactory, FlagElementFactory
+import dask.array as da
+import numpy as np
+
+from museek.factory.data_element_factory import DataElementFactory, ScanElementFactory, FlagElementFactory, \
+    DaskDataElementFactory
 
 
 class TestDataElementFactory(unittest.TestCase):
@@ -12,6 +16,17 @@ class TestDataElementFactory(unittest.TestCase):
         self.assertEqual(factory, mock_data_element.return_value)
 
 
+class TestDaskDataElementFactory(unittest.TestCase):
+    def test_create_when_numpy_array(self):
+        element = DaskDataElementFactory(chunks=(2, 3, 3)).create(array=np.zeros((4, 3, 3)))
+        self.assertIsInstance(element.array, da.Array)
+        self.assertTupleEqual(((2, 2), (3,), (3,)), element.array.chunks)
+
+    def test_create_when_dask_array_expect_chunks_kept(self):
+        array = da.zeros((4, 3, 3), chunks=(1, 3, 3))
+        self.assertIs(array, DaskDataElementFactory(chunks=(2, 3, 3)).create(array=array).array)
+
+
 class TestFlagElementFactory(unittest.TestCase):
     @patch('museek.factory.data_element_factory.FlagElement')
     def test_create(self, mock_flag_element):
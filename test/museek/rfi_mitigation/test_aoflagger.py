@@ -6,7 +6,7 @@ import numpy as np
 from museek.factory.data_element_factory import FlagElementFactory
 from museek.rfi_mitigation.aoflagger import _sum_threshold_mask, \
     _run_sumthreshold, _apply_kernel, \
-    gaussian_filter, get_rfi_mask
+    gaussian_filter, get_rfi_mask, plot_moments
 
 
 class TestAoflagger(unittest.TestCase):
@@ -181,3 +181,14 @@ class TestAoflagger(unittest.TestCase):
         rfi = np.ma.array(data=data, mask=~(sum_threshold ^ mask))
         mean_rfi = np.mean(rfi)
         self.assertGreater(mean_rfi, 2000)
+
+    @patch('museek.rfi_mitigation.aoflagger.plt')
+    def test_plot_moments_when_chunked_expect_numpy_moments(self, mock_plt):
+        data = self.data[:, :, 0]
+        plot_moments(data, 'output_path', chunk_size=64)
+        plotted = [plot_call.args[0] for plot_call in mock_plt.plot.call_args_list]
+        np.testing.assert_allclose(np.mean(data, axis=0), plotted[0])
+        np.testing.assert_allclose(np.std(data, axis=0), plotted[1])
+        np.testing.assert_allclose(np.mean(data, axis=1), plotted[2])
+        np.testing.assert_allclose(np.std(data, axis=1), plotted[3])
+        mock_plt.savefig.assert_called_once()
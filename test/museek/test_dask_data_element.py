@@ -0,0 +1,116 @@
+import unittest
+
+import dask.array as da
+import numpy as np
+
+from museek.dask_data_element import DaskDataElement
+from museek.data_element import DataElement
+from museek.factory.data_element_factory import FlagElementFactory
+from museek.flag_list import FlagList
+
+
+class TestDaskDataElement(unittest.TestCase):
+
+    def setUp(self):
+        self.shape = (6, 5, 4)
+        self.array = np.random.default_rng(seed=0).normal(size=self.shape)
+        self.element = DaskDataElement(array=da.from_array(self.array, chunks=(2, 5, 2)))
+        self.numpy_element = DataElement(array=self.array)
+        self.flags = FlagList.from_array(array=np.arange(120).reshape(self.shape) % 3 == 0,
+                                         element_factory=FlagElementFactory())
+
+    def test_init_when_numpy_array(self):
+        self.assertIsInstance(DaskDataElement(array=self.array).array, da.Array)
+
+    def test_init_when_not_3_dimensional_expect_raise(self):
+        self.assertRaises(ValueError, DaskDataElement, array=da.zeros((3, 3)))
+
+    def test_compute(self):
+        computed = self.element.compute()
+        self.assertNotIsInstance(computed, DaskDataElement)
+        np.testing.assert_array_equal(self.array, computed.array)
+
+    def test_squeeze(self):
+        np.testing.assert_array_equal(self.array[:, 1], self.element.get(freq=1).squeeze)
+
+    def test_eq(self):
+        self.assertEqual(self.element, self.numpy_element)
+        self.assertNotEqual(self.element, self.numpy_element * 2)
+
+    def test_get_expect_lazy(self):
+        result = self.element.get(time=[1, 3], freq=2, recv=slice(0, 2))
+        self.assertIsInstance(result, DaskDataElement)
+        self.assertIsInstance(result.array, da.Array)
+        np.testing.assert_array_equal(self.array[[1, 3]][:, [2]][:, :, :2], result.compute().array)
+
+    def test_arithmetic_expect_lazy(self):
+        for result, expect in [(self.element * 2, self.array * 2),
+                               (self.element / self.numpy_element, np.ones(self.shape)),
+                               (self.element - np.ones((1, 5, 1)), self.array - 1),
+                               (self.element + self.element, self.array * 2)]:
+            self.assertIsInstance(result, DaskDataElement)
+            np.testing.assert_allclose(expect, result.compute().array)
+
+    def test_in_place_arithmetic(self):
+        element = self.element.get()
+        element *= 2
+        np.testing.assert_allclose(self.array * 2, element.compute().array)
+        np.testing.assert_allclose(self.array, self.element.compute().array)
+
+    def test_multiply_when_out_not_self_expect_raise(self):
+        self.assertRaises(ValueError, self.element.multiply, other=2, out=np.zeros(self.shape))
+
+    def test_reductions(self):
+        for name in ['mean', 'median', 'standard_deviation', 'kurtosis']:
+            for axis in [0, 2, (0, 1)]:
+                result = getattr(self.element, name)(axis=axis)
+                self.assertIsInstance(result.array, da.Array)
+                np.testing.assert_allclose(getattr(self.numpy_element, name)(axis=axis).array,
+                                           result.compute().array)
+
+    def test_reductions_when_flags(self):
+        for name in ['mean', 'median', 'standard_deviation', 'kurtosis']:
+            for axis in [0, 2, (0, 1)]:
+                result = getattr(self.element, name)(axis=axis, flags=self.flags)
+                np.testing.assert_allclose(getattr(self.numpy_element, name)(axis=axis, flags=self.flags).array,
+                                           result.compute().array)
+
+    def test_sum_min_max(self):
+        for name in ['sum', 'min', 'max']:
+            result = getattr(self.element, name)(axis=1)
+            self.assertIsInstance(result, DaskDataElement)
+            np.testing.assert_allclose(getattr(self.numpy_element, name)(axis=1).array, result.compute().array)
+
+    def test_reductions_when_dask_flags(self):
+        dask_flags = DaskDataElement(array=da.from_array(self.flags.combine().array, chunks=(2, 5, 2)))
+        for name in ['mean', 'median', 'standard_deviation', 'kurtosis']:
+            result = getattr(self.element, name)(axis=0, flags=dask_flags)
+            np.testing.assert_allclose(getattr(self.numpy_element, name)(axis=0, flags=self.flags).array,
+                                       result.compute().array)
+
+    def test_reduce_by_groups_expect_lazy_and_equal_to_numpy(self):
+        operations = ['count', 'sum', 'mean', 'standard_deviation']
+        for groups in [{'labels': [2, 0, -1, 2, 0, 0]}, {'boundaries': [1, 3, 3, 6]}]:
+            result = self.element.reduce_by_groups(operations=operations, flags=self.flags, **groups)
+            expect = self.numpy_element.reduce_by_groups(operations=operations, flags=self.flags, **groups)
+            for operation in operations:
+                self.assertIsInstance(result[operation].array, da.Array)
+                computed = result[operation].compute().array
+                np.testing.assert_allclose(np.ma.getdata(expect[operation].array), np.ma.getdata(computed))
+                np.testing.assert_array_equal(np.ma.getmaskarray(expect[operation].array),
+                                              np.ma.getmaskarray(computed))
+
+    def test_reduce_by_groups_when_dask_flags(self):
+        dask_flags = DaskDataElement(array=da.from_array(self.flags.combine().array, chunks=(2, 5, 2)))
+        result = self.element.reduce_by_groups(operations=['mean'], boundaries=[0, 2, 6], flags=dask_flags)
+        expect = self.numpy_element.reduce_by_groups(operations=['mean'], boundaries=[0, 2, 6], flags=self.flags)
+        np.testing.assert_allclose(expect['mean'].array, result['mean'].compute().array)
+
+    def test_reduce_by_groups_when_no_group(self):
+        result = self.element.reduce_by_groups(operations=['mean'], labels=[-1] * 6)
+        self.assertEqual((0, 5, 4), result['mean'].compute().shape)
+
+    def test_reduce_by_groups_when_trailing_group_empty(self):
+        result = self.element.reduce_by_groups(operations=['count', 'mean'], labels=[0, 1, 1, 0, -1, 1], n_groups=3)
+        np.testing.assert_array_equal([2, 3, 0], result['count'].compute().array[:, 0, 0])
+        self.assertTrue(result['mean'].compute().array.mask[2].all())
@@ -2,6 +2,7 @@ import unittest
 from unittest.mock import MagicMock, patch, Mock
 
 import numpy as np
+import scipy
 
 from museek.data_element import DataElement
 from museek.flag_element import FlagElement
@@ -83,6 +84,61 @@ class TestDataElement(unittest.TestCase):
         expect = np.resize(np.arange(2, 29), self.shape)
         np.testing.assert_array_equal(expect, subtracted.array)
 
+    def test_mul_when_other_has_singleton_axes_expect_broadcast(self):
+        other = DataElement(array=np.arange(3.).reshape((1, 3, 1)))
+        np.testing.assert_array_equal(self.element.array * other.array, (self.element * other).array)
+        np.testing.assert_array_equal(self.element.array * other.array, (other * self.element).array)
+
+    def test_truediv_when_other_has_singleton_axes_expect_broadcast(self):
+        other = np.arange(1., 4.).reshape((3, 1, 1))
+        np.testing.assert_array_equal(self.element.array / other, (self.element / other).array)
+
+    def test_add_when_shapes_not_broadcastable_expect_raise(self):
+        self.assertRaises(ValueError, self.element.__add__, np.ones((3, 2, 3)))
+
+    def test_sub_when_other_not_3_dimensional_expect_raise(self):
+        self.assertRaises(ValueError, self.element.__sub__, np.ones((3, 3)))
+
+    def test_imul_expect_in_place(self):
+        element = DataElement(array=np.ones(self.shape))
+        array = element.array
+        element *= DataElement(array=np.full((1, 3, 1), 2.))
+        self.assertIs(array, element.array)
+        np.testing.assert_array_equal(np.full(self.shape, 2.), element.array)
+
+    def test_itruediv_expect_in_place(self):
+        element = DataElement(array=np.ones(self.shape))
+        array = element.array
+        element /= 4.
+        self.assertIs(array, element.array)
+        np.testing.assert_array_equal(np.full(self.shape, .25), element.array)
+
+    def test_iadd_and_isub_expect_in_place(self):
+        element = DataElement(array=np.ones(self.shape))
+        array = element.array
+        element += np.ones((1, 1, 3))
+        element -= DataElement(array=np.full(self.shape, .5))
+        self.assertIs(array, element.array)
+        np.testing.assert_array_equal(np.full(self.shape, 1.5), element.array)
+
+    def test_iadd_when_result_larger_than_self_expect_raise(self):
+        element = DataElement(array=np.ones((1, 3, 1)))
+        self.assertRaises(ValueError, element.__iadd__, np.ones(self.shape))
+
+    def test_divide_when_out(self):
+        out = np.zeros(self.shape)
+        result = self.element.divide(other=np.full((1, 1, 3), 2.), out=out)
+        self.assertIs(out, result.array)
+        np.testing.assert_array_equal(self.element.array / 2., out)
+
+    def test_multiply_when_out_is_data_element(self):
+        out = DataElement(array=np.zeros(self.shape))
+        self.assertIs(out, self.element.multiply(other=3., out=out))
+        np.testing.assert_array_equal(self.element.array * 3., out.array)
+
+    def test_subtract_when_out_wrong_shape_expect_raise(self):
+        self.assertRaises(ValueError, self.element.subtract, other=1., out=np.zeros((3, 3, 1)))
+
     @patch('museek.abstract_data_element.np')
     def test_getitem(self, mock_np):
         self.assertEqual(mock_np.squeeze.return_value, self.element[0, 1, 2])
@@ -105,11 +161,15 @@ class TestDataElement(unittest.TestCase):
         self.assertNotEqual(DataElement(array=array_1), DataElement(array=array_2))
 
     @patch.object(np, 'squeeze')
-    @patch.object(DataElement, 'get_array')
-    def test_squeeze(self, mock_get_array, mock_np_squeeze):
+    def test_squeeze(self, mock_np_squeeze):
         self.element.squeeze
-        mock_get_array.assert_called_once()
-        mock_np_squeeze.assert_called_once_with(mock_get_array.return_value)
+        mock_np_squeeze.assert_called_once_with(self.element.array)
+
+    def test_squeeze_expect_view(self):
+        self.assertTrue(np.shares_memory(self.element.array, self.element.squeeze))
+
+    def test_squeeze_expect_writable(self):
+        self.assertTrue(self.element.squeeze.flags.writeable)
 
     def test_shape(self):
         self.assertTupleEqual((3, 3, 3), self.element.shape)
@@ -253,6 +313,72 @@ class TestDataElement(unittest.TestCase):
         element = DataElement(array=np.zeros(shape_))
         np.testing.assert_array_equal(0, element.get(time=-1, freq=-1, recv=-1).squeeze)
 
+    def test_get_when_integers_and_slices_expect_copy(self):
+        element = DataElement(array=np.arange(330.).reshape((10, 11, 3)))
+        result = element.get(time=5, freq=slice(2, 4), recv=range(0, 3, 2))
+        self.assertTupleEqual((1, 2, 2), result.shape)
+        self.assertFalse(np.shares_memory(element.array, result.array))
+        self.assertTrue(result.array.flags.writeable)
+        np.testing.assert_array_equal(element.array[[5]][:, [2, 3]][:, :, [0, 2]], result.array)
+
+    def test_get_when_integers_and_slices_and_not_copy_expect_view(self):
+        element = DataElement(array=np.arange(330.).reshape((10, 11, 3)))
+        result = element.get(time=5, freq=slice(2, 4), recv=range(0, 3, 2), copy=False)
+        self.assertTupleEqual((1, 2, 2), result.shape)
+        self.assertTrue(np.shares_memory(element.array, result.array))
+        np.testing.assert_array_equal(element.array[[5]][:, [2, 3]][:, :, [0, 2]], result.array)
+
+    def test_get_when_view_changed_in_place_expect_raise_and_self_unchanged(self):
+        element = DataElement(array=np.arange(330.).reshape((10, 11, 3)))
+        result = element.get(time=slice(2, 5), copy=False)
+        with self.assertRaises(ValueError):
+            result += 1
+        with self.assertRaises(ValueError):
+            result.array[0, 0, 0] = -1
+        np.testing.assert_array_equal(np.arange(330.).reshape((10, 11, 3)), element.array)
+        self.assertTrue(element.array.flags.writeable)
+
+    def test_get_when_copy_changed_in_place_expect_self_unchanged(self):
+        element = DataElement(array=np.arange(330.).reshape((10, 11, 3)))
+        result = element.get(time=slice(2, 5))
+        result += 1
+        np.testing.assert_array_equal(np.arange(330.).reshape((10, 11, 3))[2:5] + 1, result.array)
+        np.testing.assert_array_equal(np.arange(330.).reshape((10, 11, 3)), element.array)
+
+    def test_get_when_copy_expect_no_view(self):
+        element = DataElement(array=np.arange(330.).reshape((10, 11, 3)))
+        result = element.get(time=5)
+        self.assertFalse(np.shares_memory(element.array, result.array))
+        np.testing.assert_array_equal(element.array[[5]], result.array)
+
+    def test_get_when_lists_expect_combined_gather(self):
+        element = DataElement(array=np.arange(330.).reshape((10, 11, 3)))
+        result = element.get(time=[7, 5], freq=slice(1, 9, 3), recv=[2, 0])
+        self.assertFalse(np.shares_memory(element.array, result.array))
+        np.testing.assert_array_equal(element.array[[7, 5]][:, [1, 4, 7]][:, :, [2, 0]], result.array)
+
+    def test_get_when_one_list(self):
+        element = DataElement(array=np.arange(330.).reshape((10, 11, 3)))
+        np.testing.assert_array_equal(element.array[:, [3, 1]][:, :, [1]], element.get(freq=[3, 1], recv=1).array)
+
+    def test_get_when_boolean_list(self):
+        element = DataElement(array=np.arange(330.).reshape((10, 11, 3)))
+        np.testing.assert_array_equal(element.array[:, :, [0, 2]], element.get(recv=[True, False, True]).array)
+
+    def test_get_when_empty_list(self):
+        element = DataElement(array=np.arange(330.).reshape((10, 11, 3)))
+        self.assertTupleEqual((0, 11, 3), element.get(time=[]).shape)
+
+    def test_get_when_range_negative(self):
+        element = DataElement(array=np.arange(330.).reshape((10, 11, 3)))
+        np.testing.assert_array_equal(element.array[[2, 1, 0]], element.get(time=range(2, -1, -1)).array)
+        np.testing.assert_array_equal(element.array[[-2, -1]], element.get(time=range(-2, 0)).array)
+
+    def test_get_when_integer_out_of_bounds_expect_raise(self):
+        element = DataElement(array=np.zeros((10, 11, 3)))
+        self.assertRaises(IndexError, element.get, recv=3)
+        self.assertRaises(IndexError, element.get, time=-11)
+
     @patch.object(DataElement, 'get')
     def test_get_array(self, mock_get):
         mock_kwargs = MagicMock()
@@ -414,5 +540,118 @@ class TestDataElement(unittest.TestCase):
         np.testing.assert_array_equal(expect, std.squeeze)
 
 
+    def test_flagged_reductions_when_all_flagged_expect_masked(self):
+        flag_array = np.zeros((3, 3, 3), dtype=bool)
+        flag_array[:, 0, 0] = True
+        flags = FlagList(flags=[FlagElement(array=flag_array)])
+        for reduction in [self.element._flagged_mean, self.element._flagged_median, self.element._flagged_std]:
+            result = reduction(axis=0, flags=flags).array
+            self.assertTrue(result.mask[0, 0, 0])
+            self.assertEqual(1, result.mask.sum())
+        self.assertTrue(np.isnan(self.element._flagged_kurtosis(axis=0, flags=flags).array[0, 0, 0]))
+
+    def test_flagged_reductions_expect_equal_to_numpy_ma(self):
+        array = np.random.default_rng(seed=0).normal(size=(20, 6, 4))
+        flag_array = np.random.default_rng(seed=1).random((20, 6, 4)) < 0.3
+        element = DataElement(array=array)
+        flags = FlagList(flags=[FlagElement(array=flag_array)])
+        masked = np.ma.masked_array(array, flag_array)
+        for axis in [0, 1, (0, 1), (0, 2)]:
+            np.testing.assert_allclose(masked.mean(axis=axis, keepdims=True),
+                                       element._flagged_mean(axis=axis, flags=flags).array)
+            np.testing.assert_allclose(np.ma.median(masked, axis=axis, keepdims=True),
+                                       element._flagged_median(axis=axis, flags=flags).array)
+            np.testing.assert_allclose(masked.std(axis=axis, keepdims=True),
+                                       element._flagged_std(axis=axis, flags=flags).array)
+            np.testing.assert_allclose(scipy.stats.kurtosis(masked, axis=axis, keepdims=True),
+                                       element._flagged_kurtosis(axis=axis, flags=flags).array)
+
+    def test_mean_when_flags_and_no_dumps_expect_fully_masked(self):
+        element = DataElement(array=np.ones((5, 4, 2)))
+        flags = FlagList(flags=[FlagElement(array=np.zeros((5, 1, 1), dtype=bool))])
+        mean = element.get(time=[], freq=range(1, 3), recv=1).mean(axis=0,
+                                                                    flags=flags.get(time=[], freq=range(1, 3), recv=1))
+        self.assertTupleEqual((1, 2, 1), mean.shape)
+        self.assertTrue(mean.array.mask.all())
+
+    def test_reduce_by_groups_when_boundaries_expect_equal_to_loop(self):
+        array = np.random.default_rng(seed=0).normal(size=(20, 6, 4))
+        flag_array = np.random.default_rng(seed=1).random((20, 6, 4)) < 0.3
+        element = DataElement(array=array)
+        flags = FlagList(flags=[FlagElement(array=flag_array)])
+        boundaries = [2, 5, 5, 12, 19]
+        result = element.reduce_by_groups(operations=['count', 'mean', 'standard_deviation'],
+                                          boundaries=boundaries,
+                                          flags=flags)
+        self.assertEqual(4, result['mean'].shape[0])
+        self.assertTrue(result['mean'].array.mask[1].all())
+        for i, (start, stop) in enumerate(zip(boundaries[:-1], boundaries[1:])):
+            if start == stop:
+                continue
+            masked = np.ma.masked_array(array[start:stop], flag_array[start:stop])
+            np.testing.assert_array_equal(masked.count(axis=0), result['count'].array[i])
+            np.testing.assert_allclose(masked.mean(axis=0), result['mean'].array[i])
+            np.testing.assert_allclose(masked.std(axis=0), result['standard_deviation'].array[i])
+
+    def test_reduce_by_groups_when_labels_expect_equal_to_loop(self):
+        array = np.random.default_rng(seed=0).normal(size=(20, 6, 4))
+        labels = np.random.default_rng(seed=1).integers(-1, 4, size=20)
+        labels[0] = 3
+        result = DataElement(array=array).reduce_by_groups(operations=['sum', 'mean', 'standard_deviation'],
+                                                           labels=labels)
+        self.assertListEqual(['sum', 'mean', 'standard_deviation'], list(result))
+        for label in range(4):
+            group = array[labels == label]
+            np.testing.assert_allclose(group.sum(axis=0), result['sum'].array[label])
+            np.testing.assert_allclose(group.mean(axis=0), result['mean'].array[label])
+            np.testing.assert_allclose(group.std(axis=0), result['standard_deviation'].array[label])
+
+    def test_reduce_by_groups_when_trailing_group_empty(self):
+        array = np.random.default_rng(seed=0).normal(size=(6, 2, 3))
+        labels = [0, 1, 1, 0, -1, 1]
+        result = DataElement(array=array).reduce_by_groups(operations=['count', 'mean', 'standard_deviation'],
+                                                           labels=labels,
+                                                           n_groups=4)
+        self.assertEqual(4, result['mean'].shape[0])
+        np.testing.assert_array_equal([2, 3, 0, 0], result['count'].array[:, 0, 0])
+        np.testing.assert_allclose(array[[0, 3]].mean(axis=0), result['mean'].array[0])
+        self.assertTrue(result['mean'].array.mask[2:].all())
+        self.assertTrue(result['standard_deviation'].array.mask[2:].all())
+
+    def test_reduce_by_groups_when_n_groups_too_small_expect_raise(self):
+        self.assertRaises(ValueError, self.element.reduce_by_groups, operations=['mean'], labels=[0, 2, 1], n_groups=2)
+
+    def test_reduce_by_groups_when_n_groups_and_boundaries_expect_raise(self):
+        self.assertRaises(ValueError, self.element.reduce_by_groups, operations=['mean'], boundaries=[0, 3], n_groups=1)
+
+    def test_reduce_by_groups_when_labels_and_boundaries_expect_raise(self):
+        self.assertRaises(ValueError, self.element.reduce_by_groups, operations=['mean'],
+                          labels=[0, 0, 1], boundaries=[0, 3])
+        self.assertRaises(ValueError, self.element.reduce_by_groups, operations=['mean'])
+
+    def test_reduce_by_groups_when_unknown_operation_expect_raise(self):
+        self.assertRaises(ValueError, self.element.reduce_by_groups, operations=['median'], boundaries=[0, 3])
+
+    def test_reduce_by_groups_when_invalid_groups_expect_raise(self):
+        self.assertRaises(ValueError, self.element.reduce_by_groups, operations=['mean'], boundaries=[0, 4])
+        self.assertRaises(ValueError, self.element.reduce_by_groups, operations=['mean'], boundaries=[2, 1])
+        self.assertRaises(ValueError, self.element.reduce_by_groups, operations=['mean'], labels=[0, 1])
+        self.assertRaises(ValueError, self.element.reduce_by_groups, operations=['mean'], labels=[0., 1., 1.])
+
+
+    def test_flagged_reductions_when_collapsed_flags_expect_broadcast(self):
+        array = np.random.default_rng(seed=0).normal(size=(20, 6, 4))
+        channel_flag = np.zeros((1, 6, 1), dtype=bool)
+        channel_flag[0, [1, 4], 0] = True
+        element = DataElement(array=array)
+        flags = FlagList(flags=[FlagElement(array=channel_flag)])
+        masked = np.ma.masked_array(array, np.broadcast_to(channel_flag, array.shape))
+        np.testing.assert_allclose(masked.mean(axis=0, keepdims=True), element.mean(axis=0, flags=flags).array)
+        np.testing.assert_allclose(masked.std(axis=1, keepdims=True),
+                                   element.standard_deviation(axis=1, flags=flags).array)
+        np.testing.assert_allclose(np.ma.median(masked, axis=0, keepdims=True),
+                                   element.median(axis=0, flags=flags).array)
+
+
 if __name__ == '__main__':
     unittest.main()
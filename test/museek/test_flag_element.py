@@ -1,3 +1,4 @@
+import pickle
 import unittest
 from unittest.mock import patch, MagicMock, PropertyMock
 
@@ -77,3 +78,15 @@ class TestFlagElement(unittest.TestCase):
 
     def test_make_boolean_when_not_binary_expect_raise(self):
         self.assertRaises(ValueError, FlagElement._make_boolean, np.array([1, 2, 3]))
+
+    def test_pickle_expect_packed(self):
+        flag = FlagElement(array=np.arange(3 * 11 * 2).reshape((3, 11, 2)) % 3 == 0)
+        self.assertTupleEqual((3, 2, 2), flag.__getstate__()['packed_array'].shape)
+        unpickled = pickle.loads(pickle.dumps(flag))
+        self.assertEqual(flag, unpickled)
+        self.assertEqual(bool, unpickled.array.dtype)
+
+    def test_setstate_when_pickled_unpacked(self):
+        flag = FlagElement.__new__(FlagElement)
+        flag.__setstate__({'array': np.ones((2, 3, 1), dtype=bool)})
+        self.assertEqual(FlagElement(array=np.ones((2, 3, 1))), flag)
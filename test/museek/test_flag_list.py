@@ -1,5 +1,6 @@
+import pickle
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 
 import numpy as np
 
@@ -54,7 +55,7 @@ class TestFlagList(unittest.TestCase):
     def test_add_flag_when_flag_element(self):
         mock_flags = FlagList(flags=[FlagElement(array=np.zeros((3, 3, 3)))])
         self.flag_list.add_flag(flag=mock_flags)
-        np.testing.assert_array_equal(mock_flags._flags[0].array, self.flag_list._flags[0].array)
+        np.testing.assert_array_equal(mock_flags.array[0], self.flag_list.array[3])
 
     def test_remove_flag(self):
         flag_list = FlagList(flags=[FlagElement(array=np.ones((3, 3, 3), dtype=bool)) for _ in range(3)])
@@ -98,15 +99,16 @@ class TestFlagList(unittest.TestCase):
         flag_list = FlagList(flags=[flag_1, flag_2])
         self.assertEqual(flag_2, flag_list.combine(threshold=1))
 
-    @patch.object(FlagList, '_check_flags')
-    def test_get(self, mock_check_flags):
-        mock_flag = MagicMock(shape=1)
-        mock_flag.get.return_value = mock_flag
-        flag_list = FlagList(flags=[mock_flag])
-        kwargs = {'mock': 'mock'}
-        self.assertEqual(flag_list._flags[0], flag_list.get(**kwargs)._flags[0])
-        mock_flag.get.assert_called_once_with(mock='mock')
-        self.assertEqual(2, mock_check_flags.call_count)
+    def test_get(self):
+        array = np.random.default_rng(seed=0).random((2, 4, 5, 3)) < 0.5
+        flag_list = FlagList.from_array(array=array, element_factory=FlagElementFactory())
+        result = flag_list.get(time=range(1, 3), freq=[0, 2, 4], recv=1)
+        np.testing.assert_array_equal(array[:, 1:3][:, :, [0, 2, 4]][:, :, :, [1]], result.array)
+
+    def test_get_expect_copy(self):
+        flag_list = self.flag_list.get(time=range(2))
+        flag_list.insert_receiver_flag(flag=FlagElement(array=np.ones((2, 3, 1))), i_receiver=0, index=0)
+        self.assertFalse(self.flag_list.array.any())
 
     def test_insert_receiver_flag_when_flag_shape_incorrect_expect_value_error(self):
         mock_flag = FlagElement(array=np.ones((3, 3, 2)))
@@ -119,10 +121,10 @@ class TestFlagList(unittest.TestCase):
     def test_insert_receiver_flag(self):
         mock_flag = FlagElement(array=np.ones((3, 3, 1), dtype=bool))
         self.flag_list.insert_receiver_flag(flag=mock_flag, i_receiver=1, index=2)
-        self.assertTrue((self.flag_list._flags[0].array == False).all())
-        self.assertTrue((self.flag_list._flags[2].get(recv=0).squeeze == False).all())
-        self.assertTrue((self.flag_list._flags[2].get(recv=2).squeeze == False).all())
-        self.assertTrue(self.flag_list._flags[2].get(recv=1).squeeze.all())
+        self.assertTrue((self.flag_list.array[0] == False).all())
+        self.assertTrue((self.flag_list.array[2, :, :, 0] == False).all())
+        self.assertTrue((self.flag_list.array[2, :, :, 2] == False).all())
+        self.assertTrue(self.flag_list.array[2, :, :, 1].all())
 
     def test_insert_receiver_flag_when_one_channel(self):
         flags = [FlagElement(array=np.zeros((3, 1, 3))) for _ in range(3)]
@@ -130,10 +132,10 @@ class TestFlagList(unittest.TestCase):
 
         mock_flag = FlagElement(array=np.ones((3, 1, 1), dtype=bool))
         flag_list.insert_receiver_flag(flag=mock_flag, i_receiver=1, index=2)
-        self.assertTrue((flag_list._flags[0].array == False).all())
-        self.assertTrue((flag_list._flags[2].get(recv=0).squeeze == False).all())
-        self.assertTrue((flag_list._flags[2].get(recv=2).squeeze == False).all())
-        self.assertTrue(flag_list._flags[2].get(recv=1).squeeze.all())
+        self.assertTrue((flag_list.array[0] == False).all())
+        self.assertTrue((flag_list.array[2, :, :, 0] == False).all())
+        self.assertTrue((flag_list.array[2, :, :, 2] == False).all())
+        self.assertTrue(flag_list.array[2, :, :, 1].all())
 
     def test_array(self):
         expect = np.zeros((3, 3, 3, 3))
@@ -142,20 +144,150 @@ class TestFlagList(unittest.TestCase):
     @patch.object(FlagList, '_check_flag_types')
     @patch.object(FlagList, '_check_flag_shapes')
     def test_check_flags(self, mock_check_flag_shapes, mock_check_flag_types):
-        self.flag_list._check_flags()
-        mock_check_flag_shapes.assert_called_once()
-        mock_check_flag_types.assert_called_once()
+        self.flag_list._check_flags(flags=[])
+        mock_check_flag_shapes.assert_called_once_with(flags=[])
+        mock_check_flag_types.assert_called_once_with(flags=[])
 
     def test_check_flag_shapes(self):
-        self.assertIsNone(self.flag_list._check_flag_shapes())
+        self.assertIsNone(self.flag_list._check_flag_shapes(flags=[FlagElement(array=np.zeros((3, 3, 3)))]))
 
     def test_check_flag_shapes_expect_raise(self):
-        flags = [FlagElement(array=np.zeros((3, 3, 3))), FlagElement(array=np.zeros((1, 1, 1)))]
+        flags = [FlagElement(array=np.zeros((3, 3, 3))), FlagElement(array=np.zeros((3, 2, 3)))]
         self.assertRaises(ValueError, FlagList, flags=flags)
 
+    def test_check_flag_shapes_when_added_flag_has_different_shape_expect_raise(self):
+        self.assertRaises(ValueError, self.flag_list.add_flag, flag=FlagElement(array=np.zeros((2, 3, 3))))
+
     def test_check_flag_types(self):
-        self.assertIsNone(self.flag_list._check_flag_types())
+        self.assertIsNone(self.flag_list._check_flag_types(flags=[FlagElement(array=np.zeros((3, 3, 3)))]))
 
     def test_check_flag_types_expect_raise(self):
         flags = [FlagElement(array=np.zeros((3, 3, 3))), np.zeros((1, 1, 1))]
         self.assertRaises(ValueError, FlagList, flags=flags)
+
+    def test_bit_planes_when_more_than_eight_flags_expect_wider_dtype(self):
+        array = np.random.default_rng(seed=0).random((20, 3, 2, 2)) < 0.5
+        flag_list = FlagList.from_array(array=array, element_factory=FlagElementFactory())
+        self.assertEqual(np.uint32, flag_list._bit_planes.dtype)
+        np.testing.assert_array_equal(array, flag_list.array)
+
+    def test_remove_flag_expect_following_flags_shifted(self):
+        array = np.random.default_rng(seed=0).random((10, 3, 2, 2)) < 0.5
+        flag_list = FlagList.from_array(array=array, element_factory=FlagElementFactory())
+        flag_list.remove_flag(index=3)
+        np.testing.assert_array_equal(np.delete(array, 3, axis=0), flag_list.array)
+
+    def test_remove_flag_when_64_flags_and_last_removed(self):
+        array = np.random.default_rng(seed=0).random((64, 3, 2, 2)) < 0.5
+        flag_list = FlagList.from_array(array=array, element_factory=FlagElementFactory())
+        flag_list.remove_flag(index=63)
+        np.testing.assert_array_equal(array[:63], flag_list.array)
+
+    def test_combine_when_wide_bit_planes_indexed_by_receiver_list(self):
+        array = np.random.default_rng(seed=0).random((12, 4, 3, 5)) < 0.4
+        flag_list = FlagList.from_array(array=array, element_factory=FlagElementFactory())
+        for result, expect in [(flag_list.get(recv=[1, 3]), array[..., [1, 3]]),
+                               (flag_list.get(freq=[0, 2]), array[:, :, [0, 2]])]:
+            np.testing.assert_array_equal(expect.sum(axis=0) >= 2, result.combine(threshold=2).array)
+
+    def test_combine_expect_equal_to_count_threshold(self):
+        array = np.random.default_rng(seed=0).random((12, 4, 3, 2)) < 0.4
+        flag_list = FlagList.from_array(array=array, element_factory=FlagElementFactory())
+        for threshold in [0, 1, 2, 5, 13]:
+            np.testing.assert_array_equal(array.sum(axis=0) >= max(threshold, 1),
+                                          flag_list.combine(threshold=threshold).array)
+
+    def test_combine_expect_cached(self):
+        combined = self.flag_list.combine(threshold=2)
+        self.assertIs(combined, self.flag_list.combine(threshold=2))
+        self.assertFalse(combined.array.flags.writeable)
+
+    def test_combine_when_flags_changed_expect_cache_invalidated(self):
+        combined = self.flag_list.combine()
+        self.flag_list.add_flag(flag=FlagElement(array=np.ones((3, 3, 3))))
+        self.assertTrue(self.flag_list.combine().array.all())
+        self.flag_list.remove_flag(index=3)
+        self.assertFalse(self.flag_list.combine().array.any())
+        self.flag_list.insert_receiver_flag(flag=FlagElement(array=np.ones((3, 3, 1))), i_receiver=1, index=0)
+        self.assertTrue(self.flag_list.combine().array[:, :, 1].all())
+        self.assertFalse(combined.array.any())
+
+    def test_pickle_expect_packed_and_unpacked_when_accessed(self):
+        array = np.random.default_rng(seed=0).random((3, 4, 11, 2)) < 0.5
+        flag_list = FlagList.from_array(array=array, element_factory=FlagElementFactory())
+        packed, shape = flag_list.__getstate__()['_packed_flags']
+        self.assertTupleEqual((3, 4, 2, 2), packed.shape)
+        unpickled = pickle.loads(pickle.dumps(flag_list))
+        self.assertIsNone(unpickled._bit_plane_array)
+        self.assertEqual(3, len(unpickled))
+        self.assertTupleEqual((4, 11, 2), unpickled.shape)
+        np.testing.assert_array_equal(array, unpickled.array)
+        self.assertIsNotNone(unpickled._bit_plane_array)
+
+    @patch.object(np, 'packbits', wraps=np.packbits)
+    def test_getstate_expect_packed_one_flag_at_a_time(self, mock_packbits):
+        array = np.random.default_rng(seed=0).random((3, 4, 11, 2)) < 0.5
+        flag_list = FlagList.from_array(array=array, element_factory=FlagElementFactory())
+        packed, _ = flag_list.__getstate__()['_packed_flags']
+        self.assertEqual(3, mock_packbits.call_count)
+        for call_ in mock_packbits.call_args_list:
+            self.assertTupleEqual((4, 11, 2), call_.args[0].shape)
+        np.testing.assert_array_equal(np.packbits(array, axis=2), packed)
+
+    def test_pickle_expect_no_cache(self):
+        self.flag_list.combine()
+        flag_list = pickle.loads(pickle.dumps(self.flag_list))
+        self.assertDictEqual({}, flag_list._combined)
+        self.assertEqual(self.flag_list, flag_list)
+
+    def test_setstate_when_pickled_with_flag_elements(self):
+        flag_list = FlagList.__new__(FlagList)
+        flag_list.__setstate__({'_flags': [FlagElement(array=np.ones((3, 3, 3)))],
+                                '_flag_element_factory': FlagElementFactory()})
+        self.assertEqual(FlagList(flags=[FlagElement(array=np.ones((3, 3, 3)))]), flag_list)
+
+    def test_add_flag_when_collapsed_expect_broadcast(self):
+        channel_flag = np.zeros((1, 3, 1), dtype=bool)
+        channel_flag[0, 1, 0] = True
+        self.flag_list.add_flag(flag=FlagElement(array=channel_flag))
+        self.assertTupleEqual((3, 3, 3), self.flag_list.shape)
+        np.testing.assert_array_equal(np.broadcast_to(channel_flag, (3, 3, 3)), self.flag_list.array[3])
+        np.testing.assert_array_equal(np.broadcast_to(channel_flag, (3, 3, 3)), self.flag_list.combine().array)
+
+    def test_init_when_collapsed_flags_expect_collapsed_bit_planes(self):
+        dump_flag = np.array([True, False, True, False])[:, np.newaxis, np.newaxis]
+        receiver_flag = np.array([False, True])[np.newaxis, np.newaxis, :]
+        flag_list = FlagList(flags=[FlagElement(array=dump_flag), FlagElement(array=receiver_flag)])
+        self.assertTupleEqual((4, 1, 2), flag_list.shape)
+        np.testing.assert_array_equal(dump_flag | receiver_flag, flag_list.combine().array)
+        np.testing.assert_array_equal(dump_flag & receiver_flag, flag_list.combine(threshold=2).array)
+
+    def test_get_when_collapsed_expect_singleton_axes_not_indexed(self):
+        flag_list = FlagList(flags=[FlagElement(array=np.ones((1, 3, 1)))])
+        self.assertTupleEqual((1, 2, 1), flag_list.get(time=[0, 2], freq=range(1, 3), recv=2).shape)
+
+    def test_insert_receiver_flag_when_receiver_axis_collapsed_expect_broadcast(self):
+        flag_list = FlagList(flags=[FlagElement(array=np.zeros((1, 3, 1))), FlagElement(array=np.ones((1, 3, 1)))])
+        flag_list.insert_receiver_flag(flag=FlagElement(array=np.ones((2, 3, 1))),
+                                       i_receiver=2,
+                                       index=0,
+                                       n_receiver=4)
+        self.assertTupleEqual((2, 3, 4), flag_list.shape)
+        self.assertTrue(flag_list.array[0, :, :, 2].all())
+        self.assertFalse(flag_list.array[0, :, :, [0, 1, 3]].any())
+        self.assertTrue(flag_list.array[1].all())
+
+    def test_insert_receiver_flag_when_receiver_axis_collapsed_and_no_receiver_count_expect_raise(self):
+        flag_list = FlagList(flags=[FlagElement(array=np.zeros((1, 3, 1)))])
+        self.assertRaises(ValueError,
+                          flag_list.insert_receiver_flag,
+                          flag=FlagElement(array=np.ones((2, 3, 1))),
+                          i_receiver=1,
+                          index=0)
+
+    def test_insert_receiver_flag_when_collapsed_expect_broadcast(self):
+        flag_list = FlagList(flags=[FlagElement(array=np.zeros((1, 1, 3)))])
+        flag_list.insert_receiver_flag(flag=FlagElement(array=np.ones((2, 3, 1))), i_receiver=1, index=0)
+        self.assertTupleEqual((2, 3, 3), flag_list.shape)
+        self.assertTrue(flag_list.array[0, :, :, 1].all())
+        self.assertFalse(flag_list.array[0, :, :, [0, 2]].any())
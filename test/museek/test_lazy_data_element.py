@@ -0,0 +1,102 @@
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from museek.data_element import DataElement
+from museek.factory.data_element_factory import FlagElementFactory
+from museek.flag_list import FlagList
+from museek.lazy_data_element import LazyDataElement
+
+
+class TestLazyDataElement(unittest.TestCase):
+
+    def setUp(self):
+        self.shape = (5, 4, 3)
+        self.visibility = DataElement(array=np.arange(60, dtype=np.float32).reshape(self.shape) + 1)
+        self.gain_solution = DataElement(array=np.full(self.shape, 2., dtype=np.float32))
+        self.epsilon = np.linspace(0, 1, 4).reshape((1, 4, 1))
+        self.lazy = LazyDataElement.from_data_element(data_element=self.visibility, chunk_size=2)
+        self.expect = self.visibility.array / self.gain_solution.array / (1 + self.epsilon)
+        self.flags = FlagList.from_array(array=np.arange(60).reshape(self.shape) % 4 == 0,
+                                         element_factory=FlagElementFactory())
+
+    def test_init_when_chunk_size_not_positive_expect_raise(self):
+        self.assertRaises(ValueError, LazyDataElement, expression='{0}', operands=[np.ones(self.shape)], chunk_size=0)
+
+    def test_init_when_no_array_expect_raise(self):
+        self.assertRaises(ValueError, LazyDataElement, expression='{0}', operands=[1.])
+
+    def test_init_when_not_broadcastable_expect_raise(self):
+        self.assertRaises(ValueError, LazyDataElement, expression='({0} + {1})',
+                          operands=[np.ones(self.shape), np.ones((5, 2, 3))])
+
+    def test_from_data_element_expect_no_copy(self):
+        self.assertIs(self.visibility.array, self.lazy.operands[0])
+
+    def test_arithmetic_expect_expression(self):
+        lazy = self.lazy / self.gain_solution / (1 + self.epsilon)
+        self.assertIsInstance(lazy, LazyDataElement)
+        self.assertEqual('(({0} / {1}) / {2})', lazy.expression)
+        self.assertTupleEqual(self.shape, lazy.shape)
+        self.assertEqual(2, lazy.chunk_size)
+
+    def test_reflected_arithmetic(self):
+        lazy = 2 * self.lazy - self.visibility
+        self.assertIsInstance(self.visibility * self.lazy, LazyDataElement)
+        self.assertIsInstance(np.ones(self.shape) + self.lazy, LazyDataElement)
+        np.testing.assert_array_equal(self.visibility.array, lazy.array)
+
+    def test_array(self):
+        lazy = self.lazy / self.gain_solution / (1 + self.epsilon)
+        np.testing.assert_allclose(self.expect, lazy.array)
+
+    def test_evaluate_when_out_is_operand(self):
+        lazy = self.lazy / (1 + self.epsilon)
+        expect = self.visibility.array / (1 + self.epsilon)
+        result = lazy.evaluate(out=self.visibility)
+        self.assertIs(self.visibility, result)
+        np.testing.assert_allclose(expect, self.visibility.array, rtol=1e-6)
+
+    def test_evaluate_when_out_wrong_shape_expect_raise(self):
+        self.assertRaises(ValueError, self.lazy.evaluate, out=np.zeros((5, 4, 1)))
+
+    @patch.object(LazyDataElement, '_evaluate_chunk')
+    def test_evaluate_expect_chunks(self, mock_evaluate_chunk):
+        self.lazy.evaluate()
+        self.assertListEqual([slice(0, 2), slice(2, 4), slice(4, 6)],
+                             [call.kwargs['time_slice'] for call in mock_evaluate_chunk.call_args_list])
+
+    def test_evaluate_when_many_operands(self):
+        lazy = self.lazy
+        for i in range(40):
+            lazy = lazy + i
+        np.testing.assert_allclose(self.visibility.array + sum(range(40)), lazy.array)
+
+    def test_sum(self):
+        lazy = self.lazy / self.gain_solution / (1 + self.epsilon)
+        for axis in [0, 1, 2, (0, 1), (1, 2)]:
+            np.testing.assert_allclose(self.expect.sum(axis=axis, keepdims=True), lazy.sum(axis=axis).array)
+
+    def test_mean(self):
+        lazy = self.lazy / self.gain_solution / (1 + self.epsilon)
+        for axis in [0, 2, (0, 1)]:
+            np.testing.assert_allclose(self.expect.mean(axis=axis, keepdims=True), lazy.mean(axis=axis).array)
+
+    def test_mean_when_flags(self):
+        lazy = self.lazy / self.gain_solution / (1 + self.epsilon)
+        masked = np.ma.masked_array(self.expect, self.flags.combine().array)
+        for axis in [0, 2]:
+            np.testing.assert_allclose(masked.mean(axis=axis, keepdims=True),
+                                       lazy.mean(axis=axis, flags=self.flags).array)
+
+    def test_mean_when_all_flagged_expect_masked(self):
+        flags = FlagList.from_array(array=np.ones(self.shape, dtype=bool), element_factory=FlagElementFactory())
+        mean = self.lazy.mean(axis=0, flags=flags).array
+        self.assertTrue(mean.mask.all())
+
+    def test_ufunc_expect_compiled_once(self):
+        (self.lazy * 2.).array
+        (self.lazy * 3.).array
+        self.assertIn('({0} * {1})', LazyDataElement._compiled_expressions)
+        self.assertIs(LazyDataElement._compiled_expressions['({0} * {1})'], (self.lazy * 4.)._ufunc())
@@ -1,9 +1,19 @@
+import copy
 import itertools
+import os
+import shutil
 import unittest
+from concurrent.futures import Future
 from unittest.mock import patch, Mock, MagicMock, call, PropertyMock
 
+import dask.array as da
 import numpy as np
+from katdal.lazy_indexer import DaskLazyIndexer
 
+from museek.cache.visibility_cache import VisibilityCache
+from museek.dask_data_element import DaskDataElement
+from museek.data_element import DataElement
+from museek.factory.data_element_factory import DataElementFactory, FlagElementFactory
 from museek.flag_list import FlagList
 from museek.receiver import Receiver, Polarisation
 from museek.time_ordered_data import TimeOrderedData, ScanStateEnum, ScanTuple
@@ -37,6 +47,7 @@ class TestTimeOrderedData(unittest.TestCase):
                                                  receivers=self.mock_receiver_list,
                                                  token=None,
                                                  data_folder=mock_data_folder)
+        self.time_ordered_data._cache_manager = MagicMock()
 
     def test_init(self):
         self.mock_katdal_data.select.assert_called_once_with(
@@ -104,6 +115,100 @@ class TestTimeOrderedData(unittest.TestCase):
         self.assertIsNone(self.time_ordered_data.flags)
         self.assertIsNone(self.time_ordered_data.weights)
 
+    @patch.object(FlagList, 'from_array')
+    @patch.object(TimeOrderedData, '_visibility_flags_weights')
+    def test_load_visibility_flags_weights_when_cache_exists_expect_pinned_until_deleted(
+            self,
+            mock_visibility_flags_weights,
+            mock_from_array
+    ):
+        mock_visibility_flags_weights.return_value = (Mock(), Mock(), Mock())
+        self.time_ordered_data._visibility_cache = Mock(exists=Mock(return_value=True))
+        self.time_ordered_data.load_visibility_flags_weights()
+        mock_cache_manager = self.time_ordered_data._cache_manager
+        mock_cache_manager.pin.assert_called_once_with(name=self.time_ordered_data._visibility_cache_name)
+        self.assertIsNone(self.time_ordered_data.__getstate__()['_pinned_cache_name'])
+        mock_cache_manager.unpin.assert_not_called()
+        self.time_ordered_data.delete_visibility_flags_weights()
+        mock_cache_manager.unpin.assert_called_once_with(name=self.time_ordered_data._visibility_cache_name)
+        self.time_ordered_data.delete_visibility_flags_weights()
+        mock_cache_manager.unpin.assert_called_once()
+
+    @patch.object(FlagList, 'from_array')
+    @patch.object(TimeOrderedData, '_visibility_flags_weights')
+    def test_load_visibility_flags_weights_when_no_cache_expect_not_pinned(self,
+                                                                           mock_visibility_flags_weights,
+                                                                           mock_from_array):
+        mock_visibility_flags_weights.return_value = (Mock(), Mock(), Mock())
+        self.time_ordered_data._visibility_cache = Mock(exists=Mock(return_value=False))
+        self.time_ordered_data.load_visibility_flags_weights()
+        self.time_ordered_data._cache_manager.pin.assert_not_called()
+
+    def _set_mock_elements_for_iter_chunks(self, n_dumps: int):
+        self.time_ordered_data.shape = (n_dumps, 2, 3)
+        self.time_ordered_data.receivers = self.mock_receiver_list
+        for name in ['timestamps', 'azimuth', 'elevation', 'right_ascension', 'declination']:
+            setattr(self.time_ordered_data, name, DataElement(array=np.arange(n_dumps)[:, np.newaxis, np.newaxis]))
+
+    def test_iter_chunks_when_loaded(self):
+        self._set_mock_elements_for_iter_chunks(n_dumps=5)
+        visibility = np.arange(30).reshape((5, 2, 3))
+        self.time_ordered_data.visibility = DataElement(array=visibility)
+        self.time_ordered_data.flags = FlagList.from_array(array=visibility % 2 == 0,
+                                                           element_factory=FlagElementFactory())
+        self.time_ordered_data.weights = DataElement(array=visibility * 2)
+        chunks = list(self.time_ordered_data.iter_chunks(n_dumps=2))
+        self.assertListEqual([range(0, 2), range(2, 4), range(4, 5)], [chunk.dumps for chunk in chunks])
+        for chunk in chunks:
+            dumps = slice(chunk.dumps.start, chunk.dumps.stop)
+            np.testing.assert_array_equal(visibility[dumps], chunk.visibility.array)
+            np.testing.assert_array_equal(visibility[dumps] % 2 == 0, chunk.flags.combine().array)
+            np.testing.assert_array_equal(visibility[dumps] * 2, chunk.weights.array)
+            np.testing.assert_array_equal(np.arange(5)[dumps], chunk.timestamps.squeeze)
+            np.testing.assert_array_equal(np.arange(5)[dumps], chunk.declination.squeeze)
+
+    def test_iter_chunks_when_overlap(self):
+        self._set_mock_elements_for_iter_chunks(n_dumps=5)
+        self.time_ordered_data.visibility = DataElement(array=np.zeros((5, 2, 3)))
+        self.time_ordered_data.flags = FlagList.from_array(array=np.zeros((5, 2, 3), dtype=bool),
+                                                           element_factory=FlagElementFactory())
+        self.time_ordered_data.weights = DataElement(array=np.zeros((5, 2, 3)))
+        chunks = list(self.time_ordered_data.iter_chunks(n_dumps=3, overlap=1))
+        self.assertListEqual([range(0, 3), range(2, 5)], [chunk.dumps for chunk in chunks])
+
+    def test_iter_chunks_when_overlap_too_large_expect_raise(self):
+        self.assertRaises(ValueError, next, self.time_ordered_data.iter_chunks(n_dumps=3, overlap=3))
+
+    def test_iter_chunks_from_cache(self):
+        cache_directory = './test/museek/visibility_cache/'
+        self.addCleanup(shutil.rmtree, cache_directory, ignore_errors=True)
+        self._set_mock_elements_for_iter_chunks(n_dumps=3)
+        self.time_ordered_data._selected_dumps = [1, 2, 4]
+        visibility_cache = VisibilityCache(cache_directory=cache_directory)
+        visibility = np.arange(30.).reshape((5, 2, 3))
+        visibility_cache.store(visibility=visibility,
+                               flags=np.zeros((1, 5, 2, 3), dtype=bool),
+                               weights=visibility,
+                               receiver_names=['m001h', 'm000v', 'm000h'])
+        self.time_ordered_data._visibility_cache = visibility_cache
+        chunks = list(self.time_ordered_data.iter_chunks(n_dumps=2))
+        np.testing.assert_array_equal(visibility[[1, 2]][:, :, [2, 1, 0]], chunks[0].visibility.array)
+        np.testing.assert_array_equal(visibility[[4]][:, :, [2, 1, 0]], chunks[1].weights.array)
+
+    @patch.object(TimeOrderedData, '_open_selected_data')
+    def test_iter_chunks_from_katdal(self, mock_open_selected_data):
+        self._set_mock_elements_for_iter_chunks(n_dumps=3)
+        self.time_ordered_data._visibility_cache = MagicMock(contains=Mock(return_value=False))
+        visibility = np.arange(18.).reshape((3, 2, 3))
+        mock_open_selected_data.return_value = MagicMock(vis=DaskLazyIndexer(da.from_array(visibility + 1j)),
+                                                         flags=DaskLazyIndexer(da.zeros((3, 2, 3), dtype=bool)),
+                                                         weights=DaskLazyIndexer(da.from_array(visibility)))
+        chunks = list(self.time_ordered_data.iter_chunks(n_dumps=2))
+        mock_open_selected_data.assert_called_once_with()
+        np.testing.assert_array_equal(visibility[:2], chunks[0].visibility.array)
+        np.testing.assert_array_equal(visibility[2:], chunks[1].weights.array)
+        self.assertTupleEqual((1, 1, 2, 3), chunks[1].flags.array.shape)
+
     def test_antenna(self):
         mock_receiver = MagicMock()
         mock_antenna_name_list = MagicMock()
@@ -196,21 +301,20 @@ class TestTimeOrderedData(unittest.TestCase):
         self.assertEqual(expect, self.time_ordered_data.humidity)
         self.assertEqual(expect, self.time_ordered_data.pressure)
 
-    @patch.object(TimeOrderedData, '_select')
-    @patch.object(TimeOrderedData, '_get_data')
-    def test_set_data_elements_from_katdal_when_data_is_none(self, mock_get_data, mock_select):
+    @patch.object(TimeOrderedData, '_open_selected_data')
+    def test_set_data_elements_from_katdal_when_data_is_none(self, mock_open_selected_data):
         mock_scan_state = Mock()
         self.time_ordered_data._set_data_elements_from_katdal(scan_state=mock_scan_state, data=None)
         self.assertEqual(self.time_ordered_data.scan_state, mock_scan_state)
-        mock_get_data.assert_called_once()
-        mock_select.assert_called_once_with(data=mock_get_data.return_value)
+        mock_open_selected_data.assert_called_once_with()
 
-    @patch.object(FlagList, 'from_array')
-    def test_set_data_elements_from_self(self, mock_from_array):
+    def test_set_data_elements_from_self(self):
         mock_scan_state = Mock()
-        self.time_ordered_data.visibility = Mock(array=1)
-        self.time_ordered_data.flags = Mock(array=1)
-        self.time_ordered_data.weights = Mock(array=1)
+        mock_visibility, mock_flags, mock_weights = Mock(), Mock(), Mock()
+        self.time_ordered_data.visibility = mock_visibility
+        self.time_ordered_data.flags = mock_flags
+        self.time_ordered_data.weights = mock_weights
+        self.time_ordered_data._dumps = Mock(return_value=[1, 2])
         self.time_ordered_data._set_data_elements_from_self(scan_state=mock_scan_state)
         self.assertEqual(self.time_ordered_data.scan_state, mock_scan_state)
         self.assertEqual(mock_scan_state.factory(), self.time_ordered_data._element_factory)
@@ -225,15 +329,109 @@ class TestTimeOrderedData(unittest.TestCase):
         self.assertEqual(expect, self.time_ordered_data.temperature)
         self.assertEqual(expect, self.time_ordered_data.humidity)
         self.assertEqual(expect, self.time_ordered_data.pressure)
-        self.assertEqual(expect, self.time_ordered_data.visibility)
-        self.assertEqual(expect, self.time_ordered_data.weights)
-        self.assertEqual(mock_from_array.return_value, self.time_ordered_data.flags)
-        mock_from_array.assert_called_once()
+        self.assertEqual(mock_visibility.get.return_value, self.time_ordered_data.visibility)
+        self.assertEqual(mock_weights.get.return_value, self.time_ordered_data.weights)
+        self.assertEqual(mock_flags.get.return_value, self.time_ordered_data.flags)
+        for mock_element in [mock_visibility, mock_flags, mock_weights]:
+            mock_element.get.assert_called_once_with(time=slice(1, 3))
+
+    def _set_elements_for_split(self):
+        self.time_ordered_data._scan_tuple_list = [
+            ScanTuple(dumps=[0, 1], state=ScanStateEnum.SCAN, index=0, target=None),
+            ScanTuple(dumps=[2], state=ScanStateEnum.TRACK, index=1, target=None),
+            ScanTuple(dumps=[3], state=ScanStateEnum.SCAN, index=2, target=None),
+        ]
+        self.time_ordered_data._selected_dumps = None
+        self.time_ordered_data.scan_state = None
+        self.time_ordered_data._element_factory = DataElementFactory()
+        self.time_ordered_data._flag_element_factory = FlagElementFactory()
+        element = DataElement(array=np.arange(4)[:, np.newaxis, np.newaxis])
+        for name in ['timestamps', 'timestamp_dates', 'frequencies', 'azimuth', 'elevation', 'declination',
+                     'right_ascension', 'temperature', 'humidity', 'pressure']:
+            setattr(self.time_ordered_data, name, element)
+        self.time_ordered_data.original_timestamps = None
+        self.time_ordered_data.visibility = DataElement(array=np.arange(24.).reshape((4, 2, 3)))
+        self.time_ordered_data.flags = FlagList.from_array(array=np.arange(24).reshape((4, 2, 3)) % 2 == 0,
+                                                           element_factory=FlagElementFactory())
+        self.time_ordered_data.weights = DataElement(array=np.ones((4, 2, 3)))
+
+    def test_split(self):
+        self._set_elements_for_split()
+        scan_data = self.time_ordered_data.split(scan_state=ScanStateEnum.SCAN)
+        self.assertIsNot(self.time_ordered_data, scan_data)
+        self.assertEqual(ScanStateEnum.SCAN, scan_data.scan_state)
+        self.assertIsNone(self.time_ordered_data.scan_state)
+        self.assertIsNot(self.time_ordered_data.receivers, scan_data.receivers)
+        self.assertListEqual(self.time_ordered_data.receivers, scan_data.receivers)
+        self.assertIsNot(self.time_ordered_data._scan_tuple_list, scan_data._scan_tuple_list)
+        self.assertIs(self.time_ordered_data._visibility_cache, scan_data._visibility_cache)
+        np.testing.assert_array_equal([[[0]], [[1]], [[3]]], scan_data.timestamps.array)
+        np.testing.assert_array_equal(np.arange(24.).reshape((4, 2, 3))[[0, 1, 3]], scan_data.visibility.array)
+        np.testing.assert_array_equal((np.arange(24).reshape((4, 2, 3)) % 2 == 0)[np.newaxis, [0, 1, 3]],
+                                      scan_data.flags.array)
+        self.assertTupleEqual((3, 2, 3), scan_data.weights.shape)
+        self.assertTupleEqual((4, 2, 3), self.time_ordered_data.visibility.shape)
+
+    def test_split_expect_visibility_flags_weights_indexed_when_accessed(self):
+        self._set_elements_for_split()
+        track_data = self.time_ordered_data.split(scan_state=ScanStateEnum.TRACK)
+        self.assertIsNone(track_data._visibility)
+        self.assertIs(self.time_ordered_data.visibility, track_data._unsplit_visibility_flags_weights[0])
+        np.testing.assert_array_equal(np.arange(24.).reshape((4, 2, 3))[[2]], track_data.visibility.array)
+        self.assertIsNone(track_data._unsplit_visibility_flags_weights)
+
+    def test_split_when_dumps_contiguous_expect_writable_copies(self):
+        self._set_elements_for_split()
+        self.time_ordered_data._scan_tuple_list[2] = ScanTuple(dumps=[3], state=ScanStateEnum.TRACK, index=2,
+                                                               target=None)
+        track_data = self.time_ordered_data.split(scan_state=ScanStateEnum.TRACK)
+        np.testing.assert_array_equal(np.arange(24.).reshape((4, 2, 3))[2:], track_data.visibility.array)
+        self.assertFalse(np.shares_memory(self.time_ordered_data.visibility.array, track_data.visibility.array))
+        self.assertFalse(np.shares_memory(self.time_ordered_data.weights.array, track_data.weights.array))
+        track_data.visibility *= 2
+        track_data.weights.array[...] = 0
+        np.testing.assert_array_equal(np.arange(24.).reshape((4, 2, 3))[2:] * 2, track_data.visibility.array)
+        np.testing.assert_array_equal(np.arange(24.).reshape((4, 2, 3)), self.time_ordered_data.visibility.array)
+        self.assertTrue(self.time_ordered_data.weights.array.any())
+
+    def test_split_when_dumps_not_contiguous_expect_copies(self):
+        self._set_elements_for_split()
+        scan_data = self.time_ordered_data.split(scan_state=ScanStateEnum.SCAN)
+        self.assertFalse(np.shares_memory(self.time_ordered_data.visibility.array, scan_data.visibility.array))
+
+    def test_split_when_receivers_changed_expect_self_unchanged(self):
+        self._set_elements_for_split()
+        scan_data = self.time_ordered_data.split(scan_state=ScanStateEnum.SCAN)
+        scan_data.receivers.pop()
+        self.assertEqual(3, len(self.time_ordered_data.receivers))
+
+    def test_split_when_visibility_not_loaded(self):
+        self._set_elements_for_split()
+        self.time_ordered_data.delete_visibility_flags_weights()
+        scan_data = self.time_ordered_data.split(scan_state=ScanStateEnum.SCAN)
+        self.assertIsNone(scan_data.visibility)
+        self.assertIsNone(scan_data.flags)
+        self.assertIsNone(scan_data.weights)
+
+    def test_setstate_when_state_has_public_visibility_flags_weights(self):
+        state = self.time_ordered_data.__getstate__()
+        for name in ['visibility', 'flags', 'weights']:
+            state[name] = state.pop(f'_{name}')
+        state.pop('_unsplit_visibility_flags_weights')
+        state['visibility'] = 1
+        time_ordered_data = TimeOrderedData.__new__(TimeOrderedData)
+        time_ordered_data.__setstate__(state)
+        self.assertEqual(1, time_ordered_data.visibility)
+        self.assertIsNone(time_ordered_data.flags)
 
+    @patch('museek.time_ordered_data.CacheManager')
+    @patch('museek.time_ordered_data.MetadataCache')
     @patch.object(TimeOrderedData, 'set_data_elements')
     @patch.object(TimeOrderedData, '_select')
     @patch('museek.time_ordered_data.katdal.open')
-    def test_get_data_when_data_folder(self, mock_open, mock_select, mock_set_data_elements):
+    def test_get_data_when_data_folder(self, mock_open, mock_select, mock_set_data_elements, mock_metadata_cache,
+                                       mock_cache_manager):
+        mock_metadata_cache.return_value.exists.return_value = False
         block_name = 'block'
         token = None
         data_folder = 'folder'
@@ -247,10 +445,14 @@ class TestTimeOrderedData(unittest.TestCase):
         mock_select.assert_called_once()
         mock_set_data_elements.assert_called_once()
 
+    @patch('museek.time_ordered_data.CacheManager')
+    @patch('museek.time_ordered_data.MetadataCache')
     @patch.object(TimeOrderedData, 'set_data_elements')
     @patch.object(TimeOrderedData, '_select')
     @patch('museek.time_ordered_data.katdal.open')
-    def test_get_data_when_token(self, mock_open, mock_select, mock_set_data_elements):
+    def test_get_data_when_token(self, mock_open, mock_select, mock_set_data_elements, mock_metadata_cache,
+                                 mock_cache_manager):
+        mock_metadata_cache.return_value.exists.return_value = False
         block_name = 'block'
         token = 'token'
         mock_receiver_list = [Mock(), Mock()]
@@ -265,6 +467,46 @@ class TestTimeOrderedData(unittest.TestCase):
         mock_select.assert_called_once()
         mock_set_data_elements.assert_called_once()
 
+    @patch('museek.time_ordered_data.katdal.open')
+    def test_get_data_when_metadata_cache_exists(self, mock_open):
+        mock_metadata_cache = MagicMock()
+        self.time_ordered_data._metadata_cache = mock_metadata_cache
+        self.time_ordered_data._token = 'token'
+        data = self.time_ordered_data._get_data()
+        mock_open.assert_not_called()
+        self.assertEqual(mock_metadata_cache.load.return_value, data)
+
+    @patch('museek.time_ordered_data.katdal.open')
+    def test_get_data_when_metadata_cache_exists_and_force_load_from_correlator_data(self, mock_open):
+        mock_metadata_cache = MagicMock()
+        self.time_ordered_data._metadata_cache = mock_metadata_cache
+        self.time_ordered_data._token = 'token'
+        self.time_ordered_data._force_load_from_correlator_data = True
+        data = self.time_ordered_data._get_data()
+        mock_metadata_cache.load.assert_not_called()
+        mock_metadata_cache.store.assert_called_once_with(data=mock_open.return_value)
+        self.assertEqual(mock_open.return_value, data)
+
+    @patch('museek.time_ordered_data.katdal.open')
+    def test_get_data_when_metadata_cache_missing(self, mock_open):
+        mock_metadata_cache = MagicMock()
+        mock_metadata_cache.exists.return_value = False
+        self.time_ordered_data._metadata_cache = mock_metadata_cache
+        self.time_ordered_data._token = 'token'
+        data = self.time_ordered_data._get_data()
+        mock_metadata_cache.store.assert_called_once_with(data=mock_open.return_value)
+        self.assertEqual(mock_open.return_value, data)
+
+    @patch('museek.time_ordered_data.katdal.open')
+    def test_get_data_when_metadata_cache_missing_and_not_do_create_cache(self, mock_open):
+        mock_metadata_cache = MagicMock()
+        mock_metadata_cache.exists.return_value = False
+        self.time_ordered_data._metadata_cache = mock_metadata_cache
+        self.time_ordered_data._token = 'token'
+        self.time_ordered_data._do_create_cache = False
+        self.time_ordered_data._get_data()
+        mock_metadata_cache.store.assert_not_called()
+
     def test_dumps_of_scan_state(self):
         mock_scan_state = Mock(state='2')
         mock_scan_tuple_list = [Mock(state='mock'),
@@ -279,6 +521,24 @@ class TestTimeOrderedData(unittest.TestCase):
     def test_dumps_of_scan_state_when_scan_state_is_none(self):
         self.assertIsNone(self.time_ordered_data._dumps_of_scan_state())
 
+    def test_dumps_of_scan_states(self):
+        self.time_ordered_data._scan_tuple_list = [Mock(state=ScanStateEnum.SLEW, dumps=[0, 1]),
+                                                   Mock(state=ScanStateEnum.TRACK, dumps=[5, 6]),
+                                                   Mock(state=ScanStateEnum.SCAN, dumps=[2, 3, 4])]
+        dumps = self.time_ordered_data._dumps_of_scan_states(scan_states=[ScanStateEnum.SCAN, ScanStateEnum.TRACK])
+        self.assertListEqual([2, 3, 4, 5, 6], dumps)
+
+    def test_dumps_of_scan_states_when_none(self):
+        self.assertIsNone(self.time_ordered_data._dumps_of_scan_states(scan_states=None))
+
+    def test_dumps_when_dumps_selected(self):
+        self.time_ordered_data._scan_tuple_list = [Mock(state=ScanStateEnum.SLEW, dumps=[0, 1]),
+                                                   Mock(state=ScanStateEnum.TRACK, dumps=[5, 6]),
+                                                   Mock(state=ScanStateEnum.SCAN, dumps=[2, 3, 4])]
+        self.time_ordered_data._selected_dumps = [2, 3, 4, 5, 6]
+        self.time_ordered_data.scan_state = ScanStateEnum.TRACK
+        self.assertListEqual([3, 4], self.time_ordered_data._dumps())
+
     @patch.object(TimeOrderedData, '_dumps_of_scan_state')
     def test_dumps(self, mock_dumps_of_scan_state):
         self.time_ordered_data._dumps()
@@ -293,73 +553,371 @@ class TestTimeOrderedData(unittest.TestCase):
     def test_get_data_element_factory_when_scan_state_is_none(self, mock_factory):
         self.assertEqual(mock_factory(), self.time_ordered_data._get_data_element_factory())
 
-    @patch.object(TimeOrderedData, '_select')
-    @patch('museek.time_ordered_data.np')
-    @patch('museek.time_ordered_data.katdal')
-    @patch.object(TimeOrderedData, '_load_autocorrelation_visibility')
+    @patch.object(TimeOrderedData, '_open_selected_data')
+    @patch.object(TimeOrderedData, '_load_autocorrelation_visibility_to_cache_file')
     def test_visibility_flags_weights_when_force_load_from_correlator_data(
+            self,
+            mock_load_autocorrelation_visibility_to_cache_file,
+            mock_open_selected_data
+    ):
+        self.time_ordered_data._force_load_from_correlator_data = True
+        mock_load_autocorrelation_visibility_to_cache_file.return_value = (Mock(), Mock(), Mock())
+        visibility, flags, weights = self.time_ordered_data._visibility_flags_weights()
+        mock_open_selected_data.assert_called_once_with(receivers=self.time_ordered_data.receivers)
+        mock_load_autocorrelation_visibility_to_cache_file.assert_called_once_with(
+            data=mock_open_selected_data.return_value
+        )
+        self.assertEqual(mock_load_autocorrelation_visibility_to_cache_file.return_value[0].real, visibility)
+        self.assertEqual(mock_load_autocorrelation_visibility_to_cache_file.return_value[1], flags)
+        self.assertEqual(mock_load_autocorrelation_visibility_to_cache_file.return_value[2], weights)
+
+    @patch.object(TimeOrderedData, '_open_selected_data')
+    @patch.object(TimeOrderedData, '_load_autocorrelation_visibility_to_cache_file')
+    @patch.object(TimeOrderedData, '_load_autocorrelation_visibility')
+    def test_visibility_flags_weights_when_not_do_create_cache(
             self,
             mock_load_autocorrelation_visibility,
-            mock_katdal,
-            mock_np,
-            mock_select
+            mock_load_autocorrelation_visibility_to_cache_file,
+            mock_open_selected_data
     ):
         self.time_ordered_data._force_load_from_correlator_data = True
+        self.time_ordered_data._do_create_cache = False
+        self.time_ordered_data._visibility_cache = MagicMock(exists=Mock(return_value=False))
         mock_load_autocorrelation_visibility.return_value = (Mock(), Mock(), Mock())
         visibility, flags, weights = self.time_ordered_data._visibility_flags_weights()
-        mock_katdal.open.assert_called_once()
-        mock_np.savez_compressed.assert_called_once()
-        mock_select.assert_called_once()
+        mock_load_autocorrelation_visibility.assert_called_once_with(data=mock_open_selected_data.return_value)
+        mock_load_autocorrelation_visibility_to_cache_file.assert_not_called()
         self.assertEqual(mock_load_autocorrelation_visibility.return_value[0].real, visibility)
-        self.assertEqual(mock_load_autocorrelation_visibility.return_value[1], flags)
-        self.assertEqual(mock_load_autocorrelation_visibility.return_value[2], weights)
-
-    @patch('museek.time_ordered_data.DaskLazyIndexer')
-    def test_load_autocorrelation_visibility(self, mock_dask_lazy_indexer):
-        self.time_ordered_data.shape = (1, 1, 1)
-        visibility, flags, weights = self.time_ordered_data._load_autocorrelation_visibility(
-            data=self.mock_katdal_data
+
+    @patch.object(TimeOrderedData, '_open_selected_data')
+    @patch.object(TimeOrderedData, '_load_autocorrelation_visibility_to_cache_file')
+    @patch.object(TimeOrderedData, '_load_autocorrelation_visibility')
+    def test_visibility_flags_weights_when_not_do_create_cache_and_cache_exists_expect_cache_not_written(
+            self,
+            mock_load_autocorrelation_visibility,
+            mock_load_autocorrelation_visibility_to_cache_file,
+            mock_open_selected_data
+    ):
+        self.time_ordered_data._do_create_cache = False
+        self.time_ordered_data._visibility_cache = MagicMock(exists=Mock(return_value=True),
+                                                             missing_receiver_names=Mock(return_value=['m001h']))
+        mock_load_autocorrelation_visibility.return_value = (Mock(), Mock(), Mock())
+        self.time_ordered_data._visibility_flags_weights()
+        mock_load_autocorrelation_visibility.assert_called_once_with(data=mock_open_selected_data.return_value)
+        mock_load_autocorrelation_visibility_to_cache_file.assert_not_called()
+        self.assertFalse(self.time_ordered_data._can_write_cache())
+
+    @patch.object(TimeOrderedData, '_load_autocorrelation_visibility')
+    def test_visibility_flags_weights_when_cache_exists(self, mock_load_autocorrelation_visibility):
+        mock_visibility_cache = MagicMock()
+        mock_visibility_cache.missing_receiver_names.return_value = []
+        mock_visibility_cache.load.return_value = (Mock(), Mock(), Mock())
+        self.time_ordered_data._visibility_cache = mock_visibility_cache
+        visibility, flags, weights = self.time_ordered_data._visibility_flags_weights()
+        mock_load_autocorrelation_visibility.assert_not_called()
+        mock_visibility_cache.missing_receiver_names.assert_called_once_with(
+            receiver_names=['m000h', 'm000v', 'm001h']
         )
-        mock_dask_lazy_indexer.get.assert_called_once()
-        np.testing.assert_array_equal(np.asarray([[[0. + 0.j]]]), visibility)
-        np.testing.assert_array_equal(np.asarray([[[[0]]]]), flags)
-        np.testing.assert_array_equal(np.asarray([[[0]]]), weights)
-
-    @patch.object(np, 'asarray')
-    @patch.object(np, 'savez_compressed')
-    def test_visibility_flag_weights_to_cache_file(self, mock_savez_compressed, mock_asarray):
-        mock_visibility = Mock()
-        mock_flags = Mock()
-        mock_weights = Mock()
-        mock_correlator_products = Mock()
-        self.time_ordered_data._visibility_flag_weights_to_cache_file(visibility=mock_visibility,
-                                                                      flags=mock_flags,
-                                                                      weights=mock_weights,
-                                                                      correlator_products=mock_correlator_products)
-        mock_savez_compressed.assert_called_once_with(self.time_ordered_data._cache_file,
-                                                      visibility=mock_visibility,
-                                                      flags=mock_flags,
-                                                      weights=mock_weights,
-                                                      correlator_products=mock_asarray.return_value)
-        mock_asarray.assert_called_once_with(mock_correlator_products)
-
-    @patch.object(np, 'asarray')
-    @patch.object(np, 'savez_compressed')
-    def test_visibility_flag_weights_to_cache_file_when_scan_state_not_none(self, mock_savez_compressed, mock_asarray):
-        mock_visibility = Mock()
-        mock_flags = Mock()
-        mock_weights = Mock()
-        mock_correlator_products = Mock()
-        self.time_ordered_data.scan_state = Mock()
+        mock_visibility_cache.load.assert_called_once_with(receiver_names=['m000h', 'm000v', 'm001h'], dumps=None)
+        self.assertEqual(mock_visibility_cache.load.return_value[0].real, visibility)
+        self.assertEqual(mock_visibility_cache.load.return_value[1], flags)
+        self.assertEqual(mock_visibility_cache.load.return_value[2], weights)
+        self.time_ordered_data._cache_manager.record_hit.assert_called_once_with(
+            name=self.time_ordered_data._visibility_cache_name
+        )
+
+    def test_visibility_flags_weights_when_cache_exists_and_dumps_selected(self):
+        mock_visibility_cache = MagicMock()
+        mock_visibility_cache.missing_receiver_names.return_value = []
+        mock_visibility_cache.load.return_value = (Mock(), Mock(), Mock())
+        self.time_ordered_data._visibility_cache = mock_visibility_cache
+        self.time_ordered_data._selected_dumps = [2, 3, 7]
+        self.time_ordered_data._visibility_flags_weights()
+        mock_visibility_cache.load.assert_called_once_with(receiver_names=['m000h', 'm000v', 'm001h'],
+                                                           dumps=[2, 3, 7])
+
+    @patch.object(TimeOrderedData, '_open_selected_data')
+    @patch.object(TimeOrderedData, '_load_autocorrelation_visibility')
+    def test_visibility_flags_weights_when_dumps_selected_and_receivers_missing_in_cache(
+            self,
+            mock_load_autocorrelation_visibility,
+            mock_open_selected_data
+    ):
+        mock_visibility_cache = MagicMock()
+        mock_visibility_cache.missing_receiver_names.return_value = ['m000v']
+        self.time_ordered_data._visibility_cache = mock_visibility_cache
+        self.time_ordered_data._selected_dumps = [2, 3, 7]
+        mock_load_autocorrelation_visibility.return_value = (Mock(), Mock(), Mock())
+        self.time_ordered_data._visibility_flags_weights()
+        mock_load_autocorrelation_visibility.assert_called_once()
+        mock_visibility_cache.create_shards.assert_not_called()
+
+    def test_load_autocorrelation_visibility_to_cache_file_when_scan_states_selected(self):
+        mock_visibility_cache = MagicMock()
+        self.time_ordered_data._visibility_cache = mock_visibility_cache
+        self.time_ordered_data._selected_scan_states = [ScanStateEnum.SCAN]
         self.assertRaises(ValueError,
-                          self.time_ordered_data._visibility_flag_weights_to_cache_file,
-                          visibility=mock_visibility,
-                          flags=mock_flags,
-                          weights=mock_weights,
-                          correlator_products=mock_correlator_products)
+                          self.time_ordered_data._load_autocorrelation_visibility_to_cache_file,
+                          data=self.mock_katdal_data)
+        mock_visibility_cache.create_shards.assert_not_called()
+
+    @patch.object(TimeOrderedData, '_open_selected_data')
+    @patch.object(TimeOrderedData, '_load_autocorrelation_visibility_to_cache_file')
+    def test_visibility_flags_weights_when_receivers_missing_in_cache(self,
+                                                                     mock_load_autocorrelation_visibility_to_cache_file,
+                                                                     mock_open_selected_data):
+        mock_visibility_cache = MagicMock()
+        mock_visibility_cache.missing_receiver_names.return_value = ['m000v']
+        self.time_ordered_data._visibility_cache = mock_visibility_cache
+        mock_load_autocorrelation_visibility_to_cache_file.return_value = (Mock(), Mock(), Mock())
+        self.time_ordered_data._visibility_flags_weights()
+        mock_visibility_cache.load.assert_not_called()
+        mock_open_selected_data.assert_called_once_with(receivers=[self.time_ordered_data.receivers[1]])
+        mock_load_autocorrelation_visibility_to_cache_file.assert_called_once_with(
+            data=mock_open_selected_data.return_value
+        )
+        mock_cache_manager = self.time_ordered_data._cache_manager
+        mock_cache_manager.record_miss.assert_called_once_with(name=self.time_ordered_data._visibility_cache_name)
+        mock_cache_manager.pinned.assert_called_once_with(names=[self.time_ordered_data._visibility_cache_name,
+                                                                 self.time_ordered_data._metadata_cache_name])
+        mock_cache_manager.enforce_budget.assert_called_once()
+
+    def _mock_dask_data(self, shape: tuple[int, int, int], chunks: tuple[int, int, int]):
+        visibility = np.arange(np.prod(shape)).reshape(shape) + 1j
+        flags = np.arange(np.prod(shape)).reshape(shape) % 3 == 0
+        weights = np.arange(np.prod(shape)).reshape(shape) / 2
+        mock_data = MagicMock(
+            corr_products=np.asarray([['m000h', 'm000h'], ['m000v', 'm000v'], ['m001h', 'm001h']]),
+            vis=DaskLazyIndexer(da.from_array(visibility, chunks=chunks)),
+            flags=DaskLazyIndexer(da.from_array(flags, chunks=chunks)),
+            weights=DaskLazyIndexer(da.from_array(weights, chunks=chunks))
+        )
+        return mock_data, visibility, flags, weights
+
+    def test_load_autocorrelation_visibility(self):
+        self.time_ordered_data.receivers = self.mock_receiver_list
+        self.time_ordered_data.shape = (5, 3, 3)
+        mock_data, expect_visibility, expect_flags, expect_weights = self._mock_dask_data(shape=(5, 3, 3),
+                                                                                          chunks=(2, 3, 3))
+        visibility, flags, weights = self.time_ordered_data._load_autocorrelation_visibility(data=mock_data)
+        np.testing.assert_array_equal(expect_visibility.real, visibility)
+        self.assertEqual(np.float32, visibility.dtype)
+        np.testing.assert_array_equal(expect_flags[np.newaxis], flags)
+        np.testing.assert_array_equal(expect_weights, weights)
+
+    def test_load_autocorrelation_visibility_when_batches_and_progress_callback(self):
+        mock_callback = MagicMock()
+        self.time_ordered_data.receivers = self.mock_receiver_list
+        self.time_ordered_data.shape = (5, 3, 3)
+        self.time_ordered_data._loader_threads = 2
+        self.time_ordered_data._loader_dump_batch_size = 3
+        self.time_ordered_data._loader_progress_callback = mock_callback
+        mock_data, expect_visibility, expect_flags, expect_weights = self._mock_dask_data(shape=(5, 3, 3),
+                                                                                          chunks=(2, 3, 3))
+        visibility, flags, weights = self.time_ordered_data._load_autocorrelation_visibility(data=mock_data)
+        np.testing.assert_array_equal(expect_visibility.real, visibility)
+        np.testing.assert_array_equal(expect_flags[np.newaxis], flags)
+        np.testing.assert_array_equal(expect_weights, weights)
+        self.assertListEqual([(4, 5), (5, 5)], [call.args[:2] for call in mock_callback.call_args_list])
+        self.assertTrue(all(call.args[2] > 0 for call in mock_callback.call_args_list))
+
+    @patch.object(TimeOrderedData, '_open_selected_data')
+    def test_dask_visibility_flags_weights(self, mock_open_selected_data):
+        mock_data, expect_visibility, expect_flags, expect_weights = self._mock_dask_data(shape=(4, 3, 3),
+                                                                                          chunks=(2, 3, 3))
+        mock_open_selected_data.return_value = mock_data
+        self.time_ordered_data._scan_tuple_list = [ScanTuple(dumps=[0, 2], state=ScanStateEnum.SCAN, index=0,
+                                                             target=None)]
+        self.time_ordered_data._selected_dumps = None
+        self.time_ordered_data.scan_state = ScanStateEnum.SCAN
+        visibility, flags, weights = self.time_ordered_data.dask_visibility_flags_weights()
+        self.assertIsInstance(visibility, DaskDataElement)
+        np.testing.assert_array_equal(expect_visibility.real[[0, 2]], visibility.compute().array)
+        np.testing.assert_array_equal(expect_flags[[0, 2]], flags.compute().array)
+        np.testing.assert_array_equal(expect_weights[[0, 2]], weights.compute().array)
+
+    def test_dask_config(self):
+        self.assertDictEqual({}, self.time_ordered_data._dask_config())
+        self.time_ordered_data._loader_threads = 4
+        self.assertDictEqual({'scheduler': 'threads', 'num_workers': 4}, self.time_ordered_data._dask_config())
+
+    def test_dump_batches(self):
+        self.assertListEqual([(0, 4), (4, 8), (8, 9)], TimeOrderedData._dump_batches(chunks=(2, 2, 2, 2, 1),
+                                                                                     batch_size=3))
+
+    def test_dump_batches_when_batch_size_smaller_than_chunks(self):
+        self.assertListEqual([(0, 5), (5, 7)], TimeOrderedData._dump_batches(chunks=(5, 2), batch_size=1))
+
+    def test_dump_batches_when_batch_size_none(self):
+        self.assertListEqual([(0, 9)], TimeOrderedData._dump_batches(chunks=(5, 4), batch_size=None))
+
+    def test_dump_batches_when_batch_size_not_positive_expect_raise(self):
+        self.assertRaises(ValueError, TimeOrderedData._dump_batches, chunks=(5, 4), batch_size=0)
+
+    def test_load_autocorrelation_visibility_to_cache_file(self):
+        cache_directory = './test/museek/visibility_cache/'
+        self.addCleanup(shutil.rmtree, cache_directory, ignore_errors=True)
+        self.time_ordered_data._visibility_cache = VisibilityCache(cache_directory=cache_directory)
+        self.time_ordered_data.receivers = self.mock_receiver_list
+        self.time_ordered_data.shape = (4, 3, 3)
+        visibility = np.arange(36).reshape(self.time_ordered_data.shape) + 1j
+        flags = np.arange(36).reshape(self.time_ordered_data.shape) % 3 == 0
+        weights = np.arange(36).reshape(self.time_ordered_data.shape) / 2
+        mock_data = MagicMock(
+            corr_products=np.asarray([['m000h', 'm000h'], ['m000v', 'm000v'], ['m001h', 'm001h']]),
+            vis=DaskLazyIndexer(da.from_array(visibility, chunks=(2, 3, 3))),
+            flags=DaskLazyIndexer(da.from_array(flags, chunks=(2, 3, 3))),
+            weights=DaskLazyIndexer(da.from_array(weights, chunks=(2, 3, 3)))
+        )
+        loaded_visibility, loaded_flags, loaded_weights = \
+            self.time_ordered_data._load_autocorrelation_visibility_to_cache_file(data=mock_data)
+        np.testing.assert_array_equal(visibility.real, loaded_visibility)
+        np.testing.assert_array_equal(flags[np.newaxis], loaded_flags)
+        np.testing.assert_array_equal(weights, loaded_weights)
+        self.assertEqual(np.float32, loaded_visibility.dtype)
+        self.assertEqual(np.float64, loaded_weights.dtype)
+        self.assertListEqual(['m000h', 'm000v', 'm001h'],
+                             self.time_ordered_data._visibility_cache.receiver_names())
+        self.assertListEqual([np.dtype(np.float32), np.dtype(bool), np.dtype(np.float64)],
+                             self.time_ordered_data._visibility_cache.dtypes())
+
+    def _set_mock_data_for_background_cache_write(self):
+        cache_directory = './test/museek/visibility_cache/'
+        self.addCleanup(shutil.rmtree, cache_directory, ignore_errors=True)
+        self.time_ordered_data._visibility_cache = VisibilityCache(cache_directory=cache_directory)
+        self.time_ordered_data.receivers = self.mock_receiver_list
+        self.time_ordered_data.shape = (4, 3, 3)
+        visibility = np.arange(36.).reshape(self.time_ordered_data.shape)
+
+        def mock_data(receivers=None):
+            if receivers is None:
+                receivers = self.mock_receiver_list
+            indices = [self.mock_receiver_list.index(receiver) for receiver in receivers]
+            return MagicMock(
+                vis=DaskLazyIndexer(da.from_array(visibility[:, :, indices] + 1j, chunks=(2, 3, len(indices)))),
+                flags=DaskLazyIndexer(da.zeros((4, 3, len(indices)), dtype=bool)),
+                weights=DaskLazyIndexer(da.from_array(visibility[:, :, indices] / 2, chunks=(2, 3, len(indices)))),
+                corr_products=[(receiver.name, receiver.name) for receiver in receivers]
+            )
+
+        self.time_ordered_data._open_selected_data = Mock(side_effect=mock_data)
+        return visibility, mock_data()
+
+    def test_visibility_flags_weights_when_write_cache_in_background(self):
+        visibility, mock_data = self._set_mock_data_for_background_cache_write()
+        loaded_visibility, _, loaded_weights = self.time_ordered_data._visibility_flags_weights(
+            data=mock_data,
+            write_cache_in_background=True
+        )
+        self.assertNotIsInstance(loaded_visibility, np.memmap)
+        np.testing.assert_array_equal(visibility, loaded_visibility)
+        self.assertIn(self.time_ordered_data._cache_directory, TimeOrderedData._cache_writes)
+        self.time_ordered_data.wait_for_cache_write()
+        self.assertNotIn(self.time_ordered_data._cache_directory, TimeOrderedData._cache_writes)
+        self.time_ordered_data._open_selected_data.assert_not_called()
+        self.assertTrue(self.time_ordered_data._visibility_cache.contains(receiver_names=['m000h', 'm000v', 'm001h']))
+        cached_visibility, _, cached_weights = self.time_ordered_data._visibility_cache.load(
+            receiver_names=['m000h', 'm000v', 'm001h']
+        )
+        np.testing.assert_array_equal(visibility, cached_visibility)
+        np.testing.assert_array_equal(visibility / 2, cached_weights)
+        self.time_ordered_data._cache_manager.enforce_budget.assert_called_once()
+
+    def test_visibility_flags_weights_when_write_cache_in_background_expect_cache_independent_of_loaded_data(self):
+        visibility, mock_data = self._set_mock_data_for_background_cache_write()
+        loaded_visibility, _, _ = self.time_ordered_data._visibility_flags_weights(data=mock_data,
+                                                                                   write_cache_in_background=True)
+        loaded_visibility[:] = -1
+        self.time_ordered_data.wait_for_cache_write()
+        cached_visibility, _, _ = self.time_ordered_data._visibility_cache.load(
+            receiver_names=['m000h', 'm000v', 'm001h']
+        )
+        np.testing.assert_array_equal(visibility, cached_visibility)
+
+    def test_visibility_flags_weights_when_write_cache_in_background_and_receivers_cached(self):
+        visibility, mock_data = self._set_mock_data_for_background_cache_write()
+        self.time_ordered_data._visibility_cache.store(visibility=visibility[:, :, 1:].astype(np.float32),
+                                                       flags=np.zeros((1, 4, 3, 2), dtype=bool),
+                                                       weights=visibility[:, :, 1:] / 2,
+                                                       receiver_names=['m000v', 'm001h'])
+        shard_file = os.path.join(self.time_ordered_data._visibility_cache.cache_directory, 'm000v', 'visibility.npy')
+        modification_time = os.path.getmtime(shard_file)
+        self.time_ordered_data._visibility_flags_weights(data=mock_data, write_cache_in_background=True)
+        self.time_ordered_data.wait_for_cache_write()
+        cached_visibility, _, _ = self.time_ordered_data._visibility_cache.load(receiver_names=['m000h'])
+        np.testing.assert_array_equal(visibility[:, :, :1], cached_visibility)
+        self.assertEqual(modification_time, os.path.getmtime(shard_file))
+
+    def test_wait_for_cache_write_when_write_failed_expect_raise(self):
+        visibility, mock_data = self._set_mock_data_for_background_cache_write()
+        self.time_ordered_data._visibility_cache.add_to_index = Mock(side_effect=OSError)
+        self.time_ordered_data._visibility_flags_weights(data=mock_data, write_cache_in_background=True)
+        self.assertRaises(OSError, self.time_ordered_data.wait_for_cache_write)
+        self.assertNotIn(self.time_ordered_data._cache_directory, TimeOrderedData._cache_writes)
+
+    def test_visibility_flags_weights_when_write_pending_expect_copy_waits_before_reading_cache(self):
+        visibility, mock_data = self._set_mock_data_for_background_cache_write()
+        self.time_ordered_data._visibility_flags_weights(data=mock_data, write_cache_in_background=True)
+        copied = copy.copy(self.time_ordered_data)
+        copied._visibility_cache = Mock(missing_receiver_names=Mock(return_value=[]),
+                                        load=Mock(return_value=(Mock(), Mock(), Mock())))
+        future = TimeOrderedData._cache_writes[self.time_ordered_data._cache_directory]
+        copied._visibility_cache.missing_receiver_names.side_effect = lambda **kwargs: self.assertTrue(future.done())
+        copied._visibility_flags_weights()
+        self.assertNotIn(self.time_ordered_data._cache_directory, TimeOrderedData._cache_writes)
+
+    @patch('builtins.print')
+    def test_report_cache_write_failure(self, mock_print):
+        future = Future()
+        future.set_exception(OSError('disc full'))
+        self.time_ordered_data._report_cache_write_failure(future=future)
+        self.assertIn('disc full', mock_print.call_args.args[0])
+
+    @patch('builtins.print')
+    def test_report_cache_write_failure_when_succeeded(self, mock_print):
+        future = Future()
+        future.set_result(None)
+        self.time_ordered_data._report_cache_write_failure(future=future)
+        mock_print.assert_not_called()
 
-        mock_savez_compressed.assert_not_called()
-        mock_asarray.assert_not_called()
+    def test_wait_for_cache_write_when_nothing_to_wait_for(self):
+        self.assertIsNone(self.time_ordered_data.wait_for_cache_write())
+
+    def test_setstate_when_cache_write_future_pickled_expect_dropped(self):
+        state = self.time_ordered_data.__getstate__()
+        state['_cache_write_future'] = None
+        unpickled = TimeOrderedData.__new__(TimeOrderedData)
+        unpickled.__setstate__(state)
+        self.assertNotIn('_cache_write_future', unpickled.__dict__)
+
+    def test_getstate_expect_loader_progress_callback_dropped(self):
+        self.time_ordered_data._loader_progress_callback = lambda *args: None
+        self.assertIsNone(self.time_ordered_data.__getstate__()['_loader_progress_callback'])
+
+    def test_load_autocorrelation_visibility_to_cache_file_when_weights_dtype_float32(self):
+        cache_directory = './test/museek/visibility_cache/'
+        self.addCleanup(shutil.rmtree, cache_directory, ignore_errors=True)
+        self.time_ordered_data._visibility_cache = VisibilityCache(cache_directory=cache_directory)
+        self.time_ordered_data._weights_dtype = np.dtype(np.float32)
+        self.time_ordered_data.receivers = self.mock_receiver_list[:1]
+        self.time_ordered_data.shape = (2, 3, 1)
+        mock_data = MagicMock(
+            corr_products=np.asarray([['m000h', 'm000h']]),
+            vis=DaskLazyIndexer(da.ones((2, 3, 1), dtype=np.complex64)),
+            flags=DaskLazyIndexer(da.zeros((2, 3, 1), dtype=bool)),
+            weights=DaskLazyIndexer(da.ones((2, 3, 1), dtype=np.float64))
+        )
+        _, _, loaded_weights = self.time_ordered_data._load_autocorrelation_visibility_to_cache_file(data=mock_data)
+        self.assertEqual(np.float32, loaded_weights.dtype)
+
+    def test_load_autocorrelation_visibility_to_cache_file_when_scan_state_not_none(self):
+        mock_visibility_cache = MagicMock()
+        self.time_ordered_data._visibility_cache = mock_visibility_cache
+        self.time_ordered_data.scan_state = Mock()
+        self.assertRaises(ValueError,
+                          self.time_ordered_data._load_autocorrelation_visibility_to_cache_file,
+                          data=self.mock_katdal_data)
+        mock_visibility_cache.create_shards.assert_not_called()
 
     def test_correlator_products_indices(self):
         all_correlator_products = np.asarray([('a', 'a'), ('b', 'b'), ('c', 'c'), ('d', 'd')])
@@ -397,9 +955,65 @@ class TestTimeOrderedData(unittest.TestCase):
             calls=[call(corrprods=self.mock_correlator_products_indices.return_value),
                    call(corrprods=mock_correlator_products_indices.return_value)])
         mock_correlator_products_indices.assert_called_once_with(
-            all_correlator_products=self.mock_katdal_data.corr_products
+            all_correlator_products=self.mock_katdal_data.corr_products,
+            correlator_products=[['m000h', 'm000h'], ['m000v', 'm000v'], ['m001h', 'm001h']]
         )
 
+    def test_selection(self):
+        self.time_ordered_data._channels = range(570, 765)
+        self.assertDictEqual({'corrprods': [['m000v', 'm000v']], 'channels': range(570, 765)},
+                             self.time_ordered_data._selection(receivers=[self.mock_receiver_list[1]]))
+
+    @patch('museek.time_ordered_data.data_set_pool')
+    def test_open_selected_data(self, mock_data_set_pool):
+        self.time_ordered_data._katdal_open_argument = 'block.rdb'
+        data = self.time_ordered_data._open_selected_data()
+        mock_data_set_pool.get.assert_called_once_with(
+            open_argument='block.rdb',
+            selection={'corrprods': [['m000h', 'm000h'], ['m000v', 'm000v'], ['m001h', 'm001h']]}
+        )
+        self.assertEqual(mock_data_set_pool.get.return_value, data)
+
+    @patch.object(TimeOrderedData, '_correlator_products_indices')
+    def test_select_when_channels(self, mock_correlator_products_indices):
+        self.time_ordered_data._channels = range(570, 765)
+        self.time_ordered_data._select(data=self.mock_katdal_data)
+        self.mock_katdal_data.select.assert_called_with(corrprods=mock_correlator_products_indices.return_value,
+                                                        channels=range(570, 765))
+
+    @patch.object(TimeOrderedData, '_correlator_products_indices')
+    def test_select_when_frequency_range(self, mock_correlator_products_indices):
+        self.time_ordered_data._frequency_range = (975, 1015)
+        self.time_ordered_data._select(data=self.mock_katdal_data)
+        self.mock_katdal_data.select.assert_called_with(corrprods=mock_correlator_products_indices.return_value,
+                                                        freqrange=(975e6, 1015e6))
+
+    @patch.object(TimeOrderedData, '_correlator_products_indices')
+    def test_select_when_selected_scan_states(self, mock_correlator_products_indices):
+        self.time_ordered_data._selected_scan_states = [ScanStateEnum.SCAN, ScanStateEnum.TRACK]
+        self.time_ordered_data._select(data=self.mock_katdal_data)
+        self.mock_katdal_data.select.assert_called_with(corrprods=mock_correlator_products_indices.return_value,
+                                                        scans=['scan', 'track'])
+
+    def test_cache_name(self):
+        mock_data = Mock()
+        mock_data.name = 'block'
+        self.assertEqual('block_auto_visibility_flags_weights', self.time_ordered_data._cache_name(data=mock_data))
+
+    def test_cache_name_when_channels(self):
+        mock_data = Mock(channels=np.arange(570, 765))
+        mock_data.name = 'block'
+        self.time_ordered_data._channels = range(570, 765)
+        self.assertEqual('block_auto_visibility_flags_weights_channels_570_765_1',
+                         self.time_ordered_data._cache_name(data=mock_data))
+
+    def test_cache_name_when_frequency_range(self):
+        mock_data = Mock(channels=np.arange(10, 20, 2))
+        mock_data.name = 'block'
+        self.time_ordered_data._frequency_range = (975, 1015)
+        self.assertEqual('block_auto_visibility_flags_weights_channels_10_19_2',
+                         self.time_ordered_data._cache_name(data=mock_data))
+
     def test_get_receivers_if_receivers_given(self):
         mock_receivers = [Receiver.from_string('m000h')]
         self.assertEqual(mock_receivers, self.time_ordered_data._get_receivers(requested_receivers=mock_receivers,
@@ -12,6 +12,9 @@ from museek.time_ordered_data_mapper import TimeOrderedDataMapper
 class TestTimeOrderedDataMapper(unittest.TestCase):
     def test_from_time_ordered_data(self):
         mock_data = MagicMock()
+        mock_data.visibility.get.return_value = DataElement(array=np.zeros((2, 3, 1)))
+        mock_data.flags.get.return_value = FlagList.from_array(array=np.zeros((1, 3, 1)),
+                                                               element_factory=FlagElementFactory())
         self.assertIsInstance(TimeOrderedDataMapper.from_time_ordered_data(data=mock_data, recv=1),
                               TimeOrderedDataMapper)
         mock_data.right_ascension.get.assert_called_once_with(recv=1)
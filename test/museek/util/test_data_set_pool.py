@@ -0,0 +1,74 @@
+import unittest
+from unittest.mock import patch, MagicMock
+
+from museek.util.data_set_pool import DataSetPool
+
+
+class TestDataSetPool(unittest.TestCase):
+
+    def setUp(self):
+        self.data_set_pool = DataSetPool()
+
+    def test_init_when_max_size_not_positive_expect_raise(self):
+        self.assertRaises(ValueError, DataSetPool, max_size=0)
+
+    @patch('museek.util.data_set_pool.katdal')
+    def test_get(self, mock_katdal):
+        data = self.data_set_pool.get(open_argument='block.rdb', selection={'corrprods': [0, 3]})
+        mock_katdal.open.assert_called_once_with('block.rdb')
+        data.select.assert_called_once_with(corrprods=[0, 3])
+        self.assertEqual(mock_katdal.open.return_value, data)
+        self.assertEqual(1, len(self.data_set_pool))
+
+    @patch('museek.util.data_set_pool.katdal')
+    def test_get_when_in_pool_expect_not_opened_again(self, mock_katdal):
+        first = self.data_set_pool.get(open_argument='block.rdb', selection={'corrprods': [0], 'channels': range(5)})
+        second = self.data_set_pool.get(open_argument='block.rdb', selection={'channels': range(5), 'corrprods': [0]})
+        mock_katdal.open.assert_called_once()
+        self.assertIs(first, second)
+
+    @patch('museek.util.data_set_pool.katdal')
+    def test_get_when_selection_differs_expect_opened_again(self, mock_katdal):
+        mock_katdal.open.side_effect = [MagicMock(), MagicMock()]
+        first = self.data_set_pool.get(open_argument='block.rdb', selection={'corrprods': [0]})
+        second = self.data_set_pool.get(open_argument='block.rdb', selection={'corrprods': [1]})
+        self.assertEqual(2, mock_katdal.open.call_count)
+        self.assertIsNot(first, second)
+
+    @patch('museek.util.data_set_pool.katdal')
+    def test_put(self, mock_katdal):
+        data = MagicMock()
+        self.data_set_pool.put(open_argument='block.rdb', selection={'corrprods': [0]}, data=data)
+        self.assertIs(data, self.data_set_pool.get(open_argument='block.rdb', selection={'corrprods': [0]}))
+        mock_katdal.open.assert_not_called()
+
+    @patch('museek.util.data_set_pool.katdal')
+    def test_put_when_max_size_expect_least_recently_used_released(self, mock_katdal):
+        data_set_pool = DataSetPool(max_size=2)
+        data_set_pool.put(open_argument='a.rdb', selection={}, data=MagicMock())
+        data_set_pool.put(open_argument='b.rdb', selection={}, data=MagicMock())
+        data_set_pool.get(open_argument='a.rdb', selection={})
+        data_set_pool.put(open_argument='c.rdb', selection={}, data=MagicMock())
+        self.assertEqual(2, len(data_set_pool))
+        data_set_pool.get(open_argument='a.rdb', selection={})
+        mock_katdal.open.assert_not_called()
+        data_set_pool.get(open_argument='b.rdb', selection={})
+        mock_katdal.open.assert_called_once_with('b.rdb')
+
+    def test_release(self):
+        self.data_set_pool.put(open_argument='a.rdb', selection={'corrprods': [0]}, data=MagicMock())
+        self.data_set_pool.put(open_argument='a.rdb', selection={'corrprods': [1]}, data=MagicMock())
+        self.data_set_pool.put(open_argument='b.rdb', selection={}, data=MagicMock())
+        self.data_set_pool.release(open_argument='a.rdb')
+        self.assertEqual(1, len(self.data_set_pool))
+
+    def test_clear(self):
+        self.data_set_pool.put(open_argument='a.rdb', selection={}, data=MagicMock())
+        self.data_set_pool.clear()
+        self.assertEqual(0, len(self.data_set_pool))
+
+    def test_context_manager_expect_cleared(self):
+        with DataSetPool() as data_set_pool:
+            data_set_pool.put(open_argument='a.rdb', selection={}, data=MagicMock())
+            self.assertEqual(1, len(data_set_pool))
+        self.assertEqual(0, len(data_set_pool))
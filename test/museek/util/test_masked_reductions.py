@@ -0,0 +1,59 @@
+import unittest
+
+import numpy as np
+import scipy
+
+from museek.util.masked_reductions import masked_median, masked_kurtosis
+
+
+class TestMaskedReductions(unittest.TestCase):
+
+    def setUp(self):
+        self.array = np.random.default_rng(seed=0).normal(size=(15, 7, 3))
+        self.mask = np.random.default_rng(seed=1).random((15, 7, 3)) < 0.4
+        self.mask[:, 0, 0] = True
+        self.masked = np.ma.masked_array(self.array, self.mask)
+
+    def test_masked_median(self):
+        for axis in [0, 2, -1, (0, 1), [1, 2]]:
+            expect = np.ma.median(self.masked, axis=axis, keepdims=True)
+            result = masked_median(array=self.array, mask=self.mask, axis=axis)
+            self.assertEqual(expect.shape, result.shape)
+            np.testing.assert_allclose(np.ma.filled(expect, np.nan), result)
+
+    def test_masked_median_when_all_masked_expect_nan(self):
+        self.assertTrue(np.isnan(masked_median(array=self.array, mask=self.mask, axis=0)[0, 0, 0]))
+
+    def test_masked_median_when_mask_broadcast(self):
+        mask = np.zeros((15, 1, 1), dtype=bool)
+        mask[3] = True
+        np.testing.assert_allclose(np.median(np.delete(self.array, 3, axis=0), axis=0, keepdims=True),
+                                   masked_median(array=self.array, mask=mask, axis=0))
+
+    def test_masked_median_when_float32_and_not_contiguous(self):
+        array = np.random.default_rng(seed=2).integers(0, 5, size=(3, 20, 9)).astype(np.float32).transpose(1, 2, 0)
+        mask = np.random.default_rng(seed=3).random((20, 1, 3)) < 0.3
+        original = array.copy()
+        expect = np.ma.median(np.ma.masked_array(array, np.broadcast_to(mask, array.shape)), axis=0, keepdims=True)
+        np.testing.assert_allclose(np.ma.filled(expect, np.nan), masked_median(array=array, mask=mask, axis=0))
+        np.testing.assert_array_equal(original, array)
+
+    def test_masked_median_when_nan_expect_nan(self):
+        array = self.array.copy()
+        array[2, 1, 1] = np.nan
+        result = masked_median(array=array, mask=np.zeros_like(self.mask), axis=0)
+        self.assertTrue(np.isnan(result[0, 1, 1]))
+        self.assertFalse(np.isnan(result[0, 1, 0]))
+
+    def test_masked_median_when_not_3_dimensional_expect_raise(self):
+        self.assertRaises(ValueError, masked_median, array=self.array[0], mask=self.mask[0], axis=0)
+
+    def test_masked_kurtosis(self):
+        for axis in [0, 1, (0, 2)]:
+            expect = scipy.stats.kurtosis(self.masked, axis=axis, keepdims=True)
+            result = masked_kurtosis(array=self.array, mask=self.mask, axis=axis)
+            np.testing.assert_allclose(np.ma.filled(expect, np.nan), result)
+
+    def test_masked_kurtosis_when_constant_expect_nan(self):
+        result = masked_kurtosis(array=np.ones((4, 1, 1)), mask=np.zeros((4, 1, 1), dtype=bool), axis=0)
+        self.assertTrue(np.isnan(result[0, 0, 0]))
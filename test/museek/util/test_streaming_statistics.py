@@ -0,0 +1,85 @@
+import pickle
+import unittest
+
+import numpy as np
+import scipy
+
+from museek.data_element import DataElement
+from museek.flag_element import FlagElement
+from museek.flag_list import FlagList
+from museek.util.streaming_statistics import StreamingStatistics
+
+
+class TestStreamingStatistics(unittest.TestCase):
+
+    def setUp(self):
+        self.array = np.random.default_rng(seed=0).normal(loc=5, size=(30, 6, 4)) ** 2
+        self.flag_array = np.random.default_rng(seed=1).random((30, 6, 4)) < 0.3
+        self.flag_array[:, 0, 0] = True
+        self.masked = np.ma.masked_array(self.array, self.flag_array)
+        self.chunks = [slice(0, 7), slice(7, 8), slice(8, 20), slice(20, 30)]
+
+    def _statistics(self, chunks: list[slice], max_moment: int = 4) -> StreamingStatistics:
+        statistics = StreamingStatistics(max_moment=max_moment)
+        for chunk in chunks:
+            statistics.update(data=DataElement(array=self.array[chunk]),
+                              flags=FlagList(flags=[FlagElement(array=self.flag_array[chunk])]))
+        return statistics
+
+    def test_init_when_max_moment_invalid_expect_raise(self):
+        self.assertRaises(ValueError, StreamingStatistics, max_moment=5)
+
+    def test_update_expect_equal_to_numpy(self):
+        statistics = self._statistics(chunks=self.chunks)
+        np.testing.assert_array_equal(self.masked.count(axis=0, keepdims=True), statistics.count.array)
+        np.testing.assert_allclose(self.masked.mean(axis=0, keepdims=True), statistics.mean.array)
+        np.testing.assert_allclose(self.masked.var(axis=0, keepdims=True), statistics.variance.array)
+        np.testing.assert_allclose(self.masked.std(axis=0, keepdims=True), statistics.standard_deviation.array)
+        kurtosis = np.ma.filled(scipy.stats.kurtosis(self.masked, axis=0, keepdims=True), np.nan)
+        np.testing.assert_allclose(kurtosis, statistics.kurtosis.array)
+
+    def test_update_when_no_flags(self):
+        statistics = StreamingStatistics(max_moment=3)
+        for chunk in self.chunks:
+            statistics.update(data=DataElement(array=self.array[chunk]))
+        np.testing.assert_allclose(self.array.mean(axis=0, keepdims=True), statistics.mean.array)
+        np.testing.assert_allclose(self.array.std(axis=0, keepdims=True), statistics.standard_deviation.array)
+
+    def test_mean_when_all_flagged_expect_masked(self):
+        statistics = self._statistics(chunks=self.chunks)
+        self.assertTrue(statistics.mean.array.mask[0, 0, 0])
+        self.assertEqual(1, statistics.standard_deviation.array.mask.sum())
+        self.assertTrue(np.isnan(statistics.kurtosis.array[0, 0, 0]))
+
+    def test_merge_expect_equal_to_single_pass(self):
+        merged = self._statistics(chunks=self.chunks[:2]).merge(other=self._statistics(chunks=self.chunks[2:]))
+        expect = self._statistics(chunks=self.chunks)
+        for name in ['count', 'mean', 'standard_deviation', 'kurtosis']:
+            np.testing.assert_allclose(getattr(expect, name).array, getattr(merged, name).array)
+
+    def test_merge_when_pickled(self):
+        partial = pickle.loads(pickle.dumps(self._statistics(chunks=self.chunks[1:])))
+        merged = self._statistics(chunks=self.chunks[:1]).merge(other=partial)
+        np.testing.assert_allclose(self.masked.mean(axis=0, keepdims=True), merged.mean.array)
+
+    def test_merge_when_empty(self):
+        statistics = self._statistics(chunks=self.chunks)
+        mean = statistics.mean.array.copy()
+        statistics.merge(other=StreamingStatistics(max_moment=4))
+        np.testing.assert_array_equal(mean, statistics.mean.array)
+        empty = StreamingStatistics(max_moment=4).merge(other=statistics)
+        np.testing.assert_array_equal(mean, empty.mean.array)
+
+    def test_merge_when_max_moment_differs_expect_raise(self):
+        self.assertRaises(ValueError, self._statistics(chunks=self.chunks).merge,
+                          other=self._statistics(chunks=self.chunks, max_moment=2))
+
+    def test_update_when_shape_differs_expect_raise(self):
+        statistics = self._statistics(chunks=self.chunks)
+        self.assertRaises(ValueError, statistics.update, data=DataElement(array=np.ones((3, 5, 4))))
+
+    def test_kurtosis_when_max_moment_too_small_expect_raise(self):
+        self.assertRaises(ValueError, getattr, self._statistics(chunks=self.chunks, max_moment=2), 'kurtosis')
+
+    def test_mean_when_empty_expect_raise(self):
+        self.assertRaises(ValueError, getattr, StreamingStatistics(), 'mean')